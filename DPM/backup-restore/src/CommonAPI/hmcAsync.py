@@ -0,0 +1,409 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides asynchronous variants of the prsm2api request
+# - layer (getHMCObject, getHMCObjectList and getHMCObjectProperties).
+# - Requests are queued to an HMCRequestLoop, which keeps them in flight
+# - over the pooled keep-alive connections of HMCConnection, and each
+# - call returns an HMCFuture right away.
+# - Classes:
+#        HMCFuture      - pending result of an asynchronous HMC request
+#        HMCRequestLoop - dispatches queued requests to worker threads
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+
+import Queue
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCFuture object --------------------------------- #
+# ------------------------------------------------------------------ #
+# - Pending result of an asynchronous HMC request
+# ------------------------------------------------------------------ #
+class HMCFuture:
+    '''
+      - Pending result of an asynchronous HMC request.
+      - result() returns the object the synchronous call would return,
+      - or raises the same HMCException the synchronous call would raise
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 actionDesc=None    # request description, for logging
+                 ):
+        '''
+          - Constructor
+          - @param actionDesc: request description, for logging
+        '''
+        self.actionDesc = actionDesc
+        self.cond = threading.Condition(threading.Lock())
+        self.finished = False
+        self.value = None
+        self.exc = None
+        self.callbacks = []
+
+    # -------------------------------------------- #
+    # - Stores result (or exception) of the request
+    # -------------------------------------------- #
+    def setResult(self,
+                  value=None,   # result of the request
+                  exc=None      # HMCException raised by the request
+                  ):
+        '''
+          - Stores result (or exception) of the request and wakes up waiters
+          - @param value: result of the request
+          - @param exc:   HMCException raised by the request
+        '''
+        self.cond.acquire()
+        try:
+            self.value = value
+            self.exc = exc
+            self.finished = True
+            callbacks = self.callbacks
+            self.callbacks = []
+            self.cond.notifyAll()
+        finally:
+            self.cond.release()
+        for callback in callbacks:
+            self.runCallback(callback)
+
+    # -------------------------------------------- #
+    # - Runs done callback
+    # -------------------------------------------- #
+    def runCallback(self,
+                    callback
+                    ):
+        try:
+            callback(self)
+        except Exception as exc:
+            log.error("HMCFuture callback failed for %s: %s", self.actionDesc, exc)
+
+    # -------------------------------------------- #
+    # - Registers callback to be run when request is done
+    # -------------------------------------------- #
+    def addDoneCallback(self,
+                        callback    # function taking this HMCFuture object
+                        ):
+        '''
+          - Registers callback to be run (in the worker thread) when
+          - the request is done. Runs it at once if already done
+          - @param callback: function taking this HMCFuture object
+        '''
+        self.cond.acquire()
+        try:
+            if not self.finished:
+                self.callbacks.append(callback)
+                return
+        finally:
+            self.cond.release()
+        self.runCallback(callback)
+
+    # -------------------------------------------- #
+    # - Returns True if the request is done
+    # -------------------------------------------- #
+    def done(self):
+        '''
+          - @return: True if the request is done
+        '''
+        return self.finished
+
+    # -------------------------------------------- #
+    # - Waits for the request to be done
+    # -------------------------------------------- #
+    def wait(self,
+             timeout=None   # seconds to wait, None means forever
+             ):
+        '''
+          - Waits for the request to be done
+          - @param timeout: seconds to wait, None means forever
+          - @return: True if the request is done
+        '''
+        self.cond.acquire()
+        try:
+            if timeout == None:
+                while not self.finished:
+                    # wait with timeout so that KeyboardInterrupt is delivered
+                    self.cond.wait(1)
+            else:
+                deadline = time.time() + timeout
+                while not self.finished:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+            return self.finished
+        finally:
+            self.cond.release()
+
+    # -------------------------------------------- #
+    # - Returns HMCException raised by the request
+    # -------------------------------------------- #
+    def exception(self,
+                  timeout=None
+                  ):
+        '''
+          - @return: HMCException raised by the request or None
+        '''
+        if not self.wait(timeout):
+            raise HMCException("HMCFuture.exception",
+                               "Timed out while waiting for %s" % (self.actionDesc))
+        return self.exc
+
+    # -------------------------------------------- #
+    # - Returns result of the request
+    # -------------------------------------------- #
+    def result(self,
+               timeout=None   # seconds to wait, None means forever
+               ):
+        '''
+          - Waits for the request and returns its result
+          - @param timeout: seconds to wait, None means forever
+          - @return: result of the request. HMCException raised by the
+          -          request is re-raised here
+        '''
+        exc = self.exception(timeout)
+        if exc != None:
+            raise exc
+        return self.value
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCRequestLoop object ---------------------------- #
+# ------------------------------------------------------------------ #
+# - Dispatches queued HMC requests to worker threads
+# ------------------------------------------------------------------ #
+class HMCRequestLoop:
+    '''
+      - Dispatches queued HMC requests to a fixed number of worker
+      - threads. Each worker blocks on its own pooled HMC connection,
+      - so up to numWorkers requests are in flight at the same time
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 numWorkers=4   # number of requests to keep in flight
+                 ):
+        '''
+          - Constructor
+          - @param numWorkers: number of requests to keep in flight
+        '''
+        self.numWorkers = 0
+        self.queue = Queue.Queue()
+        self.lock = threading.Lock()
+        self.workers = []
+        self.resize(numWorkers)
+
+    # -------------------------------------------- #
+    # - Changes number of worker threads
+    # -------------------------------------------- #
+    def resize(self,
+               numWorkers   # number of requests to keep in flight
+               ):
+        '''
+          - Starts or stops worker threads, so that numWorkers requests
+          - are kept in flight (e.g. when the connection pool is resized).
+          - Stopped workers exit after the requests queued before
+          - @param numWorkers: number of requests to keep in flight
+        '''
+        numWorkers = max(1, numWorkers)
+        self.lock.acquire()
+        try:
+            # workers stopped by an earlier resize have exited or will exit
+            self.workers = [worker for worker in self.workers if worker.isAlive()]
+            for i in range(self.numWorkers, numWorkers):
+                worker = threading.Thread(target=self.runWorker,
+                                          name="HMCRequestLoop-%d" % (i))
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+            for i in range(numWorkers, self.numWorkers):
+                self.queue.put(None)
+            self.numWorkers = numWorkers
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Worker thread body
+    # -------------------------------------------- #
+    def runWorker(self):
+        while True:
+            item = self.queue.get()
+            if item == None:
+                break
+            future, func, args, kwargs = item
+            try:
+                future.setResult(value=func(*args, **kwargs))
+            except HMCException as exc:
+                future.setResult(exc=exc)
+            except Exception as exc:
+                exc = HMCException("HMCRequestLoop",
+                                   "Unknown failure happened while doing %s" % (future.actionDesc),
+                                   origException=exc)
+                future.setResult(exc=exc)
+
+    # -------------------------------------------- #
+    # - Queues function call to be run by a worker
+    # -------------------------------------------- #
+    def submit(self,
+               func,            # function to be called
+               args=(),         # positional arguments of the function
+               kwargs=None,     # keyword arguments of the function
+               actionDesc=None  # request description, for logging
+               ):
+        '''
+          - Queues function call to be run by a worker thread
+          - @param func:       function to be called
+          - @param args:       positional arguments of the function
+          - @param kwargs:     keyword arguments of the function
+          - @param actionDesc: request description, for logging
+          - @return: HMCFuture object
+        '''
+        if kwargs == None:
+            kwargs = {}
+        if actionDesc == None:
+            actionDesc = func.__name__
+        future = HMCFuture(actionDesc)
+        self.queue.put((future, func, args, kwargs))
+        return future
+
+    # -------------------------------------------- #
+    # - Stops worker threads
+    # -------------------------------------------- #
+    def shutdown(self,
+                 wait=True    # wait for the queued requests to be done
+                 ):
+        '''
+          - Stops worker threads after the queued requests are done
+          - @param wait: wait for the worker threads to exit
+        '''
+        self.lock.acquire()
+        try:
+            workers = self.workers
+            for i in range(self.numWorkers):
+                self.queue.put(None)
+            self.workers = []
+            self.numWorkers = 0
+        finally:
+            self.lock.release()
+        if wait:
+            for worker in workers:
+                worker.join()
+
+
+# ----------------------------------------------------------------- #
+# ----------- Common functions ------------------------------------ #
+# ----------------------------------------------------------------- #
+def getRequestLoop(hmcConn):
+    '''
+      - Returns HMCRequestLoop of the connection, creating it on first use
+      - with as many workers as the connection pool size. It is resized with
+      - the pool by HMCConnection.setPoolSize, and stopped by logoff
+    '''
+    hmcConn.sessionLock.acquire()
+    try:
+        if hmcConn.requestLoop == None:
+            hmcConn.requestLoop = HMCRequestLoop(numWorkers=hmcConn.poolSize)
+        return hmcConn.requestLoop
+    finally:
+        hmcConn.sessionLock.release()
+
+
+def gatherResults(futures    # list of HMCFuture objects
+                  ):
+    '''
+      - Waits for all futures and returns their results in the same order.
+      - The first HMCException (in list order) is re-raised after all
+      - requests are done
+    '''
+    results = []
+    firstExc = None
+    for future in futures:
+        exc = future.exception()
+        if exc != None:
+            if firstExc == None:
+                firstExc = exc
+            results.append(None)
+        else:
+            results.append(future.value)
+    if firstExc != None:
+        raise firstExc
+    return results
+
+
+def getHMCObjectAsync(hmcConn,
+                      httpPath,
+                      actionDesc,
+                      **kwargs
+                      ):
+    '''
+      - Asynchronous variant of getHMCObject
+      - @return: HMCFuture object
+    '''
+    return getRequestLoop(hmcConn).submit(getHMCObject,
+                                          (hmcConn, httpPath, actionDesc),
+                                          kwargs, actionDesc)
+
+
+def getHMCObjectListAsync(hmcConn,
+                          httpPath,
+                          actionDesc,
+                          responseKey,
+                          **kwargs
+                          ):
+    '''
+      - Asynchronous variant of getHMCObjectList
+      - @return: HMCFuture object
+    '''
+    return getRequestLoop(hmcConn).submit(getHMCObjectList,
+                                          (hmcConn, httpPath, actionDesc, responseKey),
+                                          kwargs, actionDesc)
+
+
+def getHMCObjectPropertiesAsync(hmcConn,
+                                httpPath,
+                                actionDesc,
+                                properties=None
+                                ):
+    '''
+      - Asynchronous variant of getHMCObjectProperties
+      - @return: HMCFuture object
+    '''
+    return getRequestLoop(hmcConn).submit(getHMCObjectProperties,
+                                          (hmcConn, httpPath, actionDesc),
+                                          {'properties': properties}, actionDesc)
+
+
+def getHMCObjectsAsync(hmcConn,
+                       uriList,             # list of object/element URIs
+                       actionDesc="Get Object Properties",
+                       properties=None,     # property names, None for all
+                       maxConcurrent=None   # max number of requests in flight, None for no limit
+                       ):
+    '''
+      - Fetches properties of all objects in uriList concurrently. If
+      - maxConcurrent is specified, at most that many of the requests are
+      - in flight at the same time, the next one is queued when one is done
+      - @return: dictionary {<uri>: <properties>}
+    '''
+    uriList = list(uriList)
+    if maxConcurrent == None:
+        futures = [getHMCObjectPropertiesAsync(hmcConn, uri, actionDesc, properties) for uri in uriList]
+        return dict(zip(uriList, gatherResults(futures)))
+    slots = threading.Semaphore(maxConcurrent)
+    futures = []
+    for uri in uriList:
+        slots.acquire()
+        future = getHMCObjectPropertiesAsync(hmcConn, uri, actionDesc, properties)
+        future.addDoneCallback(lambda future: slots.release())
+        futures.append(future)
+    return dict(zip(uriList, gatherResults(futures)))
@@ -0,0 +1,307 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides the structured backup file format. A backup
+# - file is a versioned JSON document, optionally compressed by gzip
+# - (.gz) or zstd (.zst, if the zstandard module is installed), which
+# - holds the partitions and storage groups of one or more CPCs:
+#
+#     {"format": "dpm-backup", "version": 1, "created": "<time>",
+#      "cpcs": {"<cpc name>": {"partitions": {"<name>": {<key>: <value>}},
+#                              "storage-groups": {"<name>": {<key>: <value>}}}}}
+#
+# - The keys of a section are the keys of the config file (.cfg). The
+# - values listed in BACKUP_SCHEMA are JSON arrays and objects, all
+# - other values are strings as in the config file. The whole file is
+# - parsed by a single JSON decode, no value is evaluated.
+# - Classes:
+#        HMCZstdFile - file object of a zstd compressed file
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+import ConfigParser
+import ast
+import gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+# ======= CONSTANTS =========
+# format name and version of the backup file
+BACKUP_FORMAT = 'dpm-backup'
+BACKUP_FORMAT_VERSION = 1
+
+# section kinds of a CPC
+BACKUP_PARTITIONS = 'partitions'
+BACKUP_STORAGE_GROUPS = 'storage-groups'
+
+# structured values of the sections, {<kind>: {<key>: <type>}},
+# values of other keys are strings
+BACKUP_SCHEMA = {BACKUP_PARTITIONS: {'sgdevnum': list,
+                                     'sgficon': list,
+                                     'zaccelerators': list,
+                                     'zcryptos': dict,
+                                     'zzbootopt': dict},
+                 BACKUP_STORAGE_GROUPS: {'sgstorvolscfg': list}}
+
+# backup file extensions by compression
+BACKUP_FILE_EXTENSIONS = {None: '.backup.json',
+                          'gzip': '.backup.json.gz',
+                          'zstd': '.backup.json.zst'}
+# ======= CONSTANTS =========
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCZstdFile object ------------------------------- #
+# ------------------------------------------------------------------ #
+# - File object of a zstd compressed file
+# ------------------------------------------------------------------ #
+class HMCZstdFile:
+    '''
+      - File object of a zstd compressed file. The data is compressed
+      - into the file as it is written, and decompressed from the file as
+      - it is read, so the content is not kept in memory
+    '''
+
+    # size of the chunks read by read() without size
+    readSize = 65536
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 filePath,  # path of the compressed file
+                 mode='rb'  # 'rb' or 'wb'
+                 ):
+        if zstandard == None:
+            exc = HMCException("HMCZstdFile",
+                               "zstd compression requires the zstandard module: %s" % (filePath))
+            raise exc
+        self.filePath = filePath
+        self.mode = mode
+        self.rawFile = open(filePath, 'r' in mode and 'rb' or 'wb')
+        if 'r' in mode:
+            self.stream = zstandard.ZstdDecompressor().stream_reader(self.rawFile)
+        else:
+            self.stream = zstandard.ZstdCompressor().stream_writer(self.rawFile)
+
+    def read(self, size=-1):
+        if size >= 0:
+            return self.stream.read(size)
+        chunks = []
+        while True:
+            chunk = self.stream.read(self.readSize)
+            if len(chunk) == 0:
+                return ''.join(chunks)
+            chunks.append(chunk)
+
+    def write(self, data):
+        self.stream.write(data)
+
+    def close(self):
+        if self.rawFile == None:
+            return
+        if 'w' in self.mode:
+            # ends the zstd frame
+            self.stream.flush(zstandard.FLUSH_FRAME)
+        self.rawFile.close()
+        self.rawFile = None
+        self.stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        self.close()
+
+
+# ----------------------------------------------------------------- #
+# ----------- Common functions ------------------------------------ #
+# ----------------------------------------------------------------- #
+def isBackupFile(filePath   # path of a file
+                 ):
+    '''
+      - @return: True if the file is a structured backup file (by extension)
+    '''
+    for extension in BACKUP_FILE_EXTENSIONS.values():
+        if filePath.endswith(extension):
+            return True
+    return False
+
+
+def openBackupFile(filePath,    # path of the backup file
+                   mode='rb'    # 'rb' or 'wb'
+                   ):
+    '''
+      - Opens backup file, compressed by its extension
+      - @return: file object
+    '''
+    if filePath.endswith('.gz'):
+        return gzip.open(filePath, mode)
+    if filePath.endswith('.zst'):
+        return HMCZstdFile(filePath, mode)
+    return open(filePath, mode)
+
+
+def parseConfigValue(value      # structured value or its string in a config file
+                     ):
+    '''
+      - Parses structured value of a config file (a Python literal such as
+      - "[u'SG1:0100']") without evaluating it. Values loaded from a
+      - backup file are already parsed and returned as they are
+      - @return: list, dictionary or other literal
+    '''
+    if not isinstance(value, basestring):
+        return value
+    return ast.literal_eval(value)
+
+
+def configSection(kind,     # BACKUP_PARTITIONS or BACKUP_STORAGE_GROUPS
+                  items     # [(<key>, <value>), ...] of the config file
+                  ):
+    '''
+      - Converts config items of a section into a section of a backup
+      - file: comments (items without value) are dropped, keys are lower
+      - case as read from a config file, and the values of the schema are
+      - parsed. A later item replaces an earlier one with the same key
+      - @return: dictionary {<key>: <value>}
+    '''
+    schema = BACKUP_SCHEMA[kind]
+    section = dict()
+    for key, value in items:
+        if value == None:
+            continue
+        key = key.lower()
+        if key in schema:
+            section[key] = parseConfigValue(value)
+        elif isinstance(value, basestring):
+            # text (e.g. read from a records file) is kept as unicode
+            section[key] = value
+        else:
+            section[key] = str(value)
+    return section
+
+
+def writeBackupFile(filePath,   # path of the backup file
+                    cpcs        # [(<cpc name>, [(<kind>, <sections>), ...]), ...]
+                    ):
+    '''
+      - Writes backup file. Sections are written one by one as they are
+      - produced by the iterables, so they are not required to be in memory
+      - @param filePath: path of the backup file, compressed by its extension
+      - @param cpcs:     list of (cpc name, kinds) pairs, kinds is a list of
+      -                  (kind, sections) pairs and sections is an iterable of
+      -                  (section name, section) pairs
+      - @return: number of written sections
+    '''
+    count = 0
+    with openBackupFile(filePath, 'wb') as backupFile:
+        backupFile.write('{"format":%s,"version":%d,"created":%s,"cpcs":{' % (
+                         json.dumps(BACKUP_FORMAT), BACKUP_FORMAT_VERSION,
+                         json.dumps(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()))))
+        for cpcIndex, (cpcName, kinds) in enumerate(cpcs):
+            backupFile.write('%s%s:{' % (cpcIndex and ',' or '', json.dumps(cpcName)))
+            for kindIndex, (kind, sections) in enumerate(kinds):
+                backupFile.write('%s%s:{' % (kindIndex and ',' or '', json.dumps(kind)))
+                for sectionIndex, (sectionName, section) in enumerate(sections):
+                    backupFile.write('%s\n%s:%s' % (sectionIndex and ',' or '', json.dumps(sectionName),
+                                                    json.dumps(section, sort_keys=True, separators=(',', ':'))))
+                    count += 1
+                backupFile.write('}')
+            backupFile.write('}')
+        backupFile.write('}}\n')
+    return count
+
+
+def loadBackupFile(filePath     # path of the backup file
+                   ):
+    '''
+      - Loads backup file by a single JSON decode and checks it against
+      - the schema
+      - @return: dictionary {<cpc name>: {<kind>: {<section>: {<key>: <value>}}}}
+    '''
+    try:
+        with openBackupFile(filePath, 'rb') as backupFile:
+            document = json.load(backupFile)
+    except ValueError as exc:
+        exc = HMCException("loadBackupFile",
+                           "Backup file %s cannot be parsed: %s" % (filePath, exc))
+        raise exc
+    if type(document) != dict or document.get('format') != BACKUP_FORMAT:
+        exc = HMCException("loadBackupFile", "%s is not a backup file" % (filePath))
+        raise exc
+    if document.get('version') > BACKUP_FORMAT_VERSION:
+        exc = HMCException("loadBackupFile",
+                           "Backup file %s version %s is not supported" % (filePath, document.get('version')))
+        raise exc
+    errors = []
+    cpcs = document.get('cpcs')
+    if type(cpcs) != dict:
+        errors.append("cpcs is not an object")
+        cpcs = dict()
+    for cpcName, kinds in cpcs.items():
+        if type(kinds) != dict:
+            errors.append("%s is not an object" % (cpcName))
+            continue
+        for kind, sections in kinds.items():
+            schema = BACKUP_SCHEMA.get(kind)
+            if schema == None or type(sections) != dict:
+                errors.append("%s/%s is not a known kind of sections" % (cpcName, kind))
+                continue
+            for sectionName, section in sections.items():
+                if type(section) != dict:
+                    errors.append("%s/%s/%s is not an object" % (cpcName, kind, sectionName))
+                    continue
+                for key, value in section.items():
+                    if not isinstance(value, schema.get(key, basestring)):
+                        errors.append("%s/%s/%s: %s is not %s" % (cpcName, kind, sectionName, key,
+                                                                  schema.get(key, basestring).__name__))
+    if len(errors) != 0:
+        exc = HMCException("loadBackupFile",
+                           "Backup file %s does not match the schema: %s" % (filePath, "; ".join(errors[:10])))
+        raise exc
+    return cpcs
+
+
+def loadBackupSections(filePath,        # path of backup file or config file
+                       kind=None,       # BACKUP_PARTITIONS or BACKUP_STORAGE_GROUPS
+                       cpcName=None     # CPC name, used if the file has several CPCs
+                       ):
+    '''
+      - Loads sections of a CPC from a backup file, or all sections of
+      - a config file (.cfg)
+      - @param kind:    kind of the sections, None if the CPC has one kind only
+      - @param cpcName: CPC name, None if the file has one CPC only
+      - @return: dictionary {<section>: {<key>: <value>}}
+    '''
+    if not isBackupFile(filePath):
+        config = ConfigParser.RawConfigParser()
+        config.readfp(open(filePath))
+        return dict([(section, dict(config.items(section))) for section in config.sections()])
+    cpcs = loadBackupFile(filePath)
+    if cpcName in cpcs:
+        kinds = cpcs[cpcName]
+    elif len(cpcs) == 1:
+        kinds = cpcs.values()[0]
+    else:
+        exc = HMCException("loadBackupSections",
+                           "Backup file %s has no CPC %s, but %s" % (filePath, cpcName, sorted(cpcs.keys())))
+        raise exc
+    if kind == None:
+        if len(kinds) > 1:
+            exc = HMCException("loadBackupSections",
+                               "Backup file %s has several kinds of sections: %s" % (filePath, sorted(kinds.keys())))
+            raise exc
+        return len(kinds) != 0 and kinds.values()[0] or dict()
+    return kinds.get(kind, dict())
+
+
+def backupFileExtension(compression=None    # None, 'gzip' or 'zstd'
+                        ):
+    return BACKUP_FILE_EXTENSIONS[compression]
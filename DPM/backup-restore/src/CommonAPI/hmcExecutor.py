@@ -0,0 +1,496 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides the task executor used by the backup/restore
+# - scripts to process partitions or storage groups concurrently.
+# - Tasks are run by a bounded pool of worker threads, which share the
+# - pooled keep-alive connections of HMCConnection, and the number of
+# - tasks running against one CPC at the same time is limited.
+# - Every task stores its result into its own slot, so the results are
+# - collected without locking and returned in submission order.
+# - HMCTaskScheduler runs a graph of tasks with dependencies by the same
+# - kind of pool: a task is started as soon as the tasks it depends on
+# - have succeeded, so independent tasks of all items overlap. A task
+# - may return an HMCFuture to wait for an event (e.g. a storage group
+# - to be fulfilled) without holding a worker. Tasks completed by an
+# - earlier run (e.g. recorded in a journal) are not run again.
+# - Classes:
+#        HMCTaskResult    - result of a single task
+#        HMCTaskExecutor  - runs tasks by a bounded pool of workers
+#        HMCTaskScheduler - runs tasks with dependencies by a bounded pool
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+
+import hmcAsync
+import argparse
+import functools
+import Queue
+import heapq
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+# ======= CONSTANTS =========
+# default number of worker threads
+DEFAULT_WORKERS = 4
+# default max number of tasks running against one CPC at the same time
+MAX_TASKS_PER_CPC = 8
+# ======= CONSTANTS =========
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCTaskResult object ----------------------------- #
+# ------------------------------------------------------------------ #
+# - Result of a single task
+# ------------------------------------------------------------------ #
+class HMCTaskResult:
+    '''
+      - Result of a single task: the value returned by the task function
+      - or the exception it raised, and the time it took
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 item,          # task argument
+                 value=None,    # value returned by the task
+                 exc=None,      # exception raised by the task
+                 elapsed=0      # seconds the task took
+                 ):
+        self.item = item
+        self.value = value
+        self.exc = exc
+        self.elapsed = elapsed
+
+    # -------------------------------------------- #
+    # - Returns True if the task has succeeded
+    # -------------------------------------------- #
+    def succeeded(self):
+        '''
+          - @return: True if the task did not raise an exception and
+          -          did not return False
+        '''
+        return self.exc == None and self.value != False
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCTaskExecutor object --------------------------- #
+# ------------------------------------------------------------------ #
+# - Runs tasks by a bounded pool of worker threads
+# ------------------------------------------------------------------ #
+class HMCTaskExecutor:
+    '''
+      - Runs a function for every item of a list by a bounded pool of
+      - worker threads. At most maxPerCPC tasks of one CPC are running
+      - at the same time, even if several executors are used
+    '''
+
+    # semaphores limiting tasks per CPC, shared by all executors
+    cpcSemaphores = dict()
+    cpcSemaphoresLock = threading.Lock()
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 numWorkers=DEFAULT_WORKERS,    # number of worker threads
+                 maxPerCPC=MAX_TASKS_PER_CPC    # max tasks running against one CPC
+                 ):
+        '''
+          - Constructor
+          - @param numWorkers: number of worker threads
+          - @param maxPerCPC:  max number of tasks running against one CPC
+        '''
+        self.numWorkers = max(1, numWorkers)
+        self.maxPerCPC = max(1, maxPerCPC)
+        self.elapsed = 0        # seconds the last map() call took
+
+    # -------------------------------------------- #
+    # - Returns semaphore limiting tasks of the CPC
+    # -------------------------------------------- #
+    def getCPCSemaphore(self,
+                        cpcURI      # URI of the CPC
+                        ):
+        HMCTaskExecutor.cpcSemaphoresLock.acquire()
+        try:
+            if cpcURI not in HMCTaskExecutor.cpcSemaphores:
+                HMCTaskExecutor.cpcSemaphores[cpcURI] = threading.BoundedSemaphore(self.maxPerCPC)
+            return HMCTaskExecutor.cpcSemaphores[cpcURI]
+        finally:
+            HMCTaskExecutor.cpcSemaphoresLock.release()
+
+    # -------------------------------------------- #
+    # - Runs function for every item
+    # -------------------------------------------- #
+    def map(self,
+            func,           # task function, called as func(item)
+            items,          # task arguments
+            cpcURI=None     # URI of the CPC the tasks work on
+            ):
+        '''
+          - Runs func(item) for every item by the worker threads and
+          - waits for all tasks to be done
+          - @param func:   task function, called as func(item)
+          - @param items:  task arguments
+          - @param cpcURI: URI of the CPC the tasks work on, limits the
+          -                number of tasks running at the same time
+          - @return: list of HMCTaskResult objects in the order of items
+        '''
+        log.debug("Entered")
+        mapStartTime = time.time()
+        items = list(items)
+        # every task writes its own slot, no locking is required
+        results = [None] * len(items)
+        taskQueue = Queue.Queue()
+        for index in range(len(items)):
+            taskQueue.put(index)
+        cpcSemaphore = None
+        if cpcURI != None:
+            cpcSemaphore = self.getCPCSemaphore(cpcURI)
+
+        def runWorker():
+            while True:
+                try:
+                    index = taskQueue.get_nowait()
+                except Queue.Empty:
+                    return
+                if cpcSemaphore != None:
+                    cpcSemaphore.acquire()
+                startTime = time.time()
+                try:
+                    value = func(items[index])
+                    results[index] = HMCTaskResult(items[index], value=value,
+                                                   elapsed=time.time() - startTime)
+                except Exception as exc:
+                    log.error("Task failed for %s: %s", items[index], exc)
+                    results[index] = HMCTaskResult(items[index], exc=exc,
+                                                   elapsed=time.time() - startTime)
+                finally:
+                    if cpcSemaphore != None:
+                        cpcSemaphore.release()
+
+        workers = []
+        for i in range(min(self.numWorkers, len(items))):
+            worker = threading.Thread(target=runWorker,
+                                      name="HMCTaskExecutor-%d" % (i))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            # join with timeout so that KeyboardInterrupt is delivered
+            while worker.isAlive():
+                worker.join(1)
+        self.elapsed = time.time() - mapStartTime
+        log.debug("Completed")
+        return results
+
+    # -------------------------------------------- #
+    # - Returns throughput summary of the last map() call
+    # -------------------------------------------- #
+    def getSummary(self,
+                   results,         # list of HMCTaskResult objects
+                   itemDesc='task'  # item description, e.g. 'storage group'
+                   ):
+        '''
+          - @return: summary line with the number of succeeded/failed
+          -          tasks, wall clock time, throughput and average task time
+        '''
+        passed = len([result for result in results if result.succeeded()])
+        taskTime = sum([result.elapsed for result in results])
+        summary = "%d %s(s) processed by %d worker(s) in %.1f s: %d succeeded, %d failed" % (len(results), itemDesc,
+                                                                                          min(self.numWorkers, max(1, len(results))),
+                                                                                          self.elapsed, passed,
+                                                                                          len(results) - passed)
+        if len(results) != 0 and self.elapsed > 0:
+            summary += ", %.2f %s(s)/s, %.1f s per %s on average" % (len(results) / self.elapsed, itemDesc,
+                                                                     taskTime / len(results), itemDesc)
+        return summary
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCTaskScheduler object -------------------------- #
+# ------------------------------------------------------------------ #
+# - Runs tasks with dependencies by a bounded pool of worker threads
+# ------------------------------------------------------------------ #
+class HMCTaskScheduler(HMCTaskExecutor):
+    '''
+      - Runs a graph of tasks by a bounded pool of worker threads. Every
+      - task has a key and the keys of the tasks it depends on, and is
+      - called with their values as soon as all of them have succeeded.
+      - Ready tasks are run in the order they have been added. A task is
+      - not run if a task it depends on has failed (or has been skipped),
+      - its result holds an HMCException then. At most maxPerCPC tasks of
+      - one CPC are running at the same time, as for HMCTaskExecutor.
+      - A task returning an HMCFuture is done when the future is done, its
+      - value (or exception) is the one of the future, and the worker runs
+      - other tasks meanwhile. Tasks completed by an earlier run are not
+      - run, nor the tasks which only these depend on (e.g. lookups)
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 numWorkers=DEFAULT_WORKERS,    # number of worker threads
+                 maxPerCPC=MAX_TASKS_PER_CPC    # max tasks running against one CPC
+                 ):
+        '''
+          - Constructor
+          - @param numWorkers: number of worker threads
+          - @param maxPerCPC:  max number of tasks running against one CPC
+        '''
+        HMCTaskExecutor.__init__(self, numWorkers=numWorkers, maxPerCPC=maxPerCPC)
+        self.tasks = dict()     # {<key>: (<function>, [<dependency key>, ...])}
+        self.keys = []          # task keys in the order they have been added
+        self.resumed = set()    # keys of the tasks not run by the last run() call, as completed before
+
+    # -------------------------------------------- #
+    # - Adds task
+    # -------------------------------------------- #
+    def add(self,
+            key,                # task key, e.g. (<partition name>, 'create')
+            func,               # task function, called with the dependency values
+            dependencies=[]     # keys of the tasks it depends on
+            ):
+        '''
+          - Adds task, unless a task with the same key has been added
+          - already (tasks shared by several items are added once)
+          - @param key:          task key, any hashable value
+          - @param func:         task function, called as func(*values) with
+          -                      the values of the dependencies in their order,
+          -                      may return an HMCFuture to be waited for
+          - @param dependencies: keys of the tasks it depends on
+          - @return: task key
+        '''
+        if key not in self.tasks:
+            self.tasks[key] = (func, list(dependencies))
+            self.keys.append(key)
+        return key
+
+    # -------------------------------------------- #
+    # - Checks if task has been added
+    # -------------------------------------------- #
+    def __contains__(self, key):
+        return key in self.tasks
+
+    # -------------------------------------------- #
+    # - Returns tasks not run when resuming
+    # -------------------------------------------- #
+    def getResumed(self,
+                   completed    # {<key>: <value>} of tasks completed before
+                   ):
+        '''
+          - @return: set of the keys of the tasks, which are not run when
+          -          resuming: the completed tasks, and the tasks needed by
+          -          completed tasks only
+        '''
+        dependents = dict()
+        for key in self.keys:
+            for dependency in self.tasks[key][1]:
+                dependents.setdefault(dependency, []).append(key)
+        # a task is needed if it is not completed, and it has no dependents
+        # or a task depending on it is needed
+        pending = [key for key in self.keys if key not in completed and len(dependents.get(key, [])) == 0]
+        needed = set(pending)
+        while len(pending) != 0:
+            key = pending.pop()
+            for dependency in self.tasks[key][1]:
+                if dependency in self.tasks and dependency not in completed and dependency not in needed:
+                    needed.add(dependency)
+                    pending.append(dependency)
+        return set([key for key in self.keys if key not in needed])
+
+    # -------------------------------------------- #
+    # - Runs all tasks
+    # -------------------------------------------- #
+    def run(self,
+            cpcURI=None,        # URI of the CPC the tasks work on
+            completed=None,     # {<key>: <value>} of tasks completed before
+            callback=None       # called for every succeeded task
+            ):
+        '''
+          - Runs all tasks by the worker threads and waits for them to be
+          - done. Tasks depending on unknown tasks or on each other
+          - (a cycle) are not run
+          - @param cpcURI:    URI of the CPC the tasks work on, limits the
+          -                   number of tasks running at the same time
+          - @param completed: dictionary {<key>: <value>} of the tasks
+          -                   completed by an earlier run, which are not run
+          -                   and pass their values to the tasks depending on
+          -                   them. Tasks which are needed by completed tasks
+          -                   only are not run either, their values are None
+          - @param callback:  called as callback(key, result) by the worker
+          -                   thread for every task which has succeeded,
+          -                   before the tasks depending on it are started
+          - @return: dictionary {<key>: HMCTaskResult object}
+        '''
+        log.debug("Entered")
+        runStartTime = time.time()
+        cond = threading.Condition(threading.Lock())
+        results = dict()
+        waiting = dict()        # {<key>: set of dependency keys not succeeded yet}
+        dependents = dict()     # {<key>: [<key of dependent task>, ...]}
+        ready = []              # heap of the indexes of ready tasks in self.keys
+        state = {'running': 0}
+        cpcSemaphore = None
+        if cpcURI != None:
+            cpcSemaphore = self.getCPCSemaphore(cpcURI)
+
+        def skip(key, reason):
+            # fails the task and all tasks depending on it, called with cond held
+            pending = [(key, reason)]
+            while len(pending) != 0:
+                key, reason = pending.pop()
+                if key in results:
+                    continue
+                exc = HMCException("HMCTaskScheduler.run",
+                                   "not run because %s" % (reason))
+                results[key] = HMCTaskResult(key, exc=exc)
+                for dependent in dependents.get(key, []):
+                    pending.append((dependent, "%s was not run" % (key,)))
+
+        def finish(key, result):
+            # stores result, and readies or skips the dependent tasks
+            if callback != None and result.succeeded():
+                try:
+                    callback(key, result)
+                except Exception as exc:
+                    log.error("Task callback failed for %s: %s", key, exc)
+            cond.acquire()
+            try:
+                results[key] = result
+                state['running'] -= 1
+                for dependent in dependents.get(key, []):
+                    if result.succeeded():
+                        waiting[dependent].discard(key)
+                        if len(waiting[dependent]) == 0 and dependent not in results:
+                            heapq.heappush(ready, indexes[dependent])
+                    else:
+                        skip(dependent, "%s failed" % (key,))
+                cond.notifyAll()
+            finally:
+                cond.release()
+
+        def runWorker():
+            while True:
+                cond.acquire()
+                try:
+                    while len(ready) == 0 and state['running'] != 0:
+                        # wait with timeout so that KeyboardInterrupt is delivered
+                        cond.wait(1)
+                    if len(ready) == 0:
+                        cond.notifyAll()
+                        return
+                    key = self.keys[heapq.heappop(ready)]
+                    state['running'] += 1
+                    func, dependencies = self.tasks[key]
+                    values = [results[dependency].value for dependency in dependencies]
+                finally:
+                    cond.release()
+                if cpcSemaphore != None:
+                    cpcSemaphore.acquire()
+                startTime = time.time()
+                future = None
+                try:
+                    value = func(*values)
+                    if isinstance(value, hmcAsync.HMCFuture):
+                        future = value
+                    result = HMCTaskResult(key, value=value, elapsed=time.time() - startTime)
+                except Exception as exc:
+                    log.error("Task failed for %s: %s", key, exc)
+                    result = HMCTaskResult(key, exc=exc, elapsed=time.time() - startTime)
+                finally:
+                    if cpcSemaphore != None:
+                        cpcSemaphore.release()
+                if future != None:
+                    # the task is still running until the future is done
+                    future.addDoneCallback(functools.partial(finishFuture, key, startTime))
+                else:
+                    finish(key, result)
+
+        def finishFuture(key, startTime, future):
+            if future.exc != None:
+                log.error("Task failed for %s: %s", key, future.exc)
+            finish(key, HMCTaskResult(key, value=future.value, exc=future.exc,
+                                      elapsed=time.time() - startTime))
+
+        # ready tasks are run in the order they have been added
+        indexes = dict([(key, index) for index, key in enumerate(self.keys)])
+        for key in self.keys:
+            func, dependencies = self.tasks[key]
+            waiting[key] = set(dependencies)
+            for dependency in dependencies:
+                dependents.setdefault(dependency, []).append(key)
+        self.resumed = set()
+        if completed:
+            self.resumed = self.getResumed(completed)
+            for key in self.resumed:
+                results[key] = HMCTaskResult(key, value=completed.get(key))
+            for key in self.keys:
+                waiting[key] = set([dependency for dependency in waiting[key] if dependency not in self.resumed])
+        for key in self.keys:
+            if key in self.resumed:
+                continue
+            unknown = [dependency for dependency in waiting[key] if dependency not in self.tasks]
+            if len(unknown) != 0:
+                skip(key, "unknown dependencies %s" % (unknown,))
+            elif len(waiting[key]) == 0:
+                heapq.heappush(ready, indexes[key])
+
+        workers = []
+        for i in range(min(self.numWorkers, len(self.keys))):
+            worker = threading.Thread(target=runWorker,
+                                      name="HMCTaskScheduler-%d" % (i))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            # join with timeout so that KeyboardInterrupt is delivered
+            while worker.isAlive():
+                worker.join(1)
+        # tasks still waiting depend on each other
+        for key in self.keys:
+            if key not in results:
+                skip(key, "dependency cycle")
+        self.elapsed = time.time() - runStartTime
+        log.debug("Completed")
+        return results
+
+
+# ----------------------------------------------------------------- #
+# ----------- Common functions ------------------------------------ #
+# ----------------------------------------------------------------- #
+def capWorkers(numWorkers,          # number of workers requested
+               option='-workers'    # command line option, for messages
+               ):
+    '''
+      - Caps the number of workers (and so the connection pool size) of a
+      - script at MAX_TASKS_PER_CPC, more tasks would not run against the
+      - CPC at the same time
+      - @return: number of workers to be used
+    '''
+    if numWorkers > MAX_TASKS_PER_CPC:
+        log.warning("%s %s exceeds the max number of tasks running against one CPC at the same time, %s workers are used",
+                    option, numWorkers, MAX_TASKS_PER_CPC)
+        return MAX_TASKS_PER_CPC
+    return numWorkers
+
+
+def workerCount(value   # command line value
+                ):
+    '''
+      - Type of the number of workers options of the scripts, rejects
+      - numbers below 1
+      - @return: number of workers
+    '''
+    try:
+        numWorkers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid number of workers: '%s'" % value)
+    if numWorkers < 1:
+        raise argparse.ArgumentTypeError("number of workers must be at least 1: %s" % value)
+    return numWorkers
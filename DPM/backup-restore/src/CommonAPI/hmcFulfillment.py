@@ -0,0 +1,328 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides the watcher of the fulfillment state of storage
+# - groups. A storage group is usable by a partition once the storage
+# - administrator has finished zoning and its fulfillment-state is
+# - 'complete'. The watcher returns an HMCFuture for every watched
+# - storage group, which is done as soon as the storage group is
+# - complete, so the operations depending on it are run right away.
+# - The state is taken from the property-change notifications of the
+# - session if the notification listener is running and synchronized,
+# - otherwise all watched storage groups are polled by a single list
+# - request per interval.
+# - Classes:
+#        HMCFulfillmentWatcher - waits for storage groups to be complete
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+from hmcNotification import NOTIFICATION_PROPERTY_CHANGE
+import hmcAsync
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+# ======= CONSTANTS =========
+# fulfillment state of a usable storage group
+FULFILLMENT_COMPLETE = 'complete'
+# default seconds between two polls
+DEFAULT_POLL_INTERVAL = 30
+# default seconds to wait for a storage group to be complete
+DEFAULT_FULFILLMENT_TIMEOUT = 3600
+# seconds between two checks for new storage groups and timeouts
+WATCH_CHECK_INTERVAL = 1
+# ======= CONSTANTS =========
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCFulfillmentWatcher object --------------------- #
+# ------------------------------------------------------------------ #
+# - Waits for storage groups to be complete
+# ------------------------------------------------------------------ #
+class HMCFulfillmentWatcher:
+    '''
+      - Waits for storage groups to be complete by a daemon thread. The
+      - state of a storage group is checked as soon as it is watched,
+      - and then updated by notifications, or by polling if the
+      - notification listener is not running or not synchronized. The
+      - future of a storage group fails if it is not complete within the
+      - timeout, or if the watcher is stopped
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 hmcConn,                               # HMCConnection object (logged on)
+                 cpcURI=None,                           # URI of the CPC of the storage groups
+                 pollInterval=DEFAULT_POLL_INTERVAL,    # seconds between two polls
+                 timeout=None,                          # seconds to wait, None means forever
+                 callback=None                          # called on state changes
+                 ):
+        '''
+          - Constructor
+          - @param hmcConn:      HMCConnection object (logged on)
+          - @param cpcURI:       URI of the CPC of the storage groups, limits
+          -                      the list request of a poll
+          - @param pollInterval: seconds between two polls
+          - @param timeout:      seconds to wait for a storage group, None
+          -                      means forever
+          - @param callback:     called as callback(sgURI, sgName, state, oldState)
+          -                      by the watcher thread when the state of a storage
+          -                      group has changed, oldState is None at first
+        '''
+        self.hmcConn = hmcConn
+        self.cpcURI = cpcURI
+        self.pollInterval = pollInterval
+        self.timeout = timeout
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.listener = None
+        self.watched = dict()       # {<sg uri>: (<future>, <name>, <deadline>)}, not complete yet
+        self.unchecked = set()      # URIs of watched storage groups not polled yet
+        self.states = dict()        # {<sg uri>: <last fulfillment state>}
+        self.futures = dict()       # {<sg uri>: <future>}, all watched storage groups
+        self.polls = 0              # number of polls
+        self.notified = 0           # number of states taken from notifications
+
+    # -------------------------------------------- #
+    # - Starts the watcher thread
+    # -------------------------------------------- #
+    def start(self):
+        '''
+          - Starts the watcher thread, and registers for notifications if
+          - the notification listener of the connection is running
+        '''
+        log.debug("Entered")
+        if self.listener == None and self.hmcConn.notificationListener != None:
+            self.listener = self.hmcConn.notificationListener
+            self.listener.addCallback(self.applyNotification)
+        if self.thread == None:
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run,
+                                           name="HMCFulfillmentWatcher")
+            self.thread.daemon = True
+            self.thread.start()
+        log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Stops the watcher thread
+    # -------------------------------------------- #
+    def stop(self):
+        '''
+          - Stops the watcher thread, the futures of the storage groups
+          - which are not complete fail
+        '''
+        log.debug("Entered")
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread != None:
+            self.thread.join(WATCH_CHECK_INTERVAL * 5)
+            self.thread = None
+        for uri in self.watched.keys():
+            self.fail(uri, "the watch has been stopped")
+        log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Watches storage group
+    # -------------------------------------------- #
+    def watch(self,
+              sgURI,        # storage group URI
+              sgName=None   # storage group name, for messages
+              ):
+        '''
+          - Watches the fulfillment state of a storage group, the watcher
+          - is started if needed
+          - @param sgURI:  storage group URI
+          - @param sgName: storage group name, for messages
+          - @return: HMCFuture object, done with the storage group URI as
+          -          soon as the storage group is complete
+        '''
+        self.lock.acquire()
+        try:
+            future = self.futures.get(sgURI)
+            if future == None:
+                future = hmcAsync.HMCFuture("Fulfillment of %s" % (sgName or sgURI))
+                deadline = None
+                if self.timeout != None:
+                    deadline = time.time() + self.timeout
+                self.futures[sgURI] = future
+                self.watched[sgURI] = (future, sgName or sgURI, deadline)
+                self.unchecked.add(sgURI)
+        finally:
+            self.lock.release()
+        self.start()
+        self.wakeup.set()
+        return future
+
+    # -------------------------------------------- #
+    # - Returns True if notifications are applied
+    # -------------------------------------------- #
+    def isNotified(self):
+        '''
+          - @return: True if the states are updated by notifications
+        '''
+        return self.listener != None and self.listener.isSynchronized()
+
+    # -------------------------------------------- #
+    # - Watcher thread
+    # -------------------------------------------- #
+    def run(self):
+        nextPoll = 0
+        while not self.stopped.is_set():
+            self.wakeup.clear()
+            self.lock.acquire()
+            try:
+                # new storage groups are checked at once, all storage groups
+                # once per interval unless notifications are applied
+                polling = not self.isNotified() and time.time() >= nextPoll
+                if polling:
+                    uris = self.watched.keys()
+                else:
+                    uris = list(self.unchecked)
+                self.unchecked.clear()
+            finally:
+                self.lock.release()
+            if polling:
+                nextPoll = time.time() + self.pollInterval
+            if len(uris) != 0:
+                try:
+                    self.poll(uris)
+                except Exception as exc:
+                    log.warning("Fulfillment state poll failed: %s", exc)
+            self.expire()
+            self.wakeup.wait(WATCH_CHECK_INTERVAL)
+
+    # -------------------------------------------- #
+    # - Polls storage groups
+    # -------------------------------------------- #
+    def poll(self,
+             uris   # URIs of the storage groups
+             ):
+        '''
+          - Gets the fulfillment states of the storage groups by a single
+          - list request. A storage group without state in the list is
+          - read by its own request
+          - @param uris: URIs of the storage groups
+        '''
+        self.polls += 1
+        listed = dict()
+        for sgItem in getStorageGroupList(self.hmcConn, cpcURI=self.cpcURI):
+            listed[sgItem.get('object-uri')] = sgItem
+        for uri in uris:
+            state = listed.get(uri, {}).get('fulfillment-state')
+            if state == None:
+                try:
+                    if self.hmcConn.objectCache != None:
+                        self.hmcConn.objectCache.invalidate(uri)
+                    sgProps = getStorageGroupProperties(self.hmcConn, sgURI=uri,
+                                                        properties=['fulfillment-state'])
+                    state = sgProps.get('fulfillment-state')
+                except HMCException as exc:
+                    if getExceptionHTTPStatus(exc) == 404:
+                        self.fail(uri, "the storage group does not exist any more")
+                        continue
+                    raise exc
+            self.setState(uri, state)
+
+    # -------------------------------------------- #
+    # - Applies notification
+    # -------------------------------------------- #
+    def applyNotification(self,
+                          notifType,    # notification type
+                          uri,          # object URI
+                          headers,      # dictionary of message headers
+                          content       # decoded message body, None if empty
+                          ):
+        if notifType != NOTIFICATION_PROPERTY_CHANGE or content == None or uri not in self.watched:
+            return
+        for report in content.get('change-reports', []):
+            if report.get('property-name') == 'fulfillment-state':
+                self.notified += 1
+                self.setState(uri, report.get('new-value'))
+
+    # -------------------------------------------- #
+    # - Stores state of storage group
+    # -------------------------------------------- #
+    def setState(self,
+                 uri,       # storage group URI
+                 state      # fulfillment state
+                 ):
+        self.lock.acquire()
+        try:
+            if uri not in self.watched:
+                return
+            (future, sgName, deadline) = self.watched[uri]
+            oldState = self.states.get(uri)
+            self.states[uri] = state
+            if state == FULFILLMENT_COMPLETE:
+                self.watched.pop(uri)
+            else:
+                future = None
+        finally:
+            self.lock.release()
+        if state != oldState:
+            log.info("Storage group %s is in %s state", sgName, state)
+            if self.callback != None:
+                try:
+                    self.callback(uri, sgName, state, oldState)
+                except Exception as exc:
+                    log.error("Fulfillment callback failed: %s", exc)
+        if future != None:
+            future.setResult(value=uri)
+
+    # -------------------------------------------- #
+    # - Fails storage group
+    # -------------------------------------------- #
+    def fail(self,
+             uri,       # storage group URI
+             reason     # description of the failure
+             ):
+        self.lock.acquire()
+        try:
+            if uri not in self.watched:
+                return
+            (future, sgName, deadline) = self.watched.pop(uri)
+            state = self.states.get(uri)
+        finally:
+            self.lock.release()
+        exc = HMCException("HMCFulfillmentWatcher",
+                           "Storage group %s is in %s state, %s" % (sgName, state, reason))
+        future.setResult(exc=exc)
+
+    # -------------------------------------------- #
+    # - Fails storage groups after timeout
+    # -------------------------------------------- #
+    def expire(self):
+        now = time.time()
+        for uri, (future, sgName, deadline) in self.watched.items():
+            # a storage group is checked once at least
+            if deadline != None and now >= deadline and uri not in self.unchecked:
+                self.fail(uri, "not complete after %s seconds" % (self.timeout))
+
+    # -------------------------------------------- #
+    # - Returns state of storage group
+    # -------------------------------------------- #
+    def getState(self,
+                 sgURI      # storage group URI
+                 ):
+        '''
+          - @return: last known fulfillment state, None if not known yet
+        '''
+        return self.states.get(sgURI)
+
+    # -------------------------------------------- #
+    # - Returns watcher counters
+    # -------------------------------------------- #
+    def getSummary(self):
+        '''
+          - @return: summary line with the number of watched storage
+          -          groups, polls and notifications
+        '''
+        return "%d storage group(s) watched, %d waiting, %d poll(s), %d notification(s)" % (
+            len(self.futures), len(self.watched), self.polls, self.notified)
@@ -0,0 +1,722 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides the in-memory inventory of DPM resources of one
+# - CPC (partitions, NICs, HBAs, virtual functions, virtual switches,
+# - adapters, storage groups, storage volumes, virtual storage resources
+# - and storage control units), keyed by object/element URI.
+# - The inventory is loaded with as few round-trips as possible by the
+# - HMC Get Inventory service; objects which are not in the inventory
+# - are fetched from HMC on first use and kept for later lookups.
+# - A fetch plan loads all objects read by a backup before it is
+# - assembled: referenced URIs are collected level by level and every
+# - object is fetched once, concurrently with the rest of its level.
+# - Classes:
+#        HMCInventory - URI keyed object graph of one CPC
+#        HMCFetchPlan - fetches objects referenced from root objects
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+import hmcAsync
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+# ======= CONSTANTS =========
+# resource classes requested from Get Inventory service, element
+# resources (nic, hba, virtual-function, storage-volume, ...) of these
+# classes are returned together with their parents
+INVENTORY_RESOURCE_CLASSES = ['partition',
+                              'adapter',
+                              'virtual-switch',
+                              'storage-group',
+                              'storage-control-unit']
+
+# properties of a parent object which list URIs of its elements
+ELEMENT_URI_PROPERTIES = {'nic': 'nic-uris',
+                          'hba': 'hba-uris',
+                          'virtual-function': 'virtual-function-uris',
+                          'storage-volume': 'storage-volume-uris',
+                          'virtual-storage-resource': 'virtual-storage-resource-uris'}
+
+# URI and response key of list operations for element resources
+ELEMENT_LIST_OPERATIONS = {'storage-volume': ('%s/storage-volumes', 'storage-volumes'),
+                           'virtual-storage-resource': ('%s/virtual-storage-resources', 'virtual-storage-resources'),
+                           'nic': ('%s/nics', 'nics'),
+                           'hba': ('%s/hbas', 'hbas'),
+                           'virtual-function': ('%s/virtual-functions', 'virtual-functions')}
+
+# HTTP statuses meaning that Get Inventory service is not available
+INVENTORY_UNAVAILABLE_STATUSES = [400, 403, 404, 501]
+
+# properties always requested with a property list, as the inventory
+# indexes objects by them
+INVENTORY_INDEX_PROPERTIES = ['class', 'parent']
+# ======= CONSTANTS =========
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCInventory object ------------------------------ #
+# ------------------------------------------------------------------ #
+# - URI keyed object graph of one CPC
+# ------------------------------------------------------------------ #
+class HMCInventory:
+    '''
+      - URI keyed object graph of DPM resources of one CPC.
+      - getObject() returns properties from memory, and fetches them
+      - from HMC (once) if the object has not been loaded yet.
+      - Objects fetched with a property list are kept as partial, and
+      - properties missing from them are fetched on later requests
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 hmcConn,       # HMCConnection object
+                 cpcURI         # URI of the CPC
+                 ):
+        '''
+          - Constructor
+          - @param hmcConn: HMCConnection object
+          - @param cpcURI:  URI of the CPC
+        '''
+        self.hmcConn = hmcConn
+        self.cpcURI = cpcURI
+        self.lock = threading.RLock()
+        self.objects = dict()       # {<uri>: <properties>}
+        self.classes = dict()       # {<class>: [<uri>, ...]}
+        self.loadedClasses = set()  # classes loaded for the whole CPC
+        self.partial = dict()       # {<uri>: <set of fetched property names>}
+        self.pending = dict()       # {<uri>: <event set when fetched>}, fetches in progress
+        self.fetchCount = 0         # number of objects fetched one by one
+
+    def __contains__(self, uri):
+        return uri in self.objects
+
+    def __len__(self):
+        return len(self.objects)
+
+    # -------------------------------------------- #
+    # - Adds object to the inventory
+    # -------------------------------------------- #
+    def add(self,
+            props,          # object properties
+            objClass=None,  # object class, if not in the properties
+            uri=None,       # object URI, if not in the properties
+            partial=None    # names of the selected properties in props
+            ):
+        '''
+          - Adds object (or element) to the inventory. Partial properties
+          - are merged into the properties already loaded
+          - @param props:    object properties
+          - @param objClass: object class, if there is no 'class' property
+          - @param uri:      object URI, if there is no URI property
+          - @param partial:  names of the properties requested, if props
+          -                  contain selected properties only
+          - @return: URI of the object
+        '''
+        if uri == None:
+            uri = props.get('object-uri', props.get('element-uri'))
+        elif 'object-uri' not in props and 'element-uri' not in props:
+            props[isElementURI(uri) and 'element-uri' or 'object-uri'] = uri
+        if objClass == None:
+            objClass = props.get('class')
+        self.lock.acquire()
+        try:
+            if uri not in self.objects:
+                self.classes.setdefault(objClass, []).append(uri)
+            elif partial != None:
+                self.objects[uri].update(props)
+                if uri in self.partial:
+                    self.partial[uri].update(partial)
+                return uri
+            self.objects[uri] = props
+            if partial != None:
+                self.partial[uri] = set(partial)
+            else:
+                self.partial.pop(uri, None)
+        finally:
+            self.lock.release()
+        return uri
+
+    # -------------------------------------------- #
+    # - Applies property changes to loaded object
+    # -------------------------------------------- #
+    def update(self,
+               uri,         # object or element URI
+               changes      # {<property name>: <new value>}
+               ):
+        '''
+          - Applies property changes (e.g. reported by HMC notifications)
+          - to the object, if it is loaded
+          - @param uri:     object or element URI
+          - @param changes: dictionary {<property name>: <new value>}
+          - @return: True if the object is loaded and has been updated
+        '''
+        self.lock.acquire()
+        try:
+            props = self.objects.get(uri)
+            if props == None:
+                return False
+            props.update(changes)
+            if uri in self.partial:
+                self.partial[uri].update(changes.keys())
+            return True
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Removes object and its elements
+    # -------------------------------------------- #
+    def remove(self,
+               uri          # object or element URI
+               ):
+        '''
+          - Removes the object (e.g. deleted on HMC) and its elements
+          - @param uri:  object or element URI
+          - @return: number of removed objects
+        '''
+        self.lock.acquire()
+        try:
+            removed = set([objURI for objURI in self.objects
+                           if objURI == uri or objURI.startswith(uri + '/')])
+            for objURI in removed:
+                del self.objects[objURI]
+                self.partial.pop(objURI, None)
+            if len(removed) != 0:
+                for objClass, uriList in self.classes.items():
+                    self.classes[objClass] = [objURI for objURI in uriList if objURI not in removed]
+            return len(removed)
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Checks if object is loaded with properties
+    # -------------------------------------------- #
+    def isLoaded(self,
+                 uri,               # object or element URI
+                 properties=None    # property names, None for all
+                 ):
+        '''
+          - @return: True if the object is loaded with all requested
+          -          properties (all properties if properties is None)
+        '''
+        props = self.objects.get(uri)
+        if props == None:
+            return False
+        if uri not in self.partial:
+            return True
+        if properties == None:
+            return False
+        # properties not returned by HMC do not apply to the object
+        for propName in properties:
+            if propName not in self.partial[uri] and propName not in props:
+                return False
+        return True
+
+    # -------------------------------------------- #
+    # - Returns property list to be requested
+    # -------------------------------------------- #
+    def requestedProperties(self,
+                            properties  # property names, None for all
+                            ):
+        if properties == None:
+            return None
+        return list(properties) + [p for p in INVENTORY_INDEX_PROPERTIES if p not in properties]
+
+    # -------------------------------------------- #
+    # - Returns object properties by URI
+    # -------------------------------------------- #
+    def getObject(self,
+                  uri,              # object or element URI
+                  fetch=True,       # fetch from HMC if not loaded
+                  properties=None   # property names, None for all
+                  ):
+        '''
+          - Returns object properties by URI. If the object is not loaded
+          - (with the requested properties) it is fetched from HMC and
+          - added to the inventory
+          - @param uri:        object or element URI
+          - @param fetch:      fetch from HMC if not loaded, otherwise
+          -                    return what is loaded (or None)
+          - @param properties: property names needed by the caller, only
+          -                    those are fetched. None means all properties
+          - An object requested by several threads at the same time is
+          - fetched once, the other threads wait for that fetch
+        '''
+        while True:
+            self.lock.acquire()
+            try:
+                if self.isLoaded(uri, properties) or not fetch:
+                    return self.objects.get(uri)
+                pending = self.pending.get(uri)
+                if pending == None:
+                    pending = threading.Event()
+                    self.pending[uri] = pending
+                    break
+            finally:
+                self.lock.release()
+            # fetched by another thread, check its properties when done
+            pending.wait()
+        try:
+            props = getHMCObjectProperties(self.hmcConn, uri,
+                                           "Get Object Properties",
+                                           properties=self.requestedProperties(properties))
+            self.lock.acquire()
+            try:
+                self.fetchCount += 1
+            finally:
+                self.lock.release()
+            self.add(props, uri=uri, partial=self.requestedProperties(properties))
+            return self.objects[uri]
+        finally:
+            self.lock.acquire()
+            try:
+                self.pending.pop(uri, None)
+            finally:
+                self.lock.release()
+            pending.set()
+
+    # -------------------------------------------- #
+    # - Fetches not loaded objects concurrently
+    # -------------------------------------------- #
+    def prefetch(self,
+                 uriList,               # object or element URIs
+                 properties=None,       # property names, None for all
+                 maxConcurrent=None     # max number of requests in flight, None for no limit
+                 ):
+        '''
+          - Fetches objects, which are not loaded yet, concurrently
+          - @param uriList:       object or element URIs
+          - @param properties:    property names to be fetched, None for all
+          - @param maxConcurrent: max number of requests in flight at the
+          -                       same time, None for no limit
+        '''
+        missing = set([uri for uri in uriList if uri != None and not self.isLoaded(uri, properties)])
+        if len(missing) == 0:
+            return
+        fetched = hmcAsync.getHMCObjectsAsync(self.hmcConn, missing,
+                                              properties=self.requestedProperties(properties),
+                                              maxConcurrent=maxConcurrent)
+        self.lock.acquire()
+        try:
+            self.fetchCount += len(fetched)
+        finally:
+            self.lock.release()
+        for uri in missing:
+            self.add(fetched[uri], uri=uri, partial=self.requestedProperties(properties))
+
+    # -------------------------------------------- #
+    # - Returns objects of a class
+    # -------------------------------------------- #
+    def listObjects(self,
+                    objClass    # object class, e.g. 'partition'
+                    ):
+        '''
+          - Returns properties of all loaded objects of a class
+          - @param objClass: object class, e.g. 'partition'
+        '''
+        return [self.objects[uri] for uri in self.classes.get(objClass, [])]
+
+    # -------------------------------------------- #
+    # - Returns elements of a parent object
+    # -------------------------------------------- #
+    def getElements(self,
+                    parentURI,          # URI of parent object
+                    elemClass,          # element class, e.g. 'storage-volume'
+                    properties=None,    # element property names, None for all
+                    filters=None,       # dictionary {<property name>: <value>}
+                    maxConcurrent=None  # max number of requests in flight, None for no limit
+                    ):
+        '''
+          - Returns properties of elements of a parent object. If the parent
+          - lists its element URIs, missing elements are fetched concurrently.
+          - Otherwise the elements are listed by the HMC list operation, and
+          - the items of the list response are returned
+          - @param parentURI:     URI of parent object
+          - @param elemClass:     element class, e.g. 'storage-volume'
+          - @param properties:    element property names, None for all
+          - @param filters:       elements listed by the parent, which do not
+          -                       match the filters, are skipped before their
+          -                       properties are fetched
+          - @param maxConcurrent: max number of elements fetched at the same
+          -                       time, None for no limit
+        '''
+        uriProp = ELEMENT_URI_PROPERTIES.get(elemClass)
+        parent = self.getObject(parentURI, properties=uriProp and [uriProp])
+        if uriProp != None and parent.get(uriProp) != None:
+            uriList = parent[uriProp]
+            if filters:
+                uriList = self.filterElements(parentURI, elemClass, uriList, filters,
+                                              properties=properties, maxConcurrent=maxConcurrent)
+            self.prefetch(uriList, properties, maxConcurrent=maxConcurrent)
+            return [self.objects[uri] for uri in uriList]
+        listURI, responseKey = ELEMENT_LIST_OPERATIONS[elemClass]
+        return getHMCObjectList(self.hmcConn,
+                                listURI % parentURI,
+                                "List %s elements" % (elemClass),
+                                responseKey,
+                                httpBadStatuses=[400, 404])
+
+    # -------------------------------------------- #
+    # - Returns elements matching filters
+    # -------------------------------------------- #
+    def filterElements(self,
+                       parentURI,           # URI of parent object
+                       elemClass,           # element class, e.g. 'storage-volume'
+                       uriList,             # element URIs listed by the parent
+                       filters,             # dictionary {<property name>: <value>}
+                       properties=None,     # element property names, None for all
+                       maxConcurrent=None   # max number of requests in flight, None for no limit
+                       ):
+        '''
+          - Returns the elements of uriList matching the filters. Loaded
+          - elements are matched in memory, the others by a single list
+          - request with the filters in its query string. If HMC rejects
+          - the filters, the items of the full list are matched if they
+          - have the filtered properties, otherwise the elements are
+          - fetched (with properties and the filtered properties) and
+          - matched in memory
+          - @return: list of element URIs in the order of uriList
+        '''
+        log.debug("Entered")
+        try:
+            unknown = set([uri for uri in uriList if not self.isLoaded(uri, filters.keys())])
+            matched = set()
+            if len(unknown) != 0:
+                listURI, responseKey = ELEMENT_LIST_OPERATIONS[elemClass]
+                listURI = listURI % parentURI
+                actionDesc = "List %s elements" % (elemClass)
+                items = None
+                if listURI not in self.hmcConn.rejectedFilterURIs:
+                    try:
+                        items = getHMCObjectList(self.hmcConn,
+                                                 listURI + buildQueryString(filters),
+                                                 actionDesc,
+                                                 responseKey,
+                                                 httpBadStatuses=[400, 404],
+                                                 exceptionLogLevel=logging.DEBUG)
+                        matched = set([item.get('element-uri') for item in items])
+                    except HMCException as exc:
+                        if getExceptionHTTPStatus(exc) != 400:
+                            raise exc
+                        log.warning("%s: query filters %s rejected by HMC, filtering on client side",
+                                    actionDesc, filters)
+                        self.hmcConn.rejectedFilterURIs.add(listURI)
+                if items == None:
+                    items = getHMCObjectList(self.hmcConn, listURI, actionDesc, responseKey,
+                                             httpBadStatuses=[400, 404])
+                    if len(items) != 0 and all([propName in item for item in items for propName in filters]):
+                        matched = set([item.get('element-uri') for item in items if matchFilters(item, filters)])
+                    else:
+                        # nothing to filter by, the elements are fetched once for both
+                        fetchProperties = properties
+                        if fetchProperties != None:
+                            fetchProperties = list(properties) + [p for p in filters if p not in properties]
+                        self.prefetch(unknown, fetchProperties, maxConcurrent=maxConcurrent)
+                        unknown = set()
+            return [uri for uri in uriList
+                    if (uri in unknown and uri in matched) or
+                       (uri not in unknown and matchFilters(self.objects[uri], filters))]
+        except HMCException as exc:
+            exc.setMethod("HMCInventory.filterElements")
+            raise exc
+        finally:
+            log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Checks if object belongs to the CPC
+    # -------------------------------------------- #
+    def belongsToCPC(self,
+                     props      # object properties
+                     ):
+        if props.get('class') == 'storage-group':
+            return props.get('cpc-uri') == self.cpcURI
+        if props.get('class') == 'storage-control-unit':
+            return props.get('parent', self.cpcURI) == self.cpcURI or props.get('cpc-uri') == self.cpcURI
+        return props.get('parent') == self.cpcURI
+
+    # -------------------------------------------- #
+    # - Loads inventory by Get Inventory service
+    # -------------------------------------------- #
+    def loadFromInventoryService(self,
+                                 resources=INVENTORY_RESOURCE_CLASSES
+                                 ):
+        '''
+          - Loads resources of the CPC (and their elements) by a single
+          - Get Inventory request
+          - @param resources: resource classes to be requested
+          - @return: True if loaded, False if the service is not available
+        '''
+        log.debug("Entered")
+        try:
+            resp = getHMCObject(self.hmcConn,
+                                WSA_URI_INVENTORY,
+                                "Get Inventory",
+                                httpMethod=WSA_COMMAND_POST,
+                                httpBody=json.dumps({'resources': resources}),
+                                httpBadStatuses=[400, 403, 404, 501],
+                                exceptionLogLevel=logging.DEBUG)
+        except HMCException as exc:
+            if getExceptionHTTPStatus(exc) in INVENTORY_UNAVAILABLE_STATUSES:
+                log.warning("Get Inventory service is not available: %s", exc.message)
+                return False
+            exc.setMethod("HMCInventory.loadFromInventoryService")
+            raise exc
+        finally:
+            log.debug("Completed")
+        if type(resp) == dict:
+            resp = resp.get('resources', [])
+        # top-level objects first, then the elements of the kept objects
+        elements = []
+        for props in resp:
+            if 'object-uri' in props:
+                if self.belongsToCPC(props):
+                    self.add(props)
+            elif 'element-uri' in props:
+                elements.append(props)
+        for props in elements:
+            if props.get('parent') in self.objects:
+                self.add(props)
+        self.loadedClasses.update(resources)
+        return True
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCFetchPlan object ------------------------------ #
+# ------------------------------------------------------------------ #
+# - Fetches objects referenced from root objects into the inventory
+# ------------------------------------------------------------------ #
+class HMCFetchPlan:
+    '''
+      - Plan of the objects read by a backup. Rules define which URI
+      - properties of an object class are followed, and which properties
+      - of the referenced objects are needed. execute() fetches the roots,
+      - then the objects they reference, level by level: the URIs of a
+      - level are deduplicated (property lists of the same URI merged)
+      - and fetched concurrently. Objects already loaded are not fetched
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 inventory      # HMCInventory object
+                 ):
+        '''
+          - Constructor
+          - @param inventory: HMCInventory object, the objects are fetched into
+        '''
+        self.inventory = inventory
+        self.roots = dict()         # {<uri>: <set of property names> or None}
+        self.rules = dict()         # {<class>: [(<uri property>, <property names>, <condition>), ...]}
+        self.levels = 0             # number of levels of the last execute()
+        self.objectCount = 0        # number of objects in the plan
+        self.fetchCount = 0         # number of objects fetched
+
+    # -------------------------------------------- #
+    # - Adds root objects
+    # -------------------------------------------- #
+    def addRoots(self,
+                 uriList,           # object URIs
+                 properties=None    # property names, None for all
+                 ):
+        '''
+          - Adds root objects, e.g. the partitions of a list response
+          - @param uriList:    object URIs
+          - @param properties: property names needed, None for all
+        '''
+        for uri in uriList:
+            self.merge(self.roots, uri, properties)
+
+    # -------------------------------------------- #
+    # - Adds rule following a URI property
+    # -------------------------------------------- #
+    def addRule(self,
+                objClass,           # class of the referencing objects
+                uriProperty,        # property name or function returning URIs
+                properties=None,    # property names of the referenced objects
+                condition=None      # function, follow if condition(props) is True
+                ):
+        '''
+          - Adds rule: objects referenced by uriProperty of objClass objects
+          - are fetched with the properties
+          - @param objClass:    class of the referencing objects, e.g. 'partition'
+          - @param uriProperty: name of a property holding a URI or URI list,
+          -                     or a function returning them from the properties
+          - @param properties:  property names of the referenced objects, None for all
+          - @param condition:   function, the property is followed only if
+          -                     condition(props) returns True
+        '''
+        self.rules.setdefault(objClass, []).append((uriProperty, properties, condition))
+
+    # -------------------------------------------- #
+    # - Merges property names requested for a URI
+    # -------------------------------------------- #
+    def merge(self,
+              level,        # {<uri>: <set of property names> or None}
+              uri,          # object URI
+              properties    # property names, None for all
+              ):
+        if uri in level and level[uri] == None:
+            return
+        if properties == None:
+            level[uri] = None
+        else:
+            level.setdefault(uri, set()).update(properties)
+
+    # -------------------------------------------- #
+    # - Returns URIs referenced by an object
+    # -------------------------------------------- #
+    def getReferences(self,
+                      props     # object properties
+                      ):
+        '''
+          - @return: list of (<uri>, <property names>) pairs referenced by
+          -          the object according to the rules of its class
+        '''
+        references = []
+        for (uriProperty, properties, condition) in self.rules.get(props.get('class'), []):
+            if condition != None and not condition(props):
+                continue
+            if callable(uriProperty):
+                uris = uriProperty(props)
+            else:
+                uris = props.get(uriProperty)
+            if uris == None:
+                continue
+            if not isinstance(uris, list):
+                uris = [uris]
+            references += [(uri, properties) for uri in uris if uri != None]
+        return references
+
+    # -------------------------------------------- #
+    # - Returns loaded objects reachable from an object
+    # -------------------------------------------- #
+    def getClosure(self,
+                   uri,             # object URI
+                   properties=None  # property names, None for all
+                   ):
+        '''
+          - Follows the rules from an object through the objects loaded in
+          - the inventory, nothing is fetched from HMC
+          - @param uri:        object URI
+          - @param properties: property names of the object, None for all
+          - @return: dictionary {<uri>: <property names>} of the object and
+          -          the loaded objects referenced by it (directly or not)
+        '''
+        closure = dict()
+        pending = [(uri, properties)]
+        while len(pending) != 0:
+            objURI, objProperties = pending.pop()
+            if objURI in closure or not self.inventory.isLoaded(objURI, objProperties):
+                continue
+            closure[objURI] = objProperties
+            pending += self.getReferences(self.inventory.objects[objURI])
+        return closure
+
+    # -------------------------------------------- #
+    # - Fetches the objects of the plan
+    # -------------------------------------------- #
+    def execute(self):
+        '''
+          - Fetches the root objects and all objects referenced from them
+          - into the inventory, level by level
+          - @return: number of objects fetched
+        '''
+        log.debug("Entered")
+        try:
+            inventory = self.inventory
+            done = set()
+            level = dict(self.roots)
+            self.levels = 0
+            self.objectCount = 0
+            self.fetchCount = 0
+            while len(level) != 0:
+                self.levels += 1
+                self.objectCount += len(level)
+                # fetch the objects of the level, which are not loaded yet
+                futures = []
+                for uri, properties in level.items():
+                    if inventory.isLoaded(uri, properties):
+                        continue
+                    requested = inventory.requestedProperties(properties)
+                    futures.append((uri, requested,
+                                    hmcAsync.getHMCObjectPropertiesAsync(inventory.hmcConn, uri,
+                                                                         "Get Object Properties",
+                                                                         properties=requested)))
+                fetched = hmcAsync.gatherResults([future for (uri, requested, future) in futures])
+                for (uri, requested, future), props in zip(futures, fetched):
+                    inventory.add(props, uri=uri, partial=requested)
+                self.fetchCount += len(futures)
+                # next level: objects referenced by this level
+                done.update(level.keys())
+                nextLevel = dict()
+                for uri in level.keys():
+                    for refURI, properties in self.getReferences(inventory.objects[uri]):
+                        if refURI in done and inventory.isLoaded(refURI, properties):
+                            continue
+                        self.merge(nextLevel, refURI, properties)
+                level = nextLevel
+            inventory.lock.acquire()
+            try:
+                inventory.fetchCount += self.fetchCount
+            finally:
+                inventory.lock.release()
+            return self.fetchCount
+        except HMCException as exc:
+            exc.setMethod("HMCFetchPlan.execute")
+            raise exc
+        finally:
+            log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Returns summary of the last execute()
+    # -------------------------------------------- #
+    def getSummary(self):
+        return "%d objects in %d levels, %d fetched from HMC" % (self.objectCount, self.levels,
+                                                                 self.fetchCount)
+
+
+# ----------------------------------------------------------------- #
+# ----------- Common functions ------------------------------------ #
+# ----------------------------------------------------------------- #
+def isElementURI(uri):
+    '''
+      - @return: True if uri is an element URI (/api/<class>/<id>/<element class>/<id>)
+    '''
+    return len(uri.strip('/').split('/')) > 3
+
+
+def collectCPCInventory(hmcConn,            # HMCConnection object
+                        cpcURI,             # URI of the CPC
+                        bulk=True           # load inventory in bulk
+                        ):
+    '''
+      - Creates the inventory of a CPC. In bulk mode the resources are
+      - loaded by the Get Inventory service where it is available, and
+      - elements which were not returned are fetched concurrently.
+      - Otherwise (or if the service is not available) the objects are
+      - fetched from HMC on first use
+      - @return: HMCInventory object
+    '''
+    log.debug("Entered")
+    try:
+        inventory = HMCInventory(hmcConn, cpcURI)
+        if bulk and inventory.loadFromInventoryService():
+            # fetch referenced elements, which were not in the response
+            elemURIs = []
+            for parClass in ['partition', 'storage-group']:
+                for props in inventory.listObjects(parClass):
+                    for uriProp in ELEMENT_URI_PROPERTIES.values():
+                        elemURIs += props.get(uriProp) or []
+            inventory.prefetch(elemURIs)
+        return inventory
+    except HMCException as exc:
+        exc.setMethod("collectCPCInventory")
+        raise exc
+    finally:
+        log.debug("Completed")
@@ -0,0 +1,760 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides the subscriber of the JMS notification topic of
+# - an HMC API session. HMC publishes property-change, status-change
+# - and inventory-change notifications of the objects the session may
+# - access to this topic, and the listener applies them to the object
+# - cache of HMCConnection and to the attached inventories, so that the
+# - state of the objects is read from memory instead of polling HMC.
+# - The topic is read by a minimal STOMP client, and a stub broker is
+# - provided to drive the listener without HMC.
+# - Classes:
+#        HMCStompConnection      - STOMP frames over a TCP (SSL) socket
+#        HMCNotificationListener - applies notifications of the session
+#        HMCStubBroker           - local STOMP broker publishing notifications
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+from hmcInventory import isElementURI
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+# ======= CONSTANTS =========
+# STOMP protocol versions accepted by the client
+STOMP_VERSIONS = '1.0,1.1,1.2'
+# seconds the socket is read before the listener checks for stop
+STOMP_POLL_INTERVAL = 1
+# STOMP header escapes (not applied to CONNECT and CONNECTED frames, nor by STOMP 1.0)
+STOMP_HEADER_ESCAPES = [('\\', '\\\\'), ('\r', '\\r'), ('\n', '\\n'), (':', '\\c')]
+
+# notification types applied to the object cache and inventories
+NOTIFICATION_PROPERTY_CHANGE = 'property-change'
+NOTIFICATION_STATUS_CHANGE = 'status-change'
+NOTIFICATION_INVENTORY_CHANGE = 'inventory-change'
+
+# properties reported by status-change notifications
+STATUS_CHANGE_PROPERTIES = {'new-status': 'status',
+                            'new-additional-status': 'additional-status',
+                            'has-unacceptable-status': 'has-unacceptable-status'}
+# ======= CONSTANTS =========
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCStompConnection object ------------------------ #
+# ------------------------------------------------------------------ #
+# - STOMP frames over a TCP (SSL) socket
+# ------------------------------------------------------------------ #
+class HMCStompConnection:
+    '''
+      - Sends and receives STOMP frames over a TCP (or SSL) socket.
+      - Used by the listener as a client, and by the stub broker for
+      - the sockets of its clients
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 host=None,     # host name/IP address of the broker
+                 port=WSA_PORT_STOMP_SSL,  # STOMP TCP port of the broker
+                 useSSL=True,   # use SSL to connect to the broker
+                 timeout=60,    # socket timeout
+                 sock=None      # connected socket, instead of host/port
+                 ):
+        '''
+          - Constructor
+          - @param host:    host name/IP address of the broker
+          - @param port:    STOMP TCP port of the broker
+          - @param useSSL:  use SSL to connect to the broker
+          - @param timeout: socket timeout
+          - @param sock:    socket already connected, host and port are not used
+        '''
+        self.host = host
+        self.port = port
+        self.useSSL = useSSL
+        self.timeout = timeout
+        self.sock = sock
+        self.buffer = ''
+        self.version = '1.0'    # negotiated protocol version
+        self.sendLock = threading.Lock()
+
+    # -------------------------------------------- #
+    # - Opens socket to the broker
+    # -------------------------------------------- #
+    def open(self):
+        log.debug("Connecting to STOMP broker %s:%s...", self.host, self.port)
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        if self.useSSL:
+            sock = ssl._create_unverified_context().wrap_socket(sock, server_hostname=self.host)
+        self.sock = sock
+
+    # -------------------------------------------- #
+    # - Closes socket
+    # -------------------------------------------- #
+    def close(self):
+        if self.sock != None:
+            try:
+                self.sock.close()
+            except socket.error:
+                pass
+            self.sock = None
+
+    # -------------------------------------------- #
+    # - Checks if header values are escaped
+    # -------------------------------------------- #
+    def escapesHeaders(self,
+                       command  # frame command
+                       ):
+        return self.version != '1.0' and command not in ['CONNECT', 'CONNECTED']
+
+    # -------------------------------------------- #
+    # - Sends frame
+    # -------------------------------------------- #
+    def sendFrame(self,
+                  command,      # frame command, e.g. 'SUBSCRIBE'
+                  headers=None, # dictionary of frame headers
+                  body=''       # frame body
+                  ):
+        '''
+          - Sends STOMP frame
+          - @param command: frame command, e.g. 'SUBSCRIBE'
+          - @param headers: dictionary of frame headers
+          - @param body:    frame body
+        '''
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        lines = [command]
+        for name, value in (headers or {}).items():
+            name, value = [isinstance(item, unicode) and item or str(item).decode('utf-8')
+                           for item in (name, value)]
+            if self.escapesHeaders(command):
+                for char, escape in STOMP_HEADER_ESCAPES:
+                    name = name.replace(char, escape)
+                    value = value.replace(char, escape)
+            lines.append(('%s:%s' % (name, value)).encode('utf-8'))
+        if len(body) != 0:
+            lines.append('content-length:%d' % (len(body)))
+        frame = '\n'.join(lines) + '\n\n' + body + '\x00'
+        self.sendLock.acquire()
+        try:
+            self.sock.sendall(frame)
+        finally:
+            self.sendLock.release()
+
+    # -------------------------------------------- #
+    # - Reads more data from the socket
+    # -------------------------------------------- #
+    def receive(self):
+        '''
+          - Reads more data into the buffer
+          - @return: False if nothing has been received within the timeout
+        '''
+        try:
+            data = self.sock.recv(65536)
+        except socket.timeout:
+            return False
+        except ssl.SSLError as exc:
+            if 'timed out' in str(exc):
+                return False
+            raise
+        if len(data) == 0:
+            raise socket.error("STOMP connection closed by peer")
+        self.buffer += data
+        return True
+
+    # -------------------------------------------- #
+    # - Parses frame from the buffer
+    # -------------------------------------------- #
+    def parseFrame(self):
+        '''
+          - @return: (command, headers, body) of the first frame of the
+          -          buffer, None if the frame is not received completely
+        '''
+        # new lines between frames are heart-beats
+        self.buffer = self.buffer.lstrip('\r\n')
+        headerEnd = self.buffer.find('\n\n')
+        if headerEnd < 0:
+            return None
+        lines = self.buffer[:headerEnd].replace('\r\n', '\n').split('\n')
+        command = lines[0]
+        headers = dict()
+        for line in lines[1:]:
+            name, sep, value = line.decode('utf-8').partition(':')
+            if self.escapesHeaders(command):
+                name = unescapeHeader(name)
+                value = unescapeHeader(value)
+            # repeated headers, the first one is used
+            headers.setdefault(name, value)
+        bodyStart = headerEnd + 2
+        if 'content-length' in headers:
+            bodyEnd = bodyStart + int(headers['content-length'])
+            if len(self.buffer) <= bodyEnd:
+                return None
+        else:
+            bodyEnd = self.buffer.find('\x00', bodyStart)
+            if bodyEnd < 0:
+                return None
+        body = self.buffer[bodyStart:bodyEnd]
+        self.buffer = self.buffer[bodyEnd + 1:]
+        return (command, headers, body)
+
+    # -------------------------------------------- #
+    # - Receives frame
+    # -------------------------------------------- #
+    def readFrame(self,
+                  timeout=None  # seconds to wait, None for socket timeout
+                  ):
+        '''
+          - Receives STOMP frame
+          - @param timeout: seconds to wait for the frame, None for socket timeout
+          - @return: (command, headers, body), None if not received
+          -          within the timeout
+        '''
+        if timeout != None:
+            self.sock.settimeout(timeout)
+        try:
+            while True:
+                frame = self.parseFrame()
+                if frame != None:
+                    return frame
+                if not self.receive():
+                    return None
+        finally:
+            if timeout != None:
+                self.sock.settimeout(self.timeout)
+
+    # -------------------------------------------- #
+    # - Connects to the broker
+    # -------------------------------------------- #
+    def connect(self,
+                login,      # user ID
+                passcode    # user password
+                ):
+        '''
+          - Opens the socket and sends CONNECT frame
+          - @param login:    user ID
+          - @param passcode: user password
+        '''
+        log.debug("Entered")
+        try:
+            self.open()
+            self.sendFrame('CONNECT', {'accept-version': STOMP_VERSIONS,
+                                       'host': self.host,
+                                       'login': login,
+                                       'passcode': passcode})
+            frame = self.readFrame()
+            if frame == None or frame[0] != 'CONNECTED':
+                message = frame and frame[1].get('message', frame[2]) or "no response"
+                exc = HMCException("HMCStompConnection.connect",
+                                   "STOMP connection to %s:%s is refused: %s" % (self.host, self.port, message))
+                raise exc
+            self.version = frame[1].get('version', '1.0')
+        except HMCException as exc:
+            self.close()
+            raise exc
+        except (socket.error, ssl.SSLError) as exc:
+            self.close()
+            exc = HMCException("HMCStompConnection.connect",
+                               "Cannot connect to STOMP broker %s:%s" % (self.host, self.port),
+                               origException=exc)
+            raise exc
+        finally:
+            log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Subscribes to destination
+    # -------------------------------------------- #
+    def subscribe(self,
+                  destination,      # e.g. '/topic/<topic name>'
+                  subscriptionID    # ID of the subscription
+                  ):
+        self.sendFrame('SUBSCRIBE', {'destination': destination,
+                                     'id': subscriptionID,
+                                     'ack': 'auto'})
+
+    # -------------------------------------------- #
+    # - Disconnects from the broker
+    # -------------------------------------------- #
+    def disconnect(self):
+        if self.sock == None:
+            return
+        try:
+            self.sendFrame('DISCONNECT')
+        except (socket.error, ssl.SSLError):
+            pass
+        self.close()
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCNotificationListener object ------------------- #
+# ------------------------------------------------------------------ #
+# - Applies notifications of the API session
+# ------------------------------------------------------------------ #
+class HMCNotificationListener:
+    '''
+      - Subscribes to the notification topic of the API session and
+      - applies the notifications by a daemon thread:
+      -   property-change  - new property values are written to the cached
+      -                      responses and the loaded objects
+      -   status-change    - the same for the status properties
+      -   inventory-change - a removed object is dropped, and the cached
+      -                      list responses are dropped on add and remove
+      - The cache and the inventories are current as long as
+      - isSynchronized() is True. If the connection is lost or a
+      - notification is missed, the object cache is cleared and the
+      - callers have to read the objects from HMC again
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 hmcConn,                   # HMCConnection object (logged on)
+                 inventory=None,            # HMCInventory object to be updated
+                 host=None,                 # broker host, HMC host by default
+                 port=WSA_PORT_STOMP_SSL,   # STOMP TCP port of the broker
+                 useSSL=None                # use SSL, as HMC connection by default
+                 ):
+        '''
+          - Constructor
+          - @param hmcConn:   HMCConnection object (logged on)
+          - @param inventory: HMCInventory object to be updated
+          - @param host:      broker host name/IP address, HMC host by default
+          - @param port:      STOMP TCP port of the broker
+          - @param useSSL:    use SSL to connect to the broker, by default
+          -                   as the connection to HMC API
+        '''
+        self.hmcConn = hmcConn
+        self.inventories = []
+        if inventory != None:
+            self.inventories.append(inventory)
+        if host == None:
+            host = hmcConn.hmcAPIHost
+        if useSSL == None:
+            useSSL = hmcConn.useHttps
+        self.conn = HMCStompConnection(host, port, useSSL=useSSL)
+        self.topic = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.synchronized = False
+        self.lastSequenceNr = None
+        self.callbacks = []
+        self.received = 0       # number of received notifications
+        self.applied = 0        # number of notifications applied to cache/inventories
+
+    # -------------------------------------------- #
+    # - Attaches inventory to be updated
+    # -------------------------------------------- #
+    def attachInventory(self,
+                        inventory   # HMCInventory object
+                        ):
+        if inventory not in self.inventories:
+            self.inventories.append(inventory)
+
+    # -------------------------------------------- #
+    # - Adds notification callback
+    # -------------------------------------------- #
+    def addCallback(self,
+                    callback    # called as callback(notifType, uri, headers, content)
+                    ):
+        '''
+          - Adds function called by the listener thread for every
+          - notification, after it has been applied
+          - @param callback: called as callback(notifType, uri, headers, content),
+          -                  content is the decoded body (None if empty)
+        '''
+        self.callbacks.append(callback)
+
+    # -------------------------------------------- #
+    # - Connects to the broker and starts the listener thread
+    # -------------------------------------------- #
+    def start(self,
+              login=None,       # user ID, as HMC connection by default
+              passcode=None     # user password, as HMC connection by default
+              ):
+        '''
+          - Subscribes to the notification topic of the API session and
+          - starts the listener thread
+          - @param login:    user ID, as HMC connection by default
+          - @param passcode: user password, as HMC connection by default
+        '''
+        log.debug("Entered")
+        try:
+            self.topic = self.hmcConn.notificationTopic
+            if self.topic == None:
+                exc = HMCException("HMCNotificationListener.start",
+                                   "There is no notification topic, HMC session is not logged on")
+                raise exc
+            if login == None:
+                login = self.hmcConn.userID
+            if passcode == None:
+                passcode = self.hmcConn.userPassword
+            self.conn.connect(login, passcode)
+            self.conn.subscribe('/topic/' + self.topic, 'hmc-notifications')
+            self.stopped.clear()
+            self.synchronized = True
+            self.lastSequenceNr = None
+            self.thread = threading.Thread(target=self.run,
+                                           name="HMCNotificationListener")
+            self.thread.daemon = True
+            self.thread.start()
+            log.info("Listening to HMC notification topic %s", self.topic)
+        except HMCException as exc:
+            exc.setMethod("HMCNotificationListener.start")
+            raise exc
+        finally:
+            log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Stops the listener thread
+    # -------------------------------------------- #
+    def stop(self):
+        log.debug("Entered")
+        self.stopped.set()
+        self.synchronized = False
+        if self.thread != None:
+            # the thread checks for stop every STOMP_POLL_INTERVAL seconds
+            self.thread.join(STOMP_POLL_INTERVAL * 5)
+            self.thread = None
+        self.conn.disconnect()
+        log.info("HMC notifications: %s", self.getSummary())
+        log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Checks if cache and inventories are current
+    # -------------------------------------------- #
+    def isSynchronized(self):
+        '''
+          - @return: True if all notifications of the session have been
+          -          applied since the listener was started
+        '''
+        return self.synchronized
+
+    # -------------------------------------------- #
+    # - Marks cache and inventories outdated
+    # -------------------------------------------- #
+    def desynchronize(self,
+                      reason    # description, for logging
+                      ):
+        if not self.synchronized:
+            return
+        log.warning("HMC notifications are not applied any more: %s", reason)
+        self.synchronized = False
+        # cached responses may miss changes from now on
+        if self.hmcConn.objectCache != None:
+            self.hmcConn.objectCache.clear()
+
+    # -------------------------------------------- #
+    # - Listener thread
+    # -------------------------------------------- #
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    frame = self.conn.readFrame(timeout=STOMP_POLL_INTERVAL)
+                except (socket.error, ssl.SSLError, ValueError) as exc:
+                    if not self.stopped.is_set():
+                        self.desynchronize("connection lost (%s)" % (exc))
+                    return
+                if frame == None:
+                    continue
+                command, headers, body = frame
+                if command == 'MESSAGE':
+                    try:
+                        self.applyNotification(headers, body)
+                    except Exception as exc:
+                        # the notification may be applied in part only
+                        self.desynchronize("notification cannot be applied (%s)" % (exc))
+                elif command == 'ERROR':
+                    self.desynchronize("broker error (%s)" % (headers.get('message', body)))
+                    return
+        finally:
+            # nothing is applied any more once the thread has exited
+            self.desynchronize("the listener has been stopped")
+
+    # -------------------------------------------- #
+    # - Applies notification
+    # -------------------------------------------- #
+    def applyNotification(self,
+                          headers,  # dictionary of message headers
+                          body      # message body (JSON)
+                          ):
+        '''
+          - Applies notification to the object cache and the inventories
+          - @param headers: dictionary of message headers
+          - @param body:    message body (JSON)
+        '''
+        self.received += 1
+        sequenceNr = headers.get('session-sequence-nr')
+        if sequenceNr != None:
+            sequenceNr = int(sequenceNr)
+            if self.lastSequenceNr != None and sequenceNr != self.lastSequenceNr + 1:
+                self.desynchronize("notifications %s..%s are missed" % (self.lastSequenceNr + 1, sequenceNr - 1))
+            self.lastSequenceNr = sequenceNr
+        notifType = headers.get('notification-type')
+        uri = headers.get('element-uri', headers.get('object-uri'))
+        content = None
+        if len(body.strip()) != 0:
+            try:
+                content = json.loads(body)
+            except ValueError:
+                log.warning("Notification %s of %s cannot be parsed", notifType, uri)
+        cache = self.hmcConn.objectCache
+        changes = None
+        if notifType == NOTIFICATION_PROPERTY_CHANGE and content != None:
+            changes = dict()
+            for report in content.get('change-reports', []):
+                changes[report['property-name']] = report.get('new-value')
+        elif notifType == NOTIFICATION_STATUS_CHANGE and content != None:
+            changes = dict()
+            for report in content.get('change-reports', []):
+                for reportKey, propName in STATUS_CHANGE_PROPERTIES.items():
+                    if reportKey in report:
+                        changes[propName] = report[reportKey]
+        elif notifType == NOTIFICATION_INVENTORY_CHANGE:
+            if cache != None:
+                cache.invalidateLists()
+            if headers.get('action') == 'remove':
+                if cache != None:
+                    cache.invalidate(uri)
+                for inventory in self.inventories:
+                    inventory.remove(uri)
+            self.applied += 1
+        if changes and uri != None:
+            if cache != None:
+                cache.update(uri, changes)
+            for inventory in self.inventories:
+                inventory.update(uri, changes)
+            self.applied += 1
+        log.debug("Notification %s of %s: %s", notifType, uri, changes)
+        for callback in self.callbacks:
+            try:
+                callback(notifType, uri, headers, content)
+            except Exception as exc:
+                log.error("Notification callback failed: %s", exc)
+
+    # -------------------------------------------- #
+    # - Returns notification counters
+    # -------------------------------------------- #
+    def getSummary(self):
+        '''
+          - @return: summary line with the number of received and
+          -          applied notifications
+        '''
+        return "%d received, %d applied, %s" % (self.received, self.applied,
+                                                self.synchronized and "synchronized" or "not synchronized")
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCStubBroker object ----------------------------- #
+# ------------------------------------------------------------------ #
+# - Local STOMP broker publishing notifications
+# ------------------------------------------------------------------ #
+class HMCStubBroker:
+    '''
+      - Local (plain TCP) STOMP broker, which accepts CONNECT and
+      - SUBSCRIBE frames and publishes notifications as HMC does.
+      - Used to drive HMCNotificationListener without HMC, e.g.
+      -   broker = HMCStubBroker(); broker.start()
+      -   listener = HMCNotificationListener(hmcConn, inventory, host='127.0.0.1',
+      -                                      port=broker.port, useSSL=False)
+      -   listener.start()
+      -   broker.publish(hmcConn.notificationTopic, 'property-change', partURI,
+      -                  {'change-reports': [{'property-name': 'description',
+      -                                       'new-value': 'changed'}]})
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 host='127.0.0.1',  # address to listen on
+                 port=0,            # TCP port, 0 for any free port
+                 credentials=None   # (login, passcode) accepted, None for any
+                 ):
+        self.host = host
+        self.credentials = credentials
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.port = self.server.getsockname()[1]
+        self.lock = threading.Lock()
+        self.subscriptions = []     # [(<HMCStompConnection>, <destination>, <subscription ID>)]
+        self.clients = []           # connected HMCStompConnection objects
+        self.sequenceNrs = dict()   # {<topic>: <last session sequence number>}
+        self.messageCount = 0
+        self.running = False
+
+    # -------------------------------------------- #
+    # - Starts accepting clients
+    # -------------------------------------------- #
+    def start(self):
+        self.server.listen(5)
+        self.running = True
+        thread = threading.Thread(target=self.acceptClients, name="HMCStubBroker")
+        thread.daemon = True
+        thread.start()
+
+    # -------------------------------------------- #
+    # - Stops the broker and closes client connections
+    # -------------------------------------------- #
+    def stop(self):
+        self.running = False
+        self.disconnectClients()
+        self.server.close()
+
+    # -------------------------------------------- #
+    # - Closes client connections (connection loss)
+    # -------------------------------------------- #
+    def disconnectClients(self):
+        self.lock.acquire()
+        try:
+            clients = self.clients
+            self.clients = []
+            self.subscriptions = []
+        finally:
+            self.lock.release()
+        for client in clients:
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            client.close()
+
+    # -------------------------------------------- #
+    # - Accepts clients
+    # -------------------------------------------- #
+    def acceptClients(self):
+        while self.running:
+            try:
+                sock, address = self.server.accept()
+            except socket.error:
+                return
+            client = HMCStompConnection(sock=sock, timeout=None)
+            self.lock.acquire()
+            try:
+                self.clients.append(client)
+            finally:
+                self.lock.release()
+            thread = threading.Thread(target=self.serveClient, args=(client,),
+                                      name="HMCStubBroker-client")
+            thread.daemon = True
+            thread.start()
+
+    # -------------------------------------------- #
+    # - Serves frames of a client
+    # -------------------------------------------- #
+    def serveClient(self,
+                    client      # HMCStompConnection object of the client
+                    ):
+        try:
+            while True:
+                command, headers, body = client.readFrame()
+                if command in ['CONNECT', 'STOMP']:
+                    if (self.credentials != None and
+                            (headers.get('login'), headers.get('passcode')) != tuple(self.credentials)):
+                        client.sendFrame('ERROR', {'message': 'Authentication failed'})
+                        break
+                    versions = headers.get('accept-version', '1.0').split(',')
+                    version = '1.1' in versions and '1.1' or '1.0'
+                    client.sendFrame('CONNECTED', {'version': version})
+                    client.version = version
+                elif command == 'SUBSCRIBE':
+                    self.lock.acquire()
+                    try:
+                        self.subscriptions.append((client, headers['destination'], headers.get('id')))
+                    finally:
+                        self.lock.release()
+                elif command == 'DISCONNECT':
+                    break
+        except (socket.error, TypeError, AttributeError):
+            # client closed the connection (or has been disconnected)
+            pass
+        self.lock.acquire()
+        try:
+            self.subscriptions = [sub for sub in self.subscriptions if sub[0] != client]
+            if client in self.clients:
+                self.clients.remove(client)
+        finally:
+            self.lock.release()
+        client.close()
+
+    # -------------------------------------------- #
+    # - Publishes notification
+    # -------------------------------------------- #
+    def publish(self,
+                topic,          # notification topic of the session
+                notifType,      # e.g. 'property-change'
+                uri,            # object or element URI
+                content=None,   # message body, encoded into JSON
+                headers=None    # additional message headers, e.g. {'action': 'add'}
+                ):
+        '''
+          - Publishes notification to the subscribers of the topic
+          - @return: number of subscribers the notification was sent to
+        '''
+        self.lock.acquire()
+        try:
+            sequenceNr = self.sequenceNrs.get(topic, -1) + 1
+            self.sequenceNrs[topic] = sequenceNr
+            self.messageCount += 1
+            messageID = self.messageCount
+            subscriptions = [sub for sub in self.subscriptions if sub[1] == '/topic/' + topic]
+        finally:
+            self.lock.release()
+        msgHeaders = {'destination': '/topic/' + topic,
+                      'message-id': 'stub-%d' % (messageID),
+                      'notification-type': notifType,
+                      'session-sequence-nr': sequenceNr}
+        msgHeaders[isElementURI(uri) and 'element-uri' or 'object-uri'] = uri
+        if isElementURI(uri):
+            # URI of the parent object
+            msgHeaders['object-uri'] = '/'.join(uri.split('/')[:4])
+        msgHeaders.update(headers or {})
+        body = ''
+        if content != None:
+            body = json.dumps(content)
+        sent = 0
+        for client, destination, subscriptionID in subscriptions:
+            msgHeaders['subscription'] = subscriptionID
+            try:
+                client.sendFrame('MESSAGE', msgHeaders, body)
+                sent += 1
+            except socket.error:
+                pass
+        return sent
+
+
+# ----------------------------------------------------------------- #
+# ----------- Common functions ------------------------------------ #
+# ----------------------------------------------------------------- #
+def unescapeHeader(text     # escaped header name or value
+                   ):
+    '''
+      - @return: header name or value with STOMP escapes decoded
+    '''
+    unescapes = dict([(escape[1], char) for char, escape in STOMP_HEADER_ESCAPES])
+    return re.sub(r'\\(.)', lambda match: unescapes.get(match.group(1), match.group(1)), text)
+
+
+def startNotificationListener(hmcConn,          # HMCConnection object (logged on)
+                              inventory=None,   # HMCInventory object to be updated
+                              **kwargs          # HMCNotificationListener arguments
+                              ):
+    '''
+      - Starts the notification listener of the connection, which is
+      - stopped by HMCConnection.logoff()
+      - @return: HMCNotificationListener object
+    '''
+    if hmcConn.notificationListener != None:
+        if inventory != None:
+            hmcConn.notificationListener.attachInventory(inventory)
+        return hmcConn.notificationListener
+    listener = HMCNotificationListener(hmcConn, inventory=inventory, **kwargs)
+    listener.start()
+    hmcConn.notificationListener = listener
+    return listener
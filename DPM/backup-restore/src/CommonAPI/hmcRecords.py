@@ -0,0 +1,358 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides the record file written by the backup scripts
+# - in stream mode. Every section (partition or storage group) is
+# - appended to the file as a JSON line as soon as it is collected, so
+# - the collected sections are not kept in memory, and the sections
+# - written before a failure are not lost. A record holds the items of
+# - the section as they are written into the config file, so the
+# - config file is generated from the records one section at a time.
+# - The same file is the checkpoint journal of a backup: a resumed
+# - backup skips the sections recorded by the interrupted one, and
+# - appends the remaining sections to the file.
+# - The step journal of a restore is a JSON lines file as well: every
+# - completed step (e.g. a partition created, a storage group attached)
+# - is appended with its result, so a resumed restore skips the
+# - recorded steps without querying the HMC for them.
+# - Classes:
+#        HMCRecordWriter - appends section records to a JSON lines file
+#        HMCStepJournal  - appends completed steps of a restore
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+import ConfigParser
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCRecordWriter object --------------------------- #
+# ------------------------------------------------------------------ #
+# - Appends section records to a JSON lines file
+# ------------------------------------------------------------------ #
+class HMCRecordWriter:
+    '''
+      - Appends section records to a JSON lines file. The file is
+      - opened on the first record, and every record is flushed to the
+      - file as soon as it is written. Records may be written by several
+      - threads at the same time
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 filePath   # path of the record file
+                 ):
+        '''
+          - Constructor
+          - @param filePath: path of the record file
+        '''
+        self.filePath = filePath
+        self.lock = threading.Lock()
+        self.recordFile = None
+        self.count = 0          # number of written records
+
+    # -------------------------------------------- #
+    # - Appends record
+    # -------------------------------------------- #
+    def write(self,
+              section,      # section name, e.g. partition name
+              items,        # [(<key>, <value>), ...], value None for comments
+              snapshot=None # snapshot index entry of the section
+              ):
+        '''
+          - Appends record of a section to the file
+          - @param section:  section name, e.g. partition name
+          - @param items:    list of (key, value) pairs in the order of the
+          -                  config file, value is None for comment lines
+          - @param snapshot: snapshot index entry of the section (the
+          -                  fingerprints of its objects), read back by a
+          -                  resumed backup
+        '''
+        # values are kept as they are written into the config file, text
+        # is kept as it is, so non-ASCII characters are not lost
+        recordItems = []
+        for key, value in items:
+            if value != None and not isinstance(value, basestring):
+                value = str(value)
+            recordItems.append((key, value))
+        record = {'section': section, 'items': recordItems}
+        if snapshot != None:
+            record['snapshot'] = snapshot
+        self.append(record)
+
+    # -------------------------------------------- #
+    # - Appends JSON line
+    # -------------------------------------------- #
+    def append(self,
+               record,      # JSON serializable record
+               header=None  # written before the record if the file is empty
+               ):
+        line = json.dumps(record) + '\n'
+        self.lock.acquire()
+        try:
+            if self.recordFile == None:
+                self.recordFile = open(self.filePath, 'ab')
+            if header != None and self.count == 0:
+                self.recordFile.write(json.dumps(header) + '\n')
+                self.count += 1
+            self.recordFile.write(line)
+            self.recordFile.flush()
+            self.count += 1
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Closes the record file
+    # -------------------------------------------- #
+    def close(self):
+        self.lock.acquire()
+        try:
+            if self.recordFile != None:
+                self.recordFile.close()
+                self.recordFile = None
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Resumes the record file of an interrupted backup
+    # -------------------------------------------- #
+    def resume(self):
+        '''
+          - Reads the sections recorded so far, and truncates a truncated
+          - last record, so the following records are appended after the
+          - last complete one
+          - @return: set of recorded section names
+        '''
+        return set([record['section'] for record in self.readAll()])
+
+    # -------------------------------------------- #
+    # - Reads all complete records
+    # -------------------------------------------- #
+    def readAll(self):
+        '''
+          - Reads the complete records of the file, and truncates a
+          - truncated last record
+          - @return: list of records
+        '''
+        self.close()
+        records = []
+        if not os.path.exists(self.filePath):
+            return records
+        end = 0
+        with open(self.filePath, 'rb') as recordFile:
+            for offset, record in readJSONLines(self.filePath):
+                records.append(record)
+                recordFile.seek(offset)
+                end = offset + len(recordFile.readline())
+        if end != os.path.getsize(self.filePath):
+            with open(self.filePath, 'r+b') as recordFile:
+                recordFile.truncate(end)
+        return records
+
+    # -------------------------------------------- #
+    # - Removes the record file
+    # -------------------------------------------- #
+    def discard(self):
+        self.close()
+        if os.path.exists(self.filePath):
+            os.remove(self.filePath)
+        self.count = 0
+
+    # -------------------------------------------- #
+    # - Moves the record file
+    # -------------------------------------------- #
+    def moveTo(self,
+               filePath     # new path of the record file
+               ):
+        self.close()
+        if os.path.exists(self.filePath):
+            os.rename(self.filePath, filePath)
+        self.filePath = filePath
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCStepJournal object ---------------------------- #
+# ------------------------------------------------------------------ #
+# - Appends completed steps of a restore
+# ------------------------------------------------------------------ #
+class HMCStepJournal(HMCRecordWriter):
+    '''
+      - Journal of the completed steps of a restore. A step is identified
+      - by a key (a tuple of strings, e.g. (<partition>, 'create')) and
+      - recorded with its result (e.g. the URI of the created partition).
+      - The first record is a header describing the restore, the steps
+      - of a journal with another header are not resumed
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 filePath,      # path of the journal file
+                 header=None    # dictionary describing the restore
+                 ):
+        '''
+          - Constructor
+          - @param filePath: path of the journal file
+          - @param header:   dictionary describing the restore (e.g. config
+          -                  file and CPC), written as the first record
+        '''
+        HMCRecordWriter.__init__(self, filePath)
+        self.header = header
+        self.steps = dict()     # {<json of key>: <value>}
+
+    # -------------------------------------------- #
+    # - Loads the journal of an interrupted restore
+    # -------------------------------------------- #
+    def load(self):
+        '''
+          - Loads the steps recorded so far, the following steps are
+          - appended after the last complete one
+          - @return: number of recorded steps, None if the journal has
+          -          been written by another restore (it is discarded)
+        '''
+        self.steps = dict()
+        records = self.readAll()
+        if len(records) != 0 and self.header != None and records[0].get('header') != self.header:
+            log.warning("Journal %s has been written by another restore: %s",
+                        self.filePath, records[0].get('header'))
+            self.discard()
+            return None
+        for record in records:
+            if 'step' in record:
+                self.steps[json.dumps(record['step'])] = record.get('value')
+        self.count = len(records)
+        return len(self.steps)
+
+    # -------------------------------------------- #
+    # - Records completed step
+    # -------------------------------------------- #
+    def record(self,
+               key,         # step key, tuple of strings
+               value=None   # JSON serializable result of the step
+               ):
+        self.append({'step': list(key), 'value': value},
+                    header=self.header and {'header': self.header})
+        self.steps[json.dumps(list(key))] = value
+
+    # -------------------------------------------- #
+    # - Returns completed steps
+    # -------------------------------------------- #
+    def completed(self,
+                  keys      # step keys
+                  ):
+        '''
+          - @return: dictionary {<key>: <value>} of the keys, which are
+          -          recorded as completed
+        '''
+        completedSteps = dict()
+        for key in keys:
+            stepKey = json.dumps(list(key))
+            if stepKey in self.steps:
+                completedSteps[key] = self.steps[stepKey]
+        return completedSteps
+
+    # -------------------------------------------- #
+    # - Removes the journal file
+    # -------------------------------------------- #
+    def discard(self):
+        HMCRecordWriter.discard(self)
+        self.steps = dict()
+
+
+# ----------------------------------------------------------------- #
+# ----------- Common functions ------------------------------------ #
+# ----------------------------------------------------------------- #
+def readJSONLines(filePath  # path of the JSON lines file
+                  ):
+    '''
+      - Reads the records of a JSON lines file one by one. A truncated
+      - last record (e.g. written by an interrupted run) is skipped
+      - @return: generator of (offset, record) pairs
+    '''
+    with open(filePath, 'rb') as recordFile:
+        while True:
+            offset = recordFile.tell()
+            line = recordFile.readline()
+            if len(line) == 0:
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                log.warning("Truncated record at offset %s of %s is skipped", offset, filePath)
+                return
+            yield (offset, record)
+
+
+def readRecords(filePath    # path of the record file
+                ):
+    '''
+      - Reads records of a record file one by one. A truncated last
+      - record (e.g. written by an interrupted backup) is skipped
+      - @return: generator of (offset, section, items) tuples
+    '''
+    for offset, record in readJSONLines(filePath):
+        yield (offset, record['section'], record['items'])
+
+
+def readSortedRecords(recordsPath     # path of the record file
+                      ):
+    '''
+      - Reads the records of a record file sorted by section name. Only
+      - the file offsets of the records are kept in memory, the records
+      - are read again one at a time. If a section has been written
+      - several times, the last record is used
+      - @return: generator of (section, items) pairs
+    '''
+    if not os.path.exists(recordsPath):
+        # no record has been written
+        return
+    offsets = dict()
+    for offset, section, items in readRecords(recordsPath):
+        offsets[section] = offset
+    with open(recordsPath, 'rb') as recordFile:
+        for section in sorted(offsets.keys()):
+            recordFile.seek(offsets[section])
+            record = json.loads(recordFile.readline())
+            yield (record['section'], record['items'])
+
+
+def writeRecordsConfig(recordsPath,     # path of the record file
+                       configPath       # path of the config file
+                       ):
+    '''
+      - Writes the sections of a record file into a config file, sorted
+      - by name, one section at a time
+      - @return: number of sections written
+    '''
+    count = 0
+    with open(configPath, 'wb') as configFile:
+        for section, items in readSortedRecords(recordsPath):
+            sectionName = section.encode('utf-8')
+            sectionConfig = ConfigParser.ConfigParser(allow_no_value=True)
+            sectionConfig.add_section(sectionName)
+            for key, value in items:
+                sectionConfig.set(sectionName, key.encode('utf-8'), value and value.encode('utf-8'))
+            sectionConfig.write(configFile)
+            count += 1
+    return count
+
+
+def loadRecordsConfig(recordsPath   # path of the record file
+                      ):
+    '''
+      - Loads the sections of a record file as they are read from the
+      - config file generated from it
+      - @return: dictionary {<section>: {<key>: <value>}}
+    '''
+    sectionDict = dict()
+    for offset, section, items in readRecords(recordsPath):
+        sectionDict[section.encode('utf-8')] = dict([(key.lower().encode('utf-8'), value.strip().encode('utf-8'))
+                                                     for key, value in items if value != None])
+    return sectionDict
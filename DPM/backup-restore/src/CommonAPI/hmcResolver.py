@@ -0,0 +1,601 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides name to URI resolution of CPC resources used by
+# - the restore scripts: adapters and storage groups by name, virtual
+# - switches by backing adapter URI and port, and boot volumes of a
+# - storage group by UUID or by control unit and unit address.
+# - Each resource class is listed once per CPC and kept in hash
+# - indexes; objects which are not found (e.g. created after the index
+# - has been built) are looked up by a filtered list call and added.
+# - Classes:
+#        HMCResolver        - name/URI indexes of resources of one CPC
+#        VirtualSwitchMap   - (backing adapter, port) to virtual switch map
+#        StorageVolumeIndex - UUID and address indexes of boot volumes
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+import hmcAsync
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCResolver object ------------------------------- #
+# ------------------------------------------------------------------ #
+# - Name/URI indexes of resources of one CPC
+# ------------------------------------------------------------------ #
+class HMCResolver:
+    '''
+      - Resolves adapter names, storage group names and (backing adapter
+      - URI, port) pairs of one CPC to object URIs by hash indexes.
+      - Indexes are built by one list call per resource class on first
+      - use, and are refreshed incrementally on a miss
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 hmcConn,       # HMCConnection object
+                 cpcURI         # URI of the CPC
+                 ):
+        '''
+          - Constructor
+          - @param hmcConn: HMCConnection object
+          - @param cpcURI:  URI of the CPC
+        '''
+        self.hmcConn = hmcConn
+        self.cpcURI = cpcURI
+        self.cpcID = cpcURI.replace('/api/cpcs/', '')
+        self.lock = threading.RLock()
+        self.adapters = None            # {<adapter name>: <adapter list item>}
+        self.storageGroups = None       # {<storage group name>: <storage group list item>}
+        self.switchMap = getVirtualSwitchMap(hmcConn, self.cpcID)
+        self.volumeIndexes = dict()     # {<storage group uri>: StorageVolumeIndex object}
+        self.controlUnits = dict()      # {<control unit uri>: <logical address>}
+        self.listCount = 0              # number of list requests done
+
+    # -------------------------------------------- #
+    # - Adds adapter to the index
+    # -------------------------------------------- #
+    def addAdapter(self,
+                   adapterInfo      # adapter list item or properties
+                   ):
+        '''
+          - Adds adapter to the index
+          - @param adapterInfo: adapter list item or properties
+          -                     ('name' and 'object-uri' are required)
+        '''
+        self.lock.acquire()
+        try:
+            if self.adapters == None:
+                self.adapters = dict()
+            self.adapters[adapterInfo['name']] = adapterInfo
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Adds storage group to the index
+    # -------------------------------------------- #
+    def addStorageGroup(self,
+                        sgInfo      # storage group list item or properties
+                        ):
+        '''
+          - Adds storage group to the index, e.g. after it has been created
+          - @param sgInfo: storage group list item or properties
+          -                ('name' and 'object-uri' are required)
+        '''
+        self.lock.acquire()
+        try:
+            if self.storageGroups == None:
+                self.storageGroups = dict()
+            self.storageGroups[sgInfo['name']] = sgInfo
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Lists adapters of the CPC
+    # -------------------------------------------- #
+    def loadAdapters(self,
+                     adapterName=None   # list this adapter only
+                     ):
+        adapRet = getCPCAdaptersList(self.hmcConn, self.cpcID, adapterName=adapterName)
+        self.lock.acquire()
+        try:
+            self.listCount += 1
+            if self.adapters == None:
+                self.adapters = dict()
+            for adapterInfo in adapRet:
+                self.addAdapter(adapterInfo)
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Lists storage groups of the CPC
+    # -------------------------------------------- #
+    def loadStorageGroups(self,
+                          sgName=None   # list this storage group only
+                          ):
+        sgRet = getStorageGroupList(self.hmcConn, sgName=sgName, cpcURI=self.cpcURI)
+        self.lock.acquire()
+        try:
+            self.listCount += 1
+            if self.storageGroups == None:
+                self.storageGroups = dict()
+            for sgInfo in sgRet:
+                self.addStorageGroup(sgInfo)
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Resolves adapter by name
+    # -------------------------------------------- #
+    def selectAdapter(self,
+                      adapterName   # adapter name
+                      ):
+        '''
+          - Resolves adapter by name, same as prsm2api.selectAdapter
+          - @param adapterName: adapter name
+          - @return: dictionary with KEY_ADAPTER_NAME, KEY_ADAPTER_URI,
+          -          KEY_ADAPTER_STATUS and KEY_ADAPTER_TYPE keys
+          - @raise HMCException: if there is no such adapter
+        '''
+        log.debug("Entered")
+        try:
+            self.lock.acquire()
+            try:
+                if self.adapters == None:
+                    self.loadAdapters()
+                if adapterName not in self.adapters:
+                    self.loadAdapters(adapterName)
+                adapterInfo = self.adapters.get(adapterName)
+            finally:
+                self.lock.release()
+            if adapterInfo == None:
+                exc = HMCException("HMCResolver.selectAdapter",
+                                   "Cannot find adapter '%s' in available adapters list %s!" % (adapterName, sorted(self.adapters.keys())))
+                raise exc
+            return {KEY_ADAPTER_NAME: adapterName,
+                    KEY_ADAPTER_URI: assertValue(pyObj=adapterInfo, key='object-uri'),
+                    KEY_ADAPTER_STATUS: adapterInfo.get('status'),
+                    KEY_ADAPTER_TYPE: adapterInfo.get('type')}
+        except HMCException as exc:   # raise HMCException
+            exc.setMethod("HMCResolver.selectAdapter")
+            raise exc
+        finally:
+            log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Resolves storage group URI by name
+    # -------------------------------------------- #
+    def getStorageGroupURI(self,
+                           sgName   # storage group name
+                           ):
+        '''
+          - Resolves storage group URI by name, same as
+          - prsm2api.selectStorageGroup
+          - @param sgName: storage group name
+          - @return: storage group URI or None if there is no such group
+        '''
+        log.debug("Entered")
+        self.lock.acquire()
+        try:
+            if self.storageGroups == None:
+                self.loadStorageGroups()
+            if sgName not in self.storageGroups:
+                self.loadStorageGroups(sgName)
+            sgInfo = self.storageGroups.get(sgName)
+            if sgInfo == None:
+                return None
+            return sgInfo['object-uri']
+        except HMCException as exc:   # raise HMCException
+            exc.setMethod("HMCResolver.getStorageGroupURI")
+            raise exc
+        finally:
+            self.lock.release()
+            log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Resolves virtual switch URI by adapter and port
+    # -------------------------------------------- #
+    def getVirtualSwitchURI(self,
+                            adapterURI,     # backing adapter URI
+                            adapterPort     # adapter port
+                            ):
+        '''
+          - Resolves virtual switch URI by backing adapter and port, same
+          - as prsm2api.selectVirtualSwitch
+          - @param adapterURI:  backing adapter URI
+          - @param adapterPort: adapter port
+          - @return: virtual switch URI or None if there is no such switch
+        '''
+        return self.switchMap.lookup(adapterURI, adapterPort)
+
+    # -------------------------------------------- #
+    # - Returns storage volume index of storage group
+    # -------------------------------------------- #
+    def getStorageVolumeIndex(self,
+                              sgURI     # storage group URI
+                              ):
+        '''
+          - Returns the storage volume index of a storage group, which is
+          - shared by all users of the resolver, creating it on first use
+          - @param sgURI: storage group URI
+          - @return: StorageVolumeIndex object
+        '''
+        self.lock.acquire()
+        try:
+            if sgURI not in self.volumeIndexes:
+                self.volumeIndexes[sgURI] = StorageVolumeIndex(self.hmcConn, sgURI, self)
+            return self.volumeIndexes[sgURI]
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Resolves logical addresses of control units
+    # -------------------------------------------- #
+    def getControlUnitAddresses(self,
+                                cuURIs      # storage control unit URIs
+                                ):
+        '''
+          - Resolves logical addresses of storage control units. Every
+          - control unit is fetched once, the ones which are not known yet
+          - concurrently
+          - @param cuURIs: storage control unit URIs
+          - @return: dictionary {<control unit uri>: <logical address>}
+        '''
+        log.debug("Entered")
+        self.lock.acquire()
+        try:
+            newURIs = sorted(set([cuURI for cuURI in cuURIs if cuURI not in self.controlUnits]))
+            if len(newURIs) != 0:
+                fetched = hmcAsync.getHMCObjectsAsync(self.hmcConn, newURIs,
+                                                      "Get Storage Control Unit Properties",
+                                                      properties=['logical-address'])
+                for cuURI in newURIs:
+                    self.controlUnits[cuURI] = fetched[cuURI].get('logical-address')
+            return dict([(cuURI, self.controlUnits[cuURI]) for cuURI in cuURIs])
+        except HMCException as exc:   # raise HMCException
+            exc.setMethod("HMCResolver.getControlUnitAddresses")
+            raise exc
+        finally:
+            self.lock.release()
+            log.debug("Completed")
+
+
+# ------------------------------------------------------------------ #
+# --------------- VirtualSwitchMap object -------------------------- #
+# ------------------------------------------------------------------ #
+# - (backing adapter URI, port) to virtual switch URI map of one CPC
+# ------------------------------------------------------------------ #
+class VirtualSwitchMap:
+    '''
+      - Virtual switch topology of one CPC, keyed by (backing adapter
+      - URI, port). Virtual switches are listed once and their backing
+      - adapter and port are fetched concurrently; the map is rebuilt
+      - incrementally (new switches only) if a key is not found
+    '''
+
+    # properties defining the key of a virtual switch
+    keyProperties = ['backing-adapter-uri', 'port']
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 hmcConn,       # HMCConnection object
+                 cpcID          # ID of the CPC
+                 ):
+        '''
+          - Constructor
+          - @param hmcConn: HMCConnection object
+          - @param cpcID:   ID of the CPC
+        '''
+        self.hmcConn = hmcConn
+        self.cpcID = cpcID
+        self.lock = threading.RLock()
+        self.switches = None            # {(<backing adapter uri>, <port>): <virtual switch uri>}
+        self.knownURIs = set()          # virtual switches in the map
+        self.fetchCount = 0             # number of switch properties fetched
+
+    # -------------------------------------------- #
+    # - Adds virtual switch to the map
+    # -------------------------------------------- #
+    def add(self,
+            vsProps     # virtual switch properties
+            ):
+        '''
+          - Adds virtual switch to the map
+          - @param vsProps: virtual switch properties ('object-uri',
+          -                 'backing-adapter-uri' and 'port' are required)
+        '''
+        self.lock.acquire()
+        try:
+            if self.switches == None:
+                self.switches = dict()
+            key = (vsProps['backing-adapter-uri'], int(vsProps['port']))
+            self.switches[key] = vsProps['object-uri']
+            self.knownURIs.add(vsProps['object-uri'])
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Lists virtual switches of the CPC
+    # -------------------------------------------- #
+    def refresh(self):
+        '''
+          - Lists virtual switches of the CPC and fetches backing adapter
+          - and port of the switches, which are not in the map yet,
+          - concurrently
+        '''
+        log.debug("Entered")
+        self.lock.acquire()
+        try:
+            if self.switches == None:
+                self.switches = dict()
+            vsRet = getCPCVirtualSwitchesList(self.hmcConn, self.cpcID)
+            newURIs = [vsInfo['object-uri'] for vsInfo in vsRet
+                       if vsInfo['object-uri'] not in self.knownURIs]
+            if len(newURIs) == 0:
+                return
+            fetched = hmcAsync.getHMCObjectsAsync(self.hmcConn, newURIs,
+                                                  "Get Virtual Switch Properties",
+                                                  properties=self.keyProperties)
+            self.fetchCount += len(fetched)
+            for vsURI in newURIs:
+                vsProps = fetched[vsURI]
+                vsProps['object-uri'] = vsURI
+                self.add(vsProps)
+        except HMCException as exc:   # raise HMCException
+            exc.setMethod("VirtualSwitchMap.refresh")
+            raise exc
+        finally:
+            self.lock.release()
+            log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Returns virtual switch URI by adapter and port
+    # -------------------------------------------- #
+    def lookup(self,
+               adapterURI,      # backing adapter URI
+               adapterPort      # adapter port
+               ):
+        '''
+          - Returns virtual switch URI by backing adapter and port. The map
+          - is built on first use and refreshed if the key is not found
+          - @param adapterURI:  backing adapter URI
+          - @param adapterPort: adapter port
+          - @return: virtual switch URI or None if there is no such switch
+        '''
+        key = (adapterURI, int(adapterPort))
+        self.lock.acquire()
+        try:
+            if self.switches == None or key not in self.switches:
+                self.refresh()
+            return self.switches.get(key)
+        finally:
+            self.lock.release()
+
+
+# ------------------------------------------------------------------ #
+# --------------- StorageVolumeIndex object ------------------------ #
+# ------------------------------------------------------------------ #
+# - UUID and address indexes of the boot volumes of a storage group
+# ------------------------------------------------------------------ #
+class StorageVolumeIndex:
+    '''
+      - Boot volumes of one storage group, keyed by UUID (FCP) and by
+      - (control unit logical address, unit address) (FICON). The volumes
+      - are listed by a single request on first use, and the volumes with
+      - boot usage are fetched concurrently, the control units once per
+      - URI by the resolver; the index is refreshed incrementally (new
+      - volumes only) if a key is not found. Refreshes are serialized,
+      - but the requests are sent without holding the index lock, so the
+      - lookups of indexed volumes are not blocked by a refresh
+    '''
+
+    # properties of the storage volumes defining the keys and the usage
+    volumeProperties = ['usage', 'uuid', 'eckd-type', 'control-unit-uri', 'unit-address']
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 hmcConn,       # HMCConnection object
+                 sgURI,         # storage group URI
+                 resolver       # HMCResolver object, resolves the control units
+                 ):
+        '''
+          - Constructor
+          - @param hmcConn:  HMCConnection object
+          - @param sgURI:    storage group URI
+          - @param resolver: HMCResolver object, resolves the logical
+          -                  addresses of the control units
+        '''
+        self.hmcConn = hmcConn
+        self.sgURI = sgURI
+        self.resolver = resolver
+        self.lock = threading.Lock()            # protects the indexes
+        self.refreshLock = threading.RLock()    # serializes the refreshes
+        self.sgType = None
+        self.volumes = None             # {<storage volume uri>: <properties>}, boot volumes
+        self.byUUID = dict()            # {<uuid>: <storage volume uri>}
+        self.byAddress = dict()         # {(<logical address>, <unit address>): <storage volume uri>}
+        self.fetchCount = 0             # number of storage volume properties fetched
+
+    # -------------------------------------------- #
+    # - Adds storage volume to the index
+    # -------------------------------------------- #
+    def add(self,
+            svURI,      # storage volume URI
+            svProps,    # storage volume properties
+            cuAddress   # logical address of the control unit, None for FCP
+            ):
+        self.lock.acquire()
+        try:
+            if self.volumes == None:
+                self.volumes = dict()
+            svProps['element-uri'] = svURI
+            self.volumes[svURI] = svProps
+            if svProps.get('uuid') != None:
+                self.byUUID[svProps['uuid']] = svURI
+            if cuAddress != None:
+                self.byAddress[(cuAddress, svProps.get('unit-address'))] = svURI
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Fetches storage volumes of the storage group
+    # -------------------------------------------- #
+    def refresh(self):
+        '''
+          - Lists the storage volumes of the storage group, and fetches
+          - the boot volumes, which are not in the index yet, concurrently
+        '''
+        log.debug("Entered")
+        self.refreshLock.acquire()
+        try:
+            if self.sgType == None:
+                sgProps = getStorageGroupProperties(self.hmcConn, sgURI=self.sgURI, properties=['type'])
+                self.sgType = assertValue(pyObj=sgProps, key='type')
+            # the usage is checked on every refresh, a volume may have become a boot volume
+            svList = assertValue(pyObj=getStorVolListOfSG(self.hmcConn, self.sgURI), key='storage-volumes')
+            self.lock.acquire()
+            try:
+                if self.volumes == None:
+                    self.volumes = dict()
+                newURIs = [svInfo['element-uri'] for svInfo in svList
+                           if svInfo['element-uri'] not in self.volumes and svInfo.get('usage') == 'boot']
+            finally:
+                self.lock.release()
+            if len(newURIs) == 0:
+                return
+            fetched = hmcAsync.getHMCObjectsAsync(self.hmcConn, newURIs,
+                                                  "Get Storage-Volume Properties",
+                                                  properties=self.volumeProperties)
+            self.fetchCount += len(fetched)
+            cuAddresses = dict()
+            if self.sgType == 'fc':
+                cuAddresses = self.resolver.getControlUnitAddresses(
+                    [fetched[svURI]['control-unit-uri'] for svURI in newURIs
+                     if fetched[svURI].get('control-unit-uri') != None])
+            for svURI in newURIs:
+                svProps = fetched[svURI]
+                self.add(svURI, svProps, cuAddresses.get(svProps.get('control-unit-uri')))
+        except HMCException as exc:   # raise HMCException
+            exc.setMethod("StorageVolumeIndex.refresh")
+            raise exc
+        finally:
+            self.refreshLock.release()
+            log.debug("Completed")
+
+    # -------------------------------------------- #
+    # - Returns type of the storage group
+    # -------------------------------------------- #
+    def getType(self):
+        '''
+          - @return: type of the storage group ('fcp' or 'fc'), the index
+          -          is built on first use
+        '''
+        if self.volumes == None:
+            self.refreshMissing(None, None)
+        return self.sgType
+
+    # -------------------------------------------- #
+    # - Refreshes index if key is missing
+    # -------------------------------------------- #
+    def refreshMissing(self,
+                       index,   # self.byUUID or self.byAddress, None to build the index only
+                       key      # key of the index
+                       ):
+        '''
+          - Refreshes the index, unless it has been built and the key has
+          - been added by a refresh of another thread meanwhile
+        '''
+        self.refreshLock.acquire()
+        try:
+            self.lock.acquire()
+            try:
+                found = self.volumes != None and (index == None or key in index)
+            finally:
+                self.lock.release()
+            if not found:
+                self.refresh()
+        finally:
+            self.refreshLock.release()
+
+    # -------------------------------------------- #
+    # - Returns storage volume by key
+    # -------------------------------------------- #
+    def lookup(self,
+               index,   # self.byUUID or self.byAddress
+               key      # key of the index
+               ):
+        self.lock.acquire()
+        try:
+            found = self.volumes != None and key in index
+        finally:
+            self.lock.release()
+        if not found:
+            self.refreshMissing(index, key)
+        self.lock.acquire()
+        try:
+            svURI = index.get(key)
+            if svURI == None:
+                return None
+            return self.volumes[svURI]
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Returns storage volume by UUID
+    # -------------------------------------------- #
+    def lookupByUUID(self,
+                     uuid   # storage volume UUID
+                     ):
+        '''
+          - Returns storage volume of an FCP storage group by UUID
+          - @param uuid: storage volume UUID
+          - @return: storage volume properties (with 'element-uri') or
+          -          None if there is no such volume
+        '''
+        return self.lookup(self.byUUID, uuid)
+
+    # -------------------------------------------- #
+    # - Returns storage volume by address
+    # -------------------------------------------- #
+    def lookupByAddress(self,
+                        logicalAddress,     # logical address of the control unit
+                        unitAddress         # unit address of the storage volume
+                        ):
+        '''
+          - Returns storage volume of a FICON storage group by address
+          - @param logicalAddress: logical address of the control unit
+          - @param unitAddress:    unit address of the storage volume
+          - @return: storage volume properties (with 'element-uri') or
+          -          None if there is no such volume
+        '''
+        return self.lookup(self.byAddress, (logicalAddress, unitAddress))
+
+
+# ----------------------------------------------------------------- #
+# ----------- Common functions ------------------------------------ #
+# ----------------------------------------------------------------- #
+def getVirtualSwitchMap(hmcConn,    # HMCConnection object
+                        cpcID       # ID of the CPC
+                        ):
+    '''
+      - Returns VirtualSwitchMap of the CPC, which is shared by all users
+      - of the connection, creating it on first use
+    '''
+    hmcConn.sessionLock.acquire()
+    try:
+        if cpcID not in hmcConn.virtualSwitchMaps:
+            hmcConn.virtualSwitchMaps[cpcID] = VirtualSwitchMap(hmcConn, cpcID)
+        return hmcConn.virtualSwitchMaps[cpcID]
+    finally:
+        hmcConn.sessionLock.release()
@@ -0,0 +1,278 @@
+#! /usr/bin/env python
+
+# ------------------------------------------------------------------- #
+# - This file provides the snapshot index used by incremental backups.
+# - The index is kept next to the backup files and records, for every
+# - section (partition or storage group) of the last full backup, the
+# - fingerprints of the objects the section has been assembled from,
+# - and the delta files written on top of the full backup since then.
+# - A fingerprint is a hash of the properties read by the backup, so
+# - an object is changed if any of these properties has changed.
+# - Classes:
+#        HMCSnapshot - snapshot index of a backup
+# ------------------------------------------------------------------- #
+
+from prsm2api import *
+from wsaconst import *
+from hmcUtils import *
+from hmcBackupFile import loadBackupSections
+import hashlib
+
+# logger object
+log = logging.getLogger(HMC_API_LOGGER)
+
+# ======= CONSTANTS =========
+# version of the snapshot index file format
+SNAPSHOT_VERSION = 1
+# ======= CONSTANTS =========
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCSnapshot object ------------------------------- #
+# ------------------------------------------------------------------ #
+# - Snapshot index of a backup
+# ------------------------------------------------------------------ #
+class HMCSnapshot:
+    '''
+      - Snapshot index of a backup: the last full backup file, the delta
+      - files written on top of it, and the object fingerprints of every
+      - section. A section is changed if the fingerprint of its root
+      - object, or of a recorded object it depends on, differs from the
+      - recorded one. Objects added or removed are not compared, as the
+      - URI lists of the objects referencing them have changed
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 path       # path of the snapshot index file
+                 ):
+        '''
+          - Constructor
+          - @param path: path of the snapshot index file
+        '''
+        self.path = path
+        self.baseFile = None        # name of the last full backup file
+        self.deltas = []            # [{'file': <name>, 'removed': [<section>, ...]}, ...]
+        self.sections = dict()      # {<section>: {'uri': <root uri>, 'fingerprints': {<uri>: <fingerprint>}}}
+        self.collected = dict()     # entries of the sections collected by this backup, same as sections
+        self.lock = threading.Lock()
+
+    # -------------------------------------------- #
+    # - Loads the snapshot index file
+    # -------------------------------------------- #
+    def load(self):
+        '''
+          - Loads the snapshot index file
+          - @return: True if loaded, False if there is no usable index
+        '''
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'rb') as indexFile:
+                index = json.load(indexFile)
+        except ValueError as exc:
+            log.warning("Snapshot index %s cannot be parsed: %s", self.path, exc)
+            return False
+        if index.get('version') != SNAPSHOT_VERSION or index.get('base-file') == None:
+            log.warning("Snapshot index %s is not supported", self.path)
+            return False
+        self.baseFile = index['base-file']
+        self.deltas = index.get('deltas', [])
+        self.sections = index.get('sections', {})
+        return True
+
+    # -------------------------------------------- #
+    # - Saves the snapshot index file
+    # -------------------------------------------- #
+    def save(self):
+        index = {'version': SNAPSHOT_VERSION,
+                 'updated': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+                 'base-file': self.baseFile,
+                 'deltas': self.deltas,
+                 'sections': self.sections}
+        # write a temporary file first, the index is not lost if interrupted
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, 'wb') as indexFile:
+            json.dump(index, indexFile, indent=1, sort_keys=True)
+        os.rename(tmpPath, self.path)
+
+    # -------------------------------------------- #
+    # - Returns fingerprints of a root object
+    # -------------------------------------------- #
+    def getFingerprints(self,
+                        plan,       # HMCFetchPlan object with the backup rules
+                        uri,        # root object URI
+                        properties  # property names of the root object
+                        ):
+        '''
+          - @return: dictionary {<uri>: <fingerprint>} of the root object
+          -          and the loaded objects it depends on
+        '''
+        fingerprints = dict()
+        for objURI, objProperties in plan.getClosure(uri, properties).items():
+            fingerprints[objURI] = fingerprint(plan.inventory.objects[objURI], objProperties)
+        return fingerprints
+
+    # -------------------------------------------- #
+    # - Returns changed sections
+    # -------------------------------------------- #
+    def getChanged(self,
+                   plan,        # HMCFetchPlan object with the backup rules
+                   roots,       # [(<section>, <root uri>), ...]
+                   properties   # property names of the root objects
+                   ):
+        '''
+          - Compares the roots and the objects they depend on (which must
+          - be loaded) with the recorded fingerprints. An object, which has
+          - not been recorded (e.g. not read by the full backup), is not
+          - compared
+          - @return: list of sections, which are new or changed
+        '''
+        changed = []
+        for section, uri in roots:
+            entry = self.sections.get(section)
+            if entry == None or entry['uri'] != uri:
+                changed.append(section)
+                continue
+            recorded = entry['fingerprints']
+            current = self.getFingerprints(plan, uri, properties)
+            if uri not in current:
+                changed.append(section)
+                continue
+            for objURI, objFingerprint in current.items():
+                if objURI in recorded and recorded[objURI] != objFingerprint:
+                    changed.append(section)
+                    break
+        return changed
+
+    # -------------------------------------------- #
+    # - Returns removed sections
+    # -------------------------------------------- #
+    def getRemoved(self,
+                   sections     # names of the current sections
+                   ):
+        '''
+          - @return: sorted list of recorded sections, which do not exist
+          -          any more
+        '''
+        return sorted(set(self.sections.keys()) - set(sections))
+
+    # -------------------------------------------- #
+    # - Takes fingerprints of a collected section
+    # -------------------------------------------- #
+    def collect(self,
+                plan,       # HMCFetchPlan object with the backup rules
+                section,    # section name
+                uri,        # root object URI
+                properties  # property names of the root object
+                ):
+        '''
+          - Takes the fingerprints of a section as soon as it is collected,
+          - so that its objects can be dropped from the inventory before
+          - update() records it
+          - @return: index entry of the section, written with the record of
+          -          the section, so a resumed backup reads it back
+        '''
+        entry = {'uri': uri, 'fingerprints': self.getFingerprints(plan, uri, properties)}
+        with self.lock:
+            self.collected[section] = entry
+        return entry
+
+    # -------------------------------------------- #
+    # - Reads fingerprints of journaled sections
+    # -------------------------------------------- #
+    def resume(self,
+               records      # records of the checkpoint journal
+               ):
+        '''
+          - Reads the index entries written with the records of an
+          - interrupted backup, the fingerprints of its sections are the
+          - ones of the data journaled, not of the current objects
+        '''
+        with self.lock:
+            for record in records:
+                if record.get('snapshot') != None:
+                    self.collected[record['section']] = record['snapshot']
+
+    # -------------------------------------------- #
+    # - Records fingerprints of sections
+    # -------------------------------------------- #
+    def update(self,
+               roots,       # [(<section>, <root uri>), ...]
+               removed=[]   # sections to be dropped
+               ):
+        '''
+          - Records the fingerprints taken by collect() or read by resume().
+          - A section without fingerprints (e.g. journaled by an older
+          - backup) is dropped, so the next incremental backup backs it up
+        '''
+        for section, uri in roots:
+            entry = self.collected.get(section)
+            if entry == None or entry['uri'] != uri:
+                log.warning("No fingerprints of section %s, it is dropped from the snapshot index", section)
+                self.sections.pop(section, None)
+                continue
+            self.sections[section] = entry
+        for section in removed:
+            self.sections.pop(section, None)
+
+    # -------------------------------------------- #
+    # - Starts a new full backup
+    # -------------------------------------------- #
+    def setBase(self,
+                filePath    # path of the full backup file
+                ):
+        self.baseFile = os.path.basename(filePath)
+        self.deltas = []
+        self.sections = dict()
+
+    # -------------------------------------------- #
+    # - Adds delta on top of the full backup
+    # -------------------------------------------- #
+    def addDelta(self,
+                 filePath,  # path of the delta file, None if there are only removed sections
+                 removed    # sections removed since the last backup
+                 ):
+        self.deltas.append({'file': filePath and os.path.basename(filePath),
+                            'removed': list(removed)})
+
+
+# ----------------------------------------------------------------- #
+# ----------- Common functions ------------------------------------ #
+# ----------------------------------------------------------------- #
+def fingerprint(props,              # object properties
+                properties=None     # property names, None for all
+                ):
+    '''
+      - @return: hash of the properties read by the backup
+    '''
+    if properties == None:
+        properties = props.keys()
+    values = [(propName, props.get(propName)) for propName in sorted(set(properties))]
+    return hashlib.sha1(json.dumps(values, sort_keys=True)).hexdigest()
+
+
+def loadSnapshotConfig(indexPath    # path of the snapshot index file
+                       ):
+    '''
+      - Loads the config of the last backup from the full backup file and
+      - the delta files of a snapshot index: a section of a delta replaces
+      - the section of the earlier files, removed sections are dropped
+      - @return: dictionary {<section>: {<key>: <value>}}
+    '''
+    snapshot = HMCSnapshot(indexPath)
+    if not snapshot.load():
+        exc = IOError("No usable snapshot index")
+        exc.errno = 2
+        raise exc
+    indexDir = os.path.dirname(indexPath)
+    sectionDict = dict()
+    files = [(snapshot.baseFile, [])] + [(delta['file'], delta['removed']) for delta in snapshot.deltas]
+    for fileName, removed in files:
+        if fileName != None:
+            sectionDict.update(loadBackupSections(os.path.join(indexDir, fileName)))
+        for section in removed:
+            sectionDict.pop(section, None)
+    return sectionDict
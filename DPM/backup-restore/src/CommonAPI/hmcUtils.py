@@ -4,6 +4,9 @@
 # - This file contains HMC classes to be used by another HMC API scripts
 # - Classes:
 #        HMCConnection - object to invoke HMC API web services
+#        HMCConnectionPool - bounded pool of keep-alive HTTP connections
+#        PooledHTTPResponse - fully read HTTP response of pooled connection
+#        HMCObjectCache - URI keyed cache of GET responses (TTL, LRU)
 #        HMCException  - special exception object
 #        CompareResult - result of Python objects comparing
 # ------------------------------------------------------------------ #
@@ -21,7 +24,11 @@ import os
 import time
 import ssl
 import socket
+import select
+import threading
+import collections
 import traceback
+import json
 
 
 # ------------------------------------------------------------------ #
@@ -42,7 +49,11 @@ class HMCConnection:
     maxAttempts = 5     # default max attempts number to perform HTTP request
     logonAttempts = 1   # number of attempts to do HMC logon
     useHttps = True     # use HTTPS to connect to HMC
-    hmcConn = None      # httplib.HTTPConnection (or HTTPSConnection) object
+    poolSize = 4        # default max number of keep-alive connections to HMC
+    connPool = None     # HMCConnectionPool object, shares one API session
+    requestLoop = None  # hmcAsync.HMCRequestLoop serving asynchronous requests
+    objectCache = None  # HMCObjectCache of GET responses, None if disabled
+    notificationListener = None  # hmcNotification.HMCNotificationListener, None if not started
     hmcprops = None     # python object, which contain authenticate data
 
 # API session ID and jms notification topic
@@ -68,7 +79,8 @@ class HMCConnection:
                  hmcHost,               # host name/IP address of HMC
                  hmcPort=WSA_PORT_SSL,  # HMC API web services TCP port to connect
                  timeout=httpTimeout,   # HTTP timeout
-                 useSSL=useHttps        # use HTTPS to connect to HMC
+                 useSSL=useHttps,       # use HTTPS to connect to HMC
+                 poolSize=poolSize      # max number of keep-alive connections to HMC
                  ):
         '''
           - Constructor
@@ -77,12 +89,22 @@ class HMCConnection:
           - @param hmcPort:   # HMC API web services TCP port to connect
           - @param timeout:   # HTTP timeout
           - @param useSSL:    # use HTTPS to connect to HMC
+          - @param poolSize:  # max number of keep-alive connections to HMC
         '''
         self.log.debug("Entered")
         self.hmcAPIHost = hmcHost
         self.hmcAPIPort = hmcPort
         self.httpTimeout = timeout
         self.useHttps = useSSL
+        self.poolSize = poolSize
+    # serializes logon/logoff of the API session shared by pooled connections
+        self.sessionLock = threading.RLock()
+    # list URIs, which query filters have been rejected by HMC
+        self.rejectedFilterURIs = set()
+    # True if HMC rejected properties query parameter of Get Properties
+        self.propertiesRejected = False
+    # hmcResolver.VirtualSwitchMap objects by CPC ID
+        self.virtualSwitchMaps = dict()
     # try to load configuration data from .properties file..
         try:
             self.hmcprops = self.loadProperties(configFile=self.configFile)
@@ -130,8 +152,57 @@ class HMCConnection:
         self.log.info("\tAPI Host: %s", self.hmcAPIHost)
         self.log.info("\tAPI Port: %s", self.hmcAPIPort)
         self.log.info("\tHTTP timeout: %s", self.httpTimeout)
+        self.log.info("\tConnection pool size: %s", self.poolSize)
         self.log.debug("Completed")
 
+    # -------------------------------------------- #
+    # - Sets max number of pooled HMC connections
+    # -------------------------------------------- #
+    def setPoolSize(self,
+                    poolSize   # max number of keep-alive connections to HMC
+                    ):
+        '''
+          - Sets max number of keep-alive connections to HMC
+          - @param poolSize: max number of keep-alive connections to HMC
+        '''
+        self.poolSize = poolSize
+        if self.connPool != None:
+            self.connPool.setMaxSize(poolSize)
+        # the request loop keeps as many requests in flight as there are connections
+        if self.requestLoop != None:
+            self.requestLoop.resize(poolSize)
+
+    # -------------------------------------------- #
+    # - Enables cache of GET responses
+    # -------------------------------------------- #
+    def enableObjectCache(self,
+                          ttl=None,       # seconds a response is kept
+                          maxSize=None    # max number of cached responses
+                          ):
+        '''
+          - Enables cache of GET responses for this connection
+          - @param ttl:     seconds a response is kept, default HMCObjectCache.defaultTTL
+          - @param maxSize: max number of cached responses, default HMCObjectCache.defaultMaxSize
+          - @return: HMCObjectCache object
+        '''
+        if ttl == None:
+            ttl = HMCObjectCache.defaultTTL
+        if maxSize == None:
+            maxSize = HMCObjectCache.defaultMaxSize
+        self.objectCache = HMCObjectCache(ttl=ttl, maxSize=maxSize)
+        return self.objectCache
+
+    # -------------------------------------------- #
+    # - Disables cache of GET responses
+    # -------------------------------------------- #
+    def disableObjectCache(self):
+        '''
+          - Disables (and drops) cache of GET responses for this connection
+        '''
+        if self.objectCache != None:
+            self.objectCache.printStats()
+        self.objectCache = None
+
     # -------------------------------------------- #
     # - Queries HMC API version
     # -------------------------------------------- #
@@ -267,16 +338,13 @@ class HMCConnection:
         '''
         self.log.debug("Entered")
         try:
-            # create HTTP connection object
-            if self.useHttps == True:
-                self.log.debug("Establishing HTTPS connection to HMC %s...", self.hmcAPIHost)
-                self.hmcConn = httplib.HTTPSConnection(self.hmcAPIHost,
-                                                       self.hmcAPIPort,
-                                                       context=ssl._create_unverified_context())  # , timeout=self.httpTimeout)
-            else:
-                self.log.debug("Establishing HTTP connection to HMC...")
-                self.hmcConn = httplib.HTTPConnection(self.hmcAPIHost,
-                                                      self.hmcAPIPort)  # , timeout=self.httpTimeout)
+            # create pool of HTTP connection objects
+            if self.connPool == None:
+                self.connPool = HMCConnectionPool(self.hmcAPIHost,
+                                                  self.hmcAPIPort,
+                                                  useSSL=self.useHttps,
+                                                  maxSize=self.poolSize,
+                                                  checkoutTimeout=self.httpTimeout)
 
         # check HMC API version
             try:
@@ -304,6 +372,53 @@ class HMCConnection:
         '''
         return (self.sessionID != None)
 
+    # -------------------------------------------- #
+    # - Checks if request rejected as session expired
+    # -------------------------------------------- #
+    def isSessionExpired(self,
+                         response   # PooledHTTPResponse object
+                         ):
+        '''
+          - @return: True if HMC has rejected the request with HTTP status
+          -          403 and reason code 5 (session ID is not valid)
+        '''
+        if response.status != 403:
+            return False
+        try:
+            return json.loads(response.read()).get('reason') == 5
+        except (ValueError, AttributeError):
+            return False
+
+    # -------------------------------------------- #
+    # - Establishes new HMC session
+    # -------------------------------------------- #
+    def renewSession(self,
+                     staleSessionID     # session ID the request has failed with
+                     ):
+        '''
+          - Logs on to HMC again, unless the session has been renewed by
+          - another thread in the meantime
+          - @param staleSessionID: session ID the request has failed with
+          - @return: current session ID
+        '''
+        self.log.debug("Entered")
+        self.sessionLock.acquire()
+        try:
+            if self.sessionID == staleSessionID:
+                self.sessionID = None
+                self.notificationTopic = None
+                # notifications of the new session are published to another topic
+                if self.notificationListener != None:
+                    self.notificationListener.desynchronize("the HMC session has been renewed")
+                self.logon()
+            return self.sessionID
+        except HMCException as exc:
+            exc.setMethod("HMCConnection.renewSession")
+            raise exc
+        finally:
+            self.sessionLock.release()
+            self.log.debug("Completed")
+
     # -------------------------------------------- #
     # - Closes HMC API connection
     # -------------------------------------------- #
@@ -315,10 +430,12 @@ class HMCConnection:
           - @param headers: default headers for JSON
         '''
         self.log.debug("Entered")
+        self.sessionLock.acquire()
         try:
-            if self.hmcConn != None:
+            if self.connPool != None:
                 # do logoff
                 if self.sessionID != None:
+                    headers = dict(headers)
                     headers["X-API-Session"] = self.sessionID
                     response = self.makeRequest(method=WSA_COMMAND_DELETE,
                                                 path=WSA_URI_LOGOFF,
@@ -330,7 +447,7 @@ class HMCConnection:
                                                 "HMC Logoff",
                                                 goodHttpStatus=204,
                                                 badStatuses=[400])
-                self.hmcConn.close()
+                self.connPool.closeAll()
         except HMCException as exc:
             origExc = exc.origException
         # do nothing in the case of HTTP exception
@@ -338,9 +455,22 @@ class HMCConnection:
                 exc.printError()
                 raise exc
         finally:
+            # notifications of the session are not delivered after logoff
+            if self.notificationListener != None:
+                self.notificationListener.stop()
+                self.notificationListener = None
+            # the workers of the request loop exit after the queued requests,
+            # they are not waited for, as they may need the session lock
+            if self.requestLoop != None:
+                self.requestLoop.shutdown(wait=False)
+                self.requestLoop = None
             # clear session data
             self.sessionID = None
             self.notificationTopic = None
+            if self.objectCache != None:
+                self.objectCache.printStats()
+                self.objectCache.clear()
+            self.sessionLock.release()
             self.log.debug("Completed")
 
     # -------------------------------------------- #
@@ -356,7 +486,10 @@ class HMCConnection:
                     authenticateRequired=True
                     ):
         '''
-          - Performs HTTP request to HMC
+          - Performs HTTP request to HMC over a connection checked out of
+          - the connection pool. The response body is read completely before
+          - the connection is checked in, so it is safe to call this method
+          - from several threads at the same time
 
           - @param path:           HTTP request URL
           - @param method:         HTTP method
@@ -364,16 +497,26 @@ class HMCConnection:
           - @param headers:        HTTP request headers
           - @param logonRequired:  HMC API request requires HTTP session to be established?
           - @param attempts:       number of attempts to retry HTTP request
+          - @return: PooledHTTPResponse object
         '''
         self.log.debug("Entered")
         try:
+            # do not modify headers dictionary shared between the callers
+            headers = dict(headers)
             if logonRequired:
                 # establish HMC connection
                 if not self.isLoggedOn():
-                    self.logon(authenticateRequired)
+                    self.sessionLock.acquire()
+                    try:
+                        if not self.isLoggedOn():
+                            self.logon(authenticateRequired)
+                    finally:
+                        self.sessionLock.release()
             # setup session ID into HTTP header
                 if self.isLoggedOn():
                     headers["X-API-Session"] = self.sessionID
+            elif self.connPool == None:
+                self.logon(authenticateRequired=False)
             reqbody = None
             if body != None:
                 reqbody = body + "  "
@@ -388,28 +531,67 @@ class HMCConnection:
             if reqbody != None:
                 self.log.debug("\tBody: %s", reqbody)
 
+            # the session of the request is renewed if it has expired
+            renewable = logonRequired and "X-API-Session" in headers
+
         # do several attempts to send a request
             while True:
+                conn = None
+                sent = False
                 try:
                     response = None
-                    self.hmcConn.request(method, path, reqbody, headers)
-                    response = self.hmcConn.getresponse()
+                    conn = self.connPool.checkout()
+                    conn.request(method, path, reqbody, headers)
+                    sent = True
+                    response = PooledHTTPResponse(conn.getresponse())
+                    self.connPool.checkin(conn)
+                    # the connection may be checked out by another request from now on
+                    conn = None
+                    # the request has been rejected, send it again in a new session
+                    if renewable and attempts > 1 and self.isSessionExpired(response):
+                        attempts -= 1
+                        self.log.debug("HMC session has expired (attempts left: %d). %s",
+                                       attempts, "Trying to establish new HMC session")
+                        headers["X-API-Session"] = self.renewSession(headers["X-API-Session"])
+                        continue
+                    # responses cached for the changed object are stale now
+                    if method != WSA_COMMAND_GET and self.objectCache != None:
+                        self.objectCache.invalidate(path)
                     break
-            # do re-login in the case of any HTTP or SSLError Exception
-                except (httplib.HTTPException, ssl.SSLError) as exc:
+                except HMCException as exc:   # no free connection in the pool
+                    exc.setMethod("HMCConnection.makeRequest")
+                    raise exc
+            # re-connect in the case of any HTTP or SSLError Exception
+            # or a socket error on the connection reused from the pool
+                except (httplib.HTTPException, ssl.SSLError, socket.error) as exc:
+                    reused = conn != None and conn.hmcReused
+                    if conn != None:
+                        self.connPool.discard(conn)
                     attempts -= 1
-                    if attempts > 0:
+                    transportError = issubclass(type(exc), (httplib.HTTPException, ssl.SSLError))
+                    retriable = transportError or reused
+                    # POST or DELETE request may have been processed by HMC once it
+                    # has been sent (e.g. an object created), it is not sent again
+                    if sent and method in (WSA_COMMAND_POST, WSA_COMMAND_DELETE):
+                        retriable = False
+                    if attempts > 0 and retriable:
                         self.log.debug("%s %s (attempts left: %d); %s",
                                        "%s occurred." % (type(exc)),
-                                       "Trying to establish new HMC session",
+                                       "Trying to establish new HMC connection",
                                        attempts, exc)
-                    # try to re-login
-                        self.logoff()
-                        self.logon()
-                        headers["X-API-Session"] = self.sessionID
+                    # re-login in the case of any HTTP or SSLError Exception on a new
+                    # connection, a reused one may have been closed by HMC while idle
+                        if transportError and not reused and renewable:
+                            headers["X-API-Session"] = self.renewSession(headers["X-API-Session"])
                         continue
+                    if issubclass(type(exc), socket.error) and not issubclass(type(exc), ssl.SSLError):
+                        msg = "Got %s exception while doing makeRequest. Please, check host name/ip address[%s] and TCP port[%s]." % (type(exc),
+                                                                                                                                      self.hmcAPIHost,
+                                                                                                                                      self.hmcAPIPort)
+                    else:
+                        msg = "Got %s exception while doing makeRequest" % (type(exc))
                     exc = HMCException("HMCConnection.makeRequest",
-                                       "Got %s exception while doing makeRequest" % (type(exc)),
+                                       msg,
                                        origException=exc)
                     request = HTTPRequest(hmcHost=self.hmcAPIHost,
                                           hmcPort=self.hmcAPIPort,
@@ -419,16 +601,11 @@ class HMCConnection:
                     if response != None:
                         exc.setHTTPResponse(response)
                     raise exc
-            # catch socket-related errors
                 except Exception as exc:
-                    if issubclass(type(exc), socket.error):
-                        msg = "Got %s exception while doing makeRequest. Please, check host name/ip address[%s] and TCP port[%s]." % (type(exc),
-                                                                                                                                      self.hmcAPIHost,
-                                                                                                                                      self.hmcAPIPort)
-                    else:
-                        msg = "Got an exception while doing makeRequest"
+                    if conn != None:
+                        self.connPool.discard(conn)
                     exc = HMCException("HMCConnection.makeRequest",
-                                       msg,
+                                       "Got an exception while doing makeRequest",
                                        origException=exc)
                     if response != None:
                         exc.setHTTPResponse(response)
@@ -443,6 +620,468 @@ class HMCConnection:
         return response
 
 
+# ------------------------------------------------------------------ #
+# --------------- HMCConnectionPool object ------------------------- #
+# ------------------------------------------------------------------ #
+# - Bounded pool of keep-alive HTTP(S) connections to HMC API
+# ------------------------------------------------------------------ #
+class HMCConnectionPool:
+    '''
+      - Bounded pool of keep-alive HTTP(S) connections to HMC API web services
+      - Every connection is checked out for a single request/response exchange
+      - and is health-checked before it is handed out again
+    '''
+    maxIdleTime = 60    # seconds an idle connection is kept in the pool
+# logger object
+    log = logging.getLogger(HMC_API_LOGGER)
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 hmcHost,               # host name/IP address of HMC
+                 hmcPort,               # HMC API web services TCP port to connect
+                 useSSL=True,           # use HTTPS to connect to HMC
+                 maxSize=4,             # max number of opened connections
+                 checkoutTimeout=60,    # seconds to wait for a free connection
+                 maxIdleTime=maxIdleTime  # seconds an idle connection is kept
+                 ):
+        '''
+          - Constructor
+
+          - @param hmcHost:          host name/IP address of HMC
+          - @param hmcPort:          HMC API web services TCP port to connect
+          - @param useSSL:           use HTTPS to connect to HMC
+          - @param maxSize:          max number of opened connections
+          - @param checkoutTimeout:  seconds to wait for a free connection
+          - @param maxIdleTime:      seconds an idle connection is kept in the pool
+        '''
+        self.hmcHost = hmcHost
+        self.hmcPort = hmcPort
+        self.useHttps = useSSL
+        self.maxSize = max(1, maxSize)
+        self.checkoutTimeout = checkoutTimeout
+        self.maxIdleTime = maxIdleTime
+        self.sslContext = None
+        if useSSL:
+            self.sslContext = ssl._create_unverified_context()
+        self.cond = threading.Condition(threading.Lock())
+        self.idleConns = []     # list of (connection, time of last use) pairs
+        self.connCount = 0      # number of opened connections (idle and checked out)
+
+    # -------------------------------------------- #
+    # - Creates new HTTP(S) connection object
+    # -------------------------------------------- #
+    def newConnection(self):
+        '''
+          - Creates new HTTP(S) connection object
+          - @return: httplib.HTTPConnection (or HTTPSConnection) object
+        '''
+        if self.useHttps == True:
+            self.log.debug("Establishing HTTPS connection to HMC %s...", self.hmcHost)
+            conn = httplib.HTTPSConnection(self.hmcHost,
+                                           self.hmcPort,
+                                           context=self.sslContext)
+        else:
+            self.log.debug("Establishing HTTP connection to HMC...")
+            conn = httplib.HTTPConnection(self.hmcHost,
+                                          self.hmcPort)
+        conn.hmcReused = False
+        return conn
+
+    # -------------------------------------------- #
+    # - Checks idle connection before its reuse
+    # -------------------------------------------- #
+    def isHealthy(self,
+                  conn,       # idle connection
+                  lastUsed    # time the connection was checked in
+                  ):
+        '''
+          - Checks idle connection before its reuse. The connection is stale
+          - if it was idle for too long, or if its socket became readable,
+          - which means HMC closed it (or sent unexpected data)
+          - @return: True if the connection could be reused
+        '''
+        if self.maxIdleTime != None and time.time() - lastUsed > self.maxIdleTime:
+            return False
+        sock = conn.sock
+        if sock == None:
+            # closed by httplib, will be re-opened on next request
+            return True
+        try:
+            readable = select.select([sock], [], [], 0)[0]
+        except (select.error, socket.error, ValueError):
+            return False
+        return len(readable) == 0
+
+    # -------------------------------------------- #
+    # - Checks out connection from the pool
+    # -------------------------------------------- #
+    def checkout(self):
+        '''
+          - Checks out healthy idle connection or opens a new one if the pool
+          - is not full. Otherwise waits up to checkoutTimeout seconds
+          - @return: httplib.HTTPConnection (or HTTPSConnection) object
+        '''
+        deadline = time.time() + self.checkoutTimeout
+        self.cond.acquire()
+        try:
+            while True:
+                while len(self.idleConns) > 0:
+                    conn, lastUsed = self.idleConns.pop()
+                    if self.isHealthy(conn, lastUsed):
+                        conn.hmcReused = True
+                        return conn
+                    self.log.debug("Dropping stale connection to HMC %s", self.hmcHost)
+                    conn.close()
+                    self.connCount -= 1
+                if self.connCount < self.maxSize:
+                    self.connCount += 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    exc = HMCException("HMCConnectionPool.checkout",
+                                       "No free connection to HMC %s within %s seconds (pool size %s)" % (self.hmcHost,
+                                                                                                         self.checkoutTimeout,
+                                                                                                         self.maxSize))
+                    raise exc
+                self.cond.wait(remaining)
+        finally:
+            self.cond.release()
+        return self.newConnection()
+
+    # -------------------------------------------- #
+    # - Returns connection back to the pool
+    # -------------------------------------------- #
+    def checkin(self,
+                conn    # connection checked out before
+                ):
+        '''
+          - Returns connection back to the pool to be reused by next request
+          - @param conn: connection checked out before
+        '''
+        self.cond.acquire()
+        try:
+            if self.connCount > self.maxSize:
+                conn.close()
+                self.connCount -= 1
+            else:
+                self.idleConns.append((conn, time.time()))
+            self.cond.notify()
+        finally:
+            self.cond.release()
+
+    # -------------------------------------------- #
+    # - Closes broken connection
+    # -------------------------------------------- #
+    def discard(self,
+                conn    # connection checked out before
+                ):
+        '''
+          - Closes broken connection and frees its slot in the pool
+          - @param conn: connection checked out before
+        '''
+        self.cond.acquire()
+        try:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self.connCount -= 1
+            self.cond.notify()
+        finally:
+            self.cond.release()
+
+    # -------------------------------------------- #
+    # - Changes max number of opened connections
+    # -------------------------------------------- #
+    def setMaxSize(self,
+                   maxSize    # max number of opened connections
+                   ):
+        '''
+          - Changes max number of opened connections
+          - @param maxSize: max number of opened connections
+        '''
+        self.cond.acquire()
+        try:
+            self.maxSize = max(1, maxSize)
+            self.cond.notifyAll()
+        finally:
+            self.cond.release()
+
+    # -------------------------------------------- #
+    # - Closes all idle connections
+    # -------------------------------------------- #
+    def closeAll(self):
+        '''
+          - Closes all idle connections of the pool
+        '''
+        self.cond.acquire()
+        try:
+            for conn, lastUsed in self.idleConns:
+                conn.close()
+            self.connCount -= len(self.idleConns)
+            self.idleConns = []
+            self.cond.notifyAll()
+        finally:
+            self.cond.release()
+
+
+# ------------------------------------------------------------------ #
+# --------------- PooledHTTPResponse object ------------------------ #
+# ------------------------------------------------------------------ #
+# - HTTP response which body has been read completely
+# ------------------------------------------------------------------ #
+class PooledHTTPResponse:
+    '''
+      - HTTP response which body has been read completely, so that
+      - the connection could be returned back to the pool before
+      - the response is processed
+    '''
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 response   # httplib.HTTPResponse object
+                 ):
+        '''
+          - Constructor
+          - @param response: httplib.HTTPResponse object
+        '''
+        self.status = response.status
+        self.reason = response.reason
+        self.msg = response.msg
+        self.version = response.version
+        self.body = response.read()
+
+    # -------------------------------------------- #
+    # - Returns response body
+    # -------------------------------------------- #
+    def read(self):
+        '''
+          - Returns response body
+        '''
+        return self.body
+
+    # -------------------------------------------- #
+    # - Returns response header value
+    # -------------------------------------------- #
+    def getheader(self,
+                  name,
+                  default=None
+                  ):
+        '''
+          - Returns response header value
+          - @param name:    header name
+          - @param default: value to be returned if there is no such header
+        '''
+        return self.msg.getheader(name, default)
+
+    # -------------------------------------------- #
+    # - Returns list of (header, value) tuples
+    # -------------------------------------------- #
+    def getheaders(self):
+        '''
+          - Returns list of (header, value) tuples
+        '''
+        return self.msg.items()
+
+
+# ------------------------------------------------------------------ #
+# --------------- HMCObjectCache object ---------------------------- #
+# ------------------------------------------------------------------ #
+# - URI keyed cache of HMC GET responses
+# ------------------------------------------------------------------ #
+class HMCObjectCache:
+    '''
+      - URI keyed cache of HMC GET responses with time-to-live and
+      - bounded LRU eviction. Raw response bodies are kept, so that every
+      - hit is decoded into a new object, which the caller may change
+    '''
+    defaultTTL = 60         # seconds a response is kept
+    defaultMaxSize = 1024   # max number of cached responses
+# logger object
+    log = logging.getLogger(HMC_API_LOGGER)
+
+    # -------------------------------------------- #
+    # - Constructor
+    # -------------------------------------------- #
+    def __init__(self,
+                 ttl=defaultTTL,            # seconds a response is kept
+                 maxSize=defaultMaxSize     # max number of cached responses
+                 ):
+        '''
+          - Constructor
+          - @param ttl:     seconds a response is kept
+          - @param maxSize: max number of cached responses
+        '''
+        self.ttl = ttl
+        self.maxSize = maxSize
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()  # {<uri>: (<expiry time>, <body>)}, LRU first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # -------------------------------------------- #
+    # - Returns cached response body
+    # -------------------------------------------- #
+    def get(self,
+            uri     # request URI (with query string)
+            ):
+        '''
+          - Returns cached response body of the URI
+          - @param uri: request URI (with query string)
+          - @return: response body or None if not cached or expired
+        '''
+        self.lock.acquire()
+        try:
+            entry = self.entries.pop(uri, None)
+            if entry == None or entry[0] < time.time():
+                self.misses += 1
+                return None
+            # most recently used goes to the end
+            self.entries[uri] = entry
+            self.hits += 1
+            return entry[1]
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Stores response body
+    # -------------------------------------------- #
+    def put(self,
+            uri,    # request URI (with query string)
+            body    # response body
+            ):
+        '''
+          - Stores response body of the URI, evicting the least recently
+          - used responses if the cache is full
+          - @param uri:  request URI (with query string)
+          - @param body: response body
+        '''
+        self.lock.acquire()
+        try:
+            self.entries.pop(uri, None)
+            self.entries[uri] = (time.time() + self.ttl, body)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Drops responses affected by a change request
+    # -------------------------------------------- #
+    def invalidate(self,
+                   uri      # URI of POST/DELETE request
+                   ):
+        '''
+          - Drops cached responses of the object changed by a POST/DELETE
+          - request: its elements and sub-resources (URI prefix) and the
+          - objects it belongs to (parent URIs)
+          - @param uri: URI of POST/DELETE request
+        '''
+        objURI = uri.split('?')[0].split('/operations/')[0].rstrip('/')
+        self.lock.acquire()
+        try:
+            for key in self.entries.keys():
+                keyURI = key.split('?')[0]
+                if keyURI == objURI or keyURI.startswith(objURI + '/') or objURI.startswith(keyURI + '/'):
+                    del self.entries[key]
+                    self.invalidations += 1
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Applies property changes to cached responses
+    # -------------------------------------------- #
+    def update(self,
+               uri,         # object or element URI
+               changes      # {<property name>: <new value>}
+               ):
+        '''
+          - Applies property changes reported by HMC notifications to the
+          - cached responses of the object (with or without a property
+          - list), so that they are kept instead of being fetched again
+          - @param uri:     object or element URI
+          - @param changes: dictionary {<property name>: <new value>}
+          - @return: number of updated responses
+        '''
+        updated = 0
+        self.lock.acquire()
+        try:
+            for key, (expiry, body) in self.entries.items():
+                if key.split('?')[0] != uri:
+                    continue
+                try:
+                    props = json.loads(body)
+                except ValueError:
+                    props = None
+                if type(props) != dict:
+                    # not a properties response, fetch it again
+                    del self.entries[key]
+                    self.invalidations += 1
+                    continue
+                props.update(changes)
+                self.entries[key] = (expiry, json.dumps(props))
+                updated += 1
+        finally:
+            self.lock.release()
+        return updated
+
+    # -------------------------------------------- #
+    # - Drops responses of list operations
+    # -------------------------------------------- #
+    def invalidateLists(self):
+        '''
+          - Drops cached responses of list operations (collection URIs
+          - such as /api/cpcs/{id}/partitions), which are outdated when
+          - an object is added or removed
+        '''
+        self.lock.acquire()
+        try:
+            for key in self.entries.keys():
+                # collection URIs have an even number of segments
+                if len(key.split('?')[0].strip('/').split('/')) % 2 == 0:
+                    del self.entries[key]
+                    self.invalidations += 1
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Drops all responses
+    # -------------------------------------------- #
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.entries.clear()
+        finally:
+            self.lock.release()
+
+    # -------------------------------------------- #
+    # - Returns cache counters
+    # -------------------------------------------- #
+    def getStats(self):
+        '''
+          - @return: dictionary of cache counters
+        '''
+        return {'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations}
+
+    # -------------------------------------------- #
+    # - Logs cache counters
+    # -------------------------------------------- #
+    def printStats(self):
+        self.log.info("Object cache: %(hits)d hits, %(misses)d misses, %(evictions)d evictions, "
+                      "%(invalidations)d invalidations, %(size)d cached", self.getStats())
+
+
 # ------------------------------------------------------------------ #
 # --------------- HMCException object ------------------------------ #
 # ------------------------------------------------------------------ #
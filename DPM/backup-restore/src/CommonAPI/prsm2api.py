@@ -15,6 +15,7 @@ from hmcUtils import *
 import json
 import pickle
 import re
+import urllib
 from subprocess import Popen, PIPE
 from sys import exc_info
 
@@ -68,7 +69,8 @@ REPLACE_ASK_SKIP_WARNING = "Correct answer is r(replace), a(ask) or s(skip)"
 def createHMCConnection(hmcHost=None,       # HMC host name or ip address
                         defHost=None,       # default HMC host name or ip address
                         userID=None,        # user ID to be used for HMC authentication
-                        userPassword=None   # user password to be used for HMC authentication
+                        userPassword=None,  # user password to be used for HMC authentication
+                        poolSize=None       # max number of keep-alive connections to HMC
                         ):
     log.debug("Entered")
     keys = HMCs.keys()
@@ -86,6 +88,8 @@ def createHMCConnection(hmcHost=None,       # HMC host name or ip address
         hmcHost = HMCs[hmcHost]
 # create HMC connection object
     hmc = HMCConnection(hmcHost=hmcHost, hmcPort=HMC_API_SSL_port)
+    if poolSize != None:
+        hmc.setPoolSize(poolSize)
 # set user ID/password if defined
     if userID != None and userPassword != None:
         hmc.setUserCredential(userid=userID, password=userPassword)
@@ -128,6 +132,23 @@ def assertHttpResponse(response,                # HTTPResponse object to be chec
         log.debug("Completed")
 
 
+def getExceptionHTTPStatus(exc     # HMCException object
+                           ):
+    '''
+      - Returns HTTP status code of the HMC error response carried by exc,
+      - or None if the exception was not caused by an HTTP error response
+    '''
+    httpResponse = exc.httpResponse
+    if httpResponse == None:
+        return None
+    if hasattr(httpResponse, 'status'):
+        return httpResponse.status
+    try:
+        return json.loads(httpResponse)['http-status']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
 def assertValue(jsonObj=None,
                 #                arrayObj = None,
                 pyObj=None,
@@ -176,7 +197,11 @@ def assertValue(jsonObj=None,
                     else:
                         retObj = retObj[listIndex]
                 if type(retObj) == unicode:
-                    retObj = str(retObj)
+                    try:
+                        retObj = str(retObj)
+                    except UnicodeEncodeError:
+                        # non-ASCII text (e.g. a description) is kept as UTF-8
+                        retObj = retObj.encode('utf-8')
                 return retObj
             except KeyError as exc:           # no such key in python object
                 if not optionalKey:
@@ -440,22 +465,32 @@ def getHMCObject(hmcConn,
                  returnJsonObj=False,
                  returnXMLObj=False,
                  exceptionLogLevel=logging.ERROR,
-                 httpHeaders={"Content-type": "application/json", "Accept": "*/*"}
+                 httpHeaders={"Content-type": "application/json", "Accept": "*/*"},
+                 useCache=True
                  ):
     log.debug("Entered")
     response = None
     obj = None
     try:
-        # get list from HMC by path and httpBody
-        response = hmcConn.makeRequest(method=httpMethod,
-                                       path=httpPath, body=httpBody, headers=httpHeaders)
-    # check HTTP response status code
-        assertHttpResponse(response, "getHMCObject", actionDesc,
-                           goodHttpStatus=httpGoodStatus,
-                           badStatuses=httpBadStatuses,
-                           exceptionLogLevel=exceptionLogLevel)
-    # parse HTTP response body
-        respBody = response.read()
+        # GET responses are served from the object cache of the connection, if enabled
+        cache = None
+        respBody = None
+        if useCache and httpMethod == WSA_COMMAND_GET:
+            cache = hmcConn.objectCache
+        if cache != None:
+            respBody = cache.get(httpPath)
+        cacheMiss = (respBody == None)
+        if cacheMiss:
+            # get list from HMC by path and httpBody
+            response = hmcConn.makeRequest(method=httpMethod,
+                                           path=httpPath, body=httpBody, headers=httpHeaders)
+        # check HTTP response status code
+            assertHttpResponse(response, "getHMCObject", actionDesc,
+                               goodHttpStatus=httpGoodStatus,
+                               badStatuses=httpBadStatuses,
+                               exceptionLogLevel=exceptionLogLevel)
+        # parse HTTP response body
+            respBody = response.read()
 
         if returnXMLObj:            # return XML object 'as-is'
             obj = respBody
@@ -464,6 +499,8 @@ def getHMCObject(hmcConn,
         else:                       # just check if returned object is correct JSON
             assertValue(jsonObj=respBody)
             obj = respBody
+        if cache != None and cacheMiss:
+            cache.put(httpPath, respBody)
 
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getHMCObject")
@@ -486,7 +523,8 @@ def getHMCObjectList(hmcConn,
                      httpMethod=WSA_COMMAND_GET,
                      httpBody=None,
                      httpGoodStatus=200,
-                     httpBadStatuses=[400, 404]
+                     httpBadStatuses=[400, 404],
+                     exceptionLogLevel=logging.ERROR
                      ):
     log.debug("Entered")
     response = None
@@ -498,7 +536,8 @@ def getHMCObjectList(hmcConn,
         # check HTTP response status code
         assertHttpResponse(response, "getHMCObjectList", actionDesc,
                            goodHttpStatus=httpGoodStatus,
-                           badStatuses=httpBadStatuses)
+                           badStatuses=httpBadStatuses,
+                           exceptionLogLevel=exceptionLogLevel)
 
         # parse HTTP response body
         respBody = response.read()
@@ -525,6 +564,137 @@ def getHMCObjectList(hmcConn,
 
 
 
+# ------------------------------------------------------------------ #
+# --------- Start of getHMCObjectProperties function --------------- #
+# ------------------------------------------------------------------ #
+def getHMCObjectProperties(hmcConn,
+                           httpPath,
+                           actionDesc,
+                           properties=None
+                           ):
+    '''
+      - Gets object (or element) properties. If properties list is
+      - specified only those properties are requested from HMC
+      - (properties query parameter). If HMC rejects the parameter, all
+      - properties are requested, and for the rest of the session
+      - @param properties: list of property names or None for all
+    '''
+    log.debug("Entered")
+    try:
+        if properties != None and not hmcConn.propertiesRejected:
+            query = '?properties=' + urllib.quote(','.join(properties), safe=',')
+            try:
+                return getHMCObject(hmcConn,
+                                    httpPath + query,
+                                    actionDesc,
+                                    exceptionLogLevel=logging.DEBUG)
+            except HMCException as exc:
+                if getExceptionHTTPStatus(exc) != 400:
+                    raise exc
+                log.warning("%s: properties query parameter rejected by HMC, getting all properties",
+                            actionDesc)
+                hmcConn.propertiesRejected = True
+        return getHMCObject(hmcConn, httpPath, actionDesc)
+    except HMCException as exc:   # raise HMCException
+        exc.setMethod("getHMCObjectProperties")
+        raise exc
+    finally:
+        log.debug("Completed")
+# ------------------------------------------------------------------ #
+# ----------- End of getHMCObjectProperties function --------------- #
+# ------------------------------------------------------------------ #
+
+# ------------------------------------------------------------------ #
+# --------- Start of getFilteredHMCObjectList function ------------- #
+# ------------------------------------------------------------------ #
+def nameFilter(name     # exact object name
+               ):
+    '''
+      - Returns 'name' query filter (regular expression) matching exactly
+      - the specified object name
+    '''
+    return '^%s$' % (re.escape(name))
+
+
+def buildQueryString(filters    # dictionary {<property name>: <value>}
+                     ):
+    '''
+      - Returns query string (with leading '?') for list operation filters,
+      - filters with None value are skipped
+    '''
+    query = []
+    for propName in sorted(filters.keys()):
+        if filters[propName] != None:
+            query.append("%s=%s" % (propName, urllib.quote(str(filters[propName]), safe='/')))
+    if len(query) == 0:
+        return ''
+    return '?' + '&'.join(query)
+
+
+def matchFilters(objInfo,       # item of list operation response
+                 filters        # dictionary {<property name>: <value>}
+                 ):
+    '''
+      - Checks list response item against query filters on the client
+      - side. 'name' filter is a regular expression, others are compared
+    '''
+    for propName, value in filters.items():
+        if value == None:
+            continue
+        if propName == 'name':
+            if re.match('(?:%s)\Z' % (value), objInfo.get(propName, '')) == None:
+                return False
+        elif objInfo.get(propName) != value:
+            return False
+    return True
+
+
+def getFilteredHMCObjectList(hmcConn,
+                             httpPath,
+                             actionDesc,
+                             responseKey,
+                             filters=None,
+                             httpBadStatuses=[400]
+                             ):
+    '''
+      - Lists objects with filters pushed into the query string of the
+      - list request. Falls back to client-side filtering of the full
+      - list only if HMC rejects the filter (HTTP status 400)
+    '''
+    log.debug("Entered")
+    try:
+        if filters == None:
+            filters = {}
+        query = buildQueryString(filters)
+        if query != '' and httpPath not in hmcConn.rejectedFilterURIs:
+            try:
+                return getHMCObjectList(hmcConn,
+                                        httpPath + query,
+                                        actionDesc,
+                                        responseKey,
+                                        httpBadStatuses=httpBadStatuses,
+                                        exceptionLogLevel=logging.DEBUG)
+            except HMCException as exc:
+                if getExceptionHTTPStatus(exc) != 400:
+                    raise exc
+                log.warning("%s: query filters %s rejected by HMC, filtering on client side",
+                            actionDesc, query)
+                hmcConn.rejectedFilterURIs.add(httpPath)
+        objArray = getHMCObjectList(hmcConn,
+                                    httpPath,
+                                    actionDesc,
+                                    responseKey,
+                                    httpBadStatuses=httpBadStatuses)
+        return [objInfo for objInfo in objArray if matchFilters(objInfo, filters)]
+    except HMCException as exc:   # raise HMCException
+        exc.setMethod("getFilteredHMCObjectList")
+        raise exc
+    finally:
+        log.debug("Completed")
+# ------------------------------------------------------------------ #
+# ----------- End of getFilteredHMCObjectList function ------------- #
+# ------------------------------------------------------------------ #
+
 # ------------------------------------------------------------------ #
 # -------------- Start of createPartition function ----------------- #
 # ------------------------------------------------------------------ #
@@ -558,15 +728,20 @@ def createPartition(hmcConn,  # HMCConnection object
 # ------------------------------------------------------------------ #
 # -------------- Start of getCPCsList function --------------------- #
 # ------------------------------------------------------------------ #
-def getCPCsList(hmcConn):
+def getCPCsList(hmcConn,
+                cpcName=None):
     log.debug("Entered")
     try:
         URI = WSA_URI_CPCS
         # get CPCs list
-        return getHMCObjectList(hmcConn, URI,
-                                "List CPCs",
-                                "cpcs",
-                                httpBadStatuses=[400])
+        filters = {}
+        if cpcName != None:
+            filters['name'] = nameFilter(cpcName)
+        return getFilteredHMCObjectList(hmcConn, URI,
+                                        "List CPCs",
+                                        "cpcs",
+                                        filters=filters,
+                                        httpBadStatuses=[400])
     except HMCException as exc:  # raise HMCException
         exc.setMethod("getCPCsList")
         raise exc
@@ -590,7 +765,7 @@ def selectCPC(hmcConn,
                                "You should specify hmcConn parameter!")
             raise exc
         # get CPCs list
-        cpcs = getCPCsList(hmcConn)
+        cpcs = getCPCsList(hmcConn, cpcName)
         # check CPCs list
         if len(cpcs) == 0:
             if cpcName != None:
@@ -661,12 +836,71 @@ def getCPCPartitionsList(hmcConn,
 # --------- End of getCPCPartitionsList function ------------------- #
 # ------------------------------------------------------------------ #
 
+# ------------------------------------------------------------------ #
+# ------- Start of getCPCAdaptersList function --------------------- #
+# ------------------------------------------------------------------ #
+def getCPCAdaptersList(hmcConn,
+                       cpcID,
+                       adapterName=None,
+                       adapterType=None
+                       ):
+    log.debug("Entered")
+    try:
+        # get adapter list of a cpc, filtered by HMC
+        filters = {'type': adapterType}
+        if adapterName != None:
+            filters['name'] = nameFilter(adapterName)
+        return getFilteredHMCObjectList(hmcConn,
+                                        WSA_URI_ADAPTERS_CPC % cpcID,
+                                        "List Adapters of a CPC",
+                                        "adapters",
+                                        filters=filters,
+                                        httpBadStatuses=[400, 404])
+    except HMCException as exc:   # raise HMCException
+        exc.setMethod("getCPCAdaptersList")
+        raise exc
+    finally:
+        log.debug("Completed")
+# ------------------------------------------------------------------ #
+# --------- End of getCPCAdaptersList function --------------------- #
+# ------------------------------------------------------------------ #
+
+# ------------------------------------------------------------------ #
+# ------- Start of getCPCVirtualSwitchesList function -------------- #
+# ------------------------------------------------------------------ #
+def getCPCVirtualSwitchesList(hmcConn,
+                              cpcID,
+                              vsName=None,
+                              vsType=None
+                              ):
+    log.debug("Entered")
+    try:
+        # get virtual switch list of a cpc, filtered by HMC
+        filters = {'type': vsType}
+        if vsName != None:
+            filters['name'] = nameFilter(vsName)
+        return getFilteredHMCObjectList(hmcConn,
+                                        WSA_URI_VIRTUAL_SWITCHES_CPC % cpcID,
+                                        "List Virtual Switches of a CPC",
+                                        "virtual-switches",
+                                        filters=filters,
+                                        httpBadStatuses=[400, 404])
+    except HMCException as exc:   # raise HMCException
+        exc.setMethod("getCPCVirtualSwitchesList")
+        raise exc
+    finally:
+        log.debug("Completed")
+# ------------------------------------------------------------------ #
+# --------- End of getCPCVirtualSwitchesList function -------------- #
+# ------------------------------------------------------------------ #
+
 # ------------------------------------------------------------------ #
 # --------- Start of getPartitionProperties function --------------- #
 # ------------------------------------------------------------------ #
 def getPartitionProperties(hmcConn,
                            parID=None,
-                           parURI=None):
+                           parURI=None,
+                           properties=None):
     log.debug("Entered")
     try:
         # check input params
@@ -679,8 +913,10 @@ def getPartitionProperties(hmcConn,
                                "You should specify either parURI or parID parameters")
             raise exc
         # get partition properties
-        return getHMCObject(hmcConn, URI,
-                            "Get Partition Properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get Partition Properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getPartitionProperties")
         raise exc
@@ -695,7 +931,8 @@ def getPartitionProperties(hmcConn,
 # ------------------------------------------------------------------ #
 def getStorageGroupProperties(hmcConn,
                               sgID=None,
-                              sgURI=None):
+                              sgURI=None,
+                              properties=None):
     log.debug("Entered")
     try:
         # check input params
@@ -708,9 +945,10 @@ def getStorageGroupProperties(hmcConn,
                                "You should specify either sgID or sgURI parameters")
             raise exc
         # get partition properties
-        return getHMCObject(hmcConn,
-                            URI,
-                            "Get Storage Group Properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get Storage Group Properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getStorageGroupProperties")
         raise exc
@@ -724,7 +962,8 @@ def getStorageGroupProperties(hmcConn,
 # --------- Start of getVirtualStorageResourceProperties function -- #
 # ------------------------------------------------------------------ #
 def getVirtualStorageResourceProperties(hmcConn,
-                                        vsrUri=None):
+                                        vsrUri=None,
+                                        properties=None):
     log.debug("Entered")
     try:
         # check input params
@@ -735,8 +974,10 @@ def getVirtualStorageResourceProperties(hmcConn,
                                "You should specify either URI parameters")
             raise exc
         # get partition properties
-        return getHMCObject(hmcConn, URI,
-                            "Get Virtual Storage Resource Properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get Virtual Storage Resource Properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getVirtualStorageResourceProperties")
         #raise exc
@@ -831,6 +1072,37 @@ def createNIC(hmcConn,
 # ----------------- End of createNIC function ---------------------- #
 # ------------------------------------------------------------------ #
 
+# ------------------------------------------------------------------ #
+# --------- Start of updateNICProperties function ------------------ #
+# ------------------------------------------------------------------ #
+def updateNICProperties(hmcConn,
+                        nicURI=None,
+                        nicProp=None):
+    log.debug("Entered")
+    try:
+        # check input params
+        if nicURI == None or nicProp == None:
+            exc = HMCException("updateNICProperties",
+                               "you should specify nicURI and nicProp")
+            raise exc
+        # update NIC properties
+        getHMCObject(hmcConn,
+                     httpPath=nicURI,
+                     actionDesc='Update NIC Properties',
+                     httpMethod=WSA_COMMAND_POST,
+                     httpBody=json.dumps(nicProp),
+                     httpGoodStatus=204,
+                     httpBadStatuses=[400, 403, 404, 409, 503])
+        return True
+    except HMCException as exc:   # raise HMCException
+        exc.setMethod("updateNICProperties")
+        raise exc
+    finally:
+        log.debug("Completed")
+# ------------------------------------------------------------------ #
+# ----------- End of updateNICProperties function ------------------ #
+# ------------------------------------------------------------------ #
+
 
 # ------------------------------------------------------------------ #
 # ----------------- Start of getHBAProperties ---------------------- #
@@ -838,7 +1110,8 @@ def createNIC(hmcConn,
 def getHBAProperties(hmcConn,
                      hbaURI=None,
                      hbaID=None,
-                     parID=None):
+                     parID=None,
+                     properties=None):
     log.debug("Entered")
     try:
         # Check input params
@@ -850,9 +1123,10 @@ def getHBAProperties(hmcConn,
             exc = HMCException("getHBAProperties",
                                "you should specify either hbaURI or both hbaID and parID")
         # get NIC properties
-        return getHMCObject(hmcConn,
-                            URI,
-                            "Get HBA properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get HBA properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getHBAProperties")
         raise exc
@@ -868,7 +1142,8 @@ def getHBAProperties(hmcConn,
 def getStorPortProperties(hmcConn,
                      storPortURI=None,
                      adapID=None,
-                     storPortID=None):
+                     storPortID=None,
+                     properties=None):
     log.debug("Entered")
     try:
         # Check input params
@@ -880,9 +1155,10 @@ def getStorPortProperties(hmcConn,
             exc = HMCException("getStorPortProperties",
                                "you should specify either storPortURI or both adapID and storPortID")
         # get NIC properties
-        return getHMCObject(hmcConn,
-                            URI,
-                            "Get Storage Port properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get Storage Port properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getStorPortProperties")
         raise exc
@@ -959,7 +1235,8 @@ def attachStorageGroup(hmcConn,
 def getNICProperties(hmcConn,
                      nicURI=None,
                      nicID=None,
-                     parID=None):
+                     parID=None,
+                     properties=None):
     log.debug("Entered")
     try:
         # Check input params
@@ -971,9 +1248,10 @@ def getNICProperties(hmcConn,
             exc = HMCException("getNICProperties",
                                "you should specify either nicURI or both nicID and parID")
         # get NIC properties
-        return getHMCObject(hmcConn,
-                            URI,
-                            "Get NIC properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get NIC properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getNICProperties")
         raise exc
@@ -1012,6 +1290,37 @@ def createVirtualFunction(hmcConn,
     finally:
         log.debug("Completed")
 
+# ------------------------------------------------------------------ #
+# --------------- Start of updateVirtualFunctionProperties --------- #
+# ------------------------------------------------------------------ #
+def updateVirtualFunctionProperties(hmcConn,
+                                    virtFuncURI=None,
+                                    virtFuncProp=None):
+    log.debug("Entered")
+    try:
+        # check the input params
+        if virtFuncURI == None or virtFuncProp == None:
+            exc = HMCException("updateVirtualFunctionProperties",
+                               "you should specify virtFuncURI and virtFuncProp")
+            raise exc
+        # update virtual function properties
+        getHMCObject(hmcConn,
+                     httpPath=virtFuncURI,
+                     actionDesc='Update Virtual Function Properties',
+                     httpMethod=WSA_COMMAND_POST,
+                     httpBody=json.dumps(virtFuncProp),
+                     httpGoodStatus=204,
+                     httpBadStatuses=[400, 403, 404, 409, 503])
+        return True
+    except HMCException as exc:   # raise HMCException
+        exc.setMethod("updateVirtualFunctionProperties")
+        raise exc
+    finally:
+        log.debug("Completed")
+# ------------------------------------------------------------------ #
+# ------- End of updateVirtualFunctionProperties function ---------- #
+# ------------------------------------------------------------------ #
+
 # ------------------------------------------------------------------ #
 # --------------- Start of increaseCryptoConfiguration ------------- #
 # ------------------------------------------------------------------ #
@@ -1045,7 +1354,8 @@ def increaseCryptoConfiguration(hmcConn,
 # ----------------- Start of getVirtFuncProperties ----------------- #
 # ------------------------------------------------------------------ #
 def getVirtFuncProperties(hmcConn,
-                          virtFuncURI=None):
+                          virtFuncURI=None,
+                          properties=None):
     log.debug("Entered")
     try:
         # Check input params
@@ -1055,9 +1365,10 @@ def getVirtFuncProperties(hmcConn,
             raise exc
         else:
             URI = virtFuncURI
-            return getHMCObject(hmcConn,
-                               URI,
-                               "Get Virtual-Function properties")
+            return getHMCObjectProperties(hmcConn,
+                                          URI,
+                                          "Get Virtual-Function properties",
+                                          properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getVirtFuncProperties")
         raise exc
@@ -1073,7 +1384,8 @@ def getVirtFuncProperties(hmcConn,
 # ------------------------------------------------------------------ #
 def selectAdapter(hmcConn=None,
                   adapterName=None,
-                  cpcID=None):
+                  cpcID=None,
+                  adapterType=None):
     log.debug("Entered")
     try:
         log.debug("Getting Adapters list..")
@@ -1083,7 +1395,9 @@ def selectAdapter(hmcConn=None,
                                "You should specify both adapterName and cpcName!")
             raise exc
         # get adapters list on the cpc
-        adapRet = getCPCAdaptersList(hmcConn, cpcID)
+        adapRet = getCPCAdaptersList(hmcConn, cpcID,
+                                     adapterName=adapterName,
+                                     adapterType=adapterType)
         # check adapters list
         if len(adapRet) == 0:
             msg = "No such adapter %s. Exiting..." % (adapterName)
@@ -1138,7 +1452,8 @@ def selectAdapter(hmcConn=None,
 # ------- Start of selectStorageGroup function --------------------- #
 # ------------------------------------------------------------------ #
 def selectStorageGroup(hmcConn=None,
-                       storageGroupName=None
+                       storageGroupName=None,
+                       cpcURI=None
                        ):
     log.debug("Entered")
     sgUri = None
@@ -1147,7 +1462,9 @@ def selectStorageGroup(hmcConn=None,
             exc = HMCException("selectStorageGroup",
                                "You should specify the hmc connection!")
             raise exc
-        sgRet = getStorageGroupList(hmcConn)
+        sgRet = getStorageGroupList(hmcConn,
+                                    sgName=storageGroupName,
+                                    cpcURI=cpcURI)
         # check storage group list
         if len(sgRet) == 0:
             msg = "Couldn't find any storage group in the HMC connection. Exiting..."
@@ -1175,8 +1492,16 @@ def selectStorageGroup(hmcConn=None,
 def selectVirtualSwitch(hmcConn=None,
                         cpcID=None,
                         adapterUri=None,
-                        adapterPort=None
+                        adapterPort=None,
+                        vsMap=None
                         ):
+    '''
+      - Returns URI of the virtual switch backed by adapter port.
+      - Switches are looked up in the VirtualSwitchMap of the CPC, which
+      - is built once per connection and shared by all callers
+      - @param vsMap: hmcResolver.VirtualSwitchMap object to be used
+      -               instead of the map of the connection
+    '''
     log.debug("Entered")
     vsUri = None
     try:
@@ -1184,16 +1509,14 @@ def selectVirtualSwitch(hmcConn=None,
             exc = HMCException("selectVirtualSwitch",
                                "You should specify both hmc connection and cpcID!")
             raise exc
-        vsRet = getCPCVirtualSwitchesList(hmcConn, cpcID)
-        # check virtual switches list
-        if len(vsRet) == 0:
-            msg = "No such virtual switch, backing adapter url is %s. Exiting..." % (adapterUri)
+        if vsMap == None:
+            # hmcResolver imports this module
+            import hmcResolver
+            vsMap = hmcResolver.getVirtualSwitchMap(hmcConn, cpcID)
+        vsUri = vsMap.lookup(adapterUri.decode("utf-8"), adapterPort)
+        if vsUri == None:
+            msg = "No such virtual switch, backing adapter url is %s, port %s." % (adapterUri, adapterPort)
             log.warning(msg)
-        for vsInfo in vsRet:
-            vsPropsTemp = getVirtualSwitchProperties(hmcConn, vsURI=vsInfo["object-uri"])
-            if vsPropsTemp["backing-adapter-uri"] == adapterUri.decode("utf-8") and vsPropsTemp["port"] == int(adapterPort):
-                vsUri = vsPropsTemp["object-uri"]
-                break
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getCPCVirtualSwitchesList")
         raise exc
@@ -1212,15 +1535,22 @@ def selectVirtualSwitch(hmcConn=None,
 # ------- Start of getStorageGroupList function -------------------- #
 # ------------------------------------------------------------------ #
 def getStorageGroupList(hmcConn,
+                        sgName=None,
+                        sgType=None,
+                        cpcURI=None
                         ):
     log.debug("Entered")
     try:
-        # get storage group list
-        return getHMCObjectList(hmcConn,
-                                WSA_URI_LIST_STORAGE_GROUP,
-                                "List Storage Groups",
-                                "storage-groups",
-                                httpBadStatuses=[400])
+        # get storage group list, filtered by HMC
+        filters = {'type': sgType, 'cpc-uri': cpcURI}
+        if sgName != None:
+            filters['name'] = nameFilter(sgName)
+        return getFilteredHMCObjectList(hmcConn,
+                                        WSA_URI_LIST_STORAGE_GROUP,
+                                        "List Storage Groups",
+                                        "storage-groups",
+                                        filters=filters,
+                                        httpBadStatuses=[400])
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getStorageGroupList")
         raise exc
@@ -1309,7 +1639,8 @@ def updateVirtualStorageResourceProperties(hmcConn,
 # --------- Start of getAdapterProperties function ----------------- #
 # ------------------------------------------------------------------ #
 def getAdapterProperties(hmcConn,
-                         adaURI=None):
+                         adaURI=None,
+                         properties=None):
     log.debug("Entered")
     try:
         # check input params
@@ -1320,9 +1651,10 @@ def getAdapterProperties(hmcConn,
                                "You should specify the adaURI parameters")
             raise exc
         # get Adpater properties
-        return getHMCObject(hmcConn,
-                            URI,
-                            "Get Adapter Properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get Adapter Properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getAdapterProperties")
         raise exc
@@ -1336,7 +1668,8 @@ def getAdapterProperties(hmcConn,
 # --------- Start of getVirtualSwitchProperties function ----------- #
 # ------------------------------------------------------------------ #
 def getVirtualSwitchProperties(hmcConn,
-                               vsURI=None):
+                               vsURI=None,
+                               properties=None):
     log.debug("Entered")
     try:
         # check input params
@@ -1347,8 +1680,10 @@ def getVirtualSwitchProperties(hmcConn,
                                "You should specify the vsURI parameters")
             raise exc
         # get Virtual Switch properties
-        return getHMCObject(hmcConn, URI,
-                            "Get Virtual Switch Properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get Virtual Switch Properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getVirtualSwitchProperties")
         raise exc
@@ -1446,7 +1781,8 @@ def getStorVolListOfSG(hmcConn=None,
 # --------- Start of getStorVolProperties function ----------------- #
 # ------------------------------------------------------------------ #
 def getStorVolProperties(hmcConn=None,
-                         storVolURI=None):
+                         storVolURI=None,
+                         properties=None):
     log.debug("Entered")
     try:
         if storVolURI != None:
@@ -1456,9 +1792,10 @@ def getStorVolProperties(hmcConn=None,
                                "You should specify storVolURI parameter")
              raise exc
         # get storage volume properties
-        return getHMCObject(hmcConn,
-                            URI,
-                            "Get Storage-Volume Properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get Storage-Volume Properties",
+                                      properties=properties)
     except HMCException as exc:   # raise HMCException
         exc.setMethod("getStorVolProperties")
         raise exc
@@ -1469,7 +1806,8 @@ def getStorVolProperties(hmcConn=None,
 # ------------------------------------------------------------------ #
 
 def getStorageControlUnitProperties(hmcConn=None,
-                                    StorctrlUnitUri=None):
+                                    StorctrlUnitUri=None,
+                                    properties=None):
     log.debug("Entered")
     try:
         if StorctrlUnitUri != None:
@@ -1479,9 +1817,10 @@ def getStorageControlUnitProperties(hmcConn=None,
                                "You should specify StorctrlUnitUri parameter")
             raise exc
         # Get Storage Control Unit Properties
-        return getHMCObject(hmcConn,
-                            URI,
-                            "Get Storage Control Unit Properties")
+        return getHMCObjectProperties(hmcConn,
+                                      URI,
+                                      "Get Storage Control Unit Properties",
+                                      properties=properties)
     except HMCException as exc:
         exc.setMethod("getStorageControlUnitProperties")
         raise exc
@@ -354,6 +354,9 @@ WSA_URI_ATTACH_STORAGE_GROUP = '/api/partitions/%s/operations/attach-storage-gro
 WSA_URI_LIST_VIRTUAL_STORAGE_RESOURCES = '/api/storage-groups/%s/virtual-storage-resources'
 
 WSA_URI_REQUEST_STORAGE_GROUP_FULFILLMENT = '/api/storage-groups/%s/operations/request-fulfillment'
+
+# Get Inventory (bulk retrieval of resources managed by HMC)
+WSA_URI_INVENTORY = '/api/services/inventory'
 #############################################################################
 # Testcase exit return codes
 #############################################################################
@@ -431,6 +434,9 @@ WSA_PORT_NON_SSL = 6167
 # SSL HTTP Port ... needs HTTPSConnection ...
 WSA_PORT_SSL     = 6794
 
+# STOMP Port of the JMS notification service (SSL)
+WSA_PORT_STOMP_SSL = 61612
+
 # HTTP GET command
 WSA_COMMAND_GET    = 'GET'
 
@@ -0,0 +1,120 @@
+'''
+This script intends to convert partition and storage group config files (.cfg), generated by
+parsBackup.py, sgBackup.py or cpcBackup.py, into a single structured backup file (.backup.json,
+.backup.json.gz or .backup.json.zst), which may hold the backups of several CPCs.
+
+The CPC name and the kind of every config file are taken from its name, e.g.
+M90-Partitions-20180409-104344.cfg or M90-StorGroups-Delta-20180410-091502.cfg. Records files
+(.jsonl) of backups in stream mode and snapshot indexes (.json) of incremental backups are
+accepted as well. The sections of later files replace the sections of earlier files of the
+same CPC and kind, so a full backup and its deltas are converted by listing them in order.
+'''
+
+from CommonAPI.prsm2api import *
+from CommonAPI.wsaconst import *
+from CommonAPI.hmcUtils import *
+from CommonAPI.hmcSnapshot import *
+from CommonAPI.hmcRecords import *
+from CommonAPI.hmcBackupFile import *
+import argparse
+
+
+# config files to be converted
+configFiles = None
+# structured backup file to be written
+outputFile = None
+# CPC name of the config files, if it is not in their names
+cpcName = None
+
+# names of config files, records files and snapshot indexes
+CONFIG_FILE_NAME = re.compile(r'^(?P<cpc>.+)-(?P<kind>Partitions|StorGroups)(-Delta)?-\d{8}-\d{6}\.(cfg|jsonl)$')
+SNAPSHOT_FILE_NAME = re.compile(r'^(?P<cpc>.+)-(?P<kind>Partitions|StorGroups)-Snapshot\.json$')
+# section kinds by the kind in file names
+CONFIG_FILE_KINDS = {'Partitions': BACKUP_PARTITIONS,
+                     'StorGroups': BACKUP_STORAGE_GROUPS}
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of parseArgs function ---------------------------- #
+# ------------------------------------------------------------------ #
+def parseArgs():
+    '''
+    - parse arguments input for this script
+    '''
+    global configFiles, outputFile, cpcName
+    parser = argparse.ArgumentParser(description="Convert config files into a structured backup file")
+    parser.add_argument('-config', '--configFile', metavar='<config file>', nargs='+',
+                        help='config files (.cfg), records files (.jsonl) or snapshot indexes (.json)', required=True)
+    parser.add_argument('-output', '--outputFile', metavar='<backup file>',
+                        help='structured backup file (.backup.json, .backup.json.gz or .backup.json.zst)',
+                        required=True)
+    parser.add_argument('-cpc', '--cpcName', metavar='<cpc name>',
+                        help='CPC name of the config files, if it is not in their names', required=False)
+
+    args = vars(parser.parse_args())
+    configFiles = assertValue(pyObj=args, key='configFile')
+    outputFile = assertValue(pyObj=args, key='outputFile')
+    cpcName = assertValue(pyObj=args, key='cpcName', optionalKey=True)
+
+# ------------------------------------------------------------------ #
+# --------- End of parseArgs function ------------------------------ #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of loadConfigFile function ----------------------- #
+# ------------------------------------------------------------------ #
+def loadConfigFile(configFile, cpcName=None):
+    '''
+    - load sections of a config file, records file or snapshot index
+    - return (<cpc name>, <kind>, {<section>: {<key>: <value>}})
+    '''
+    fileName = os.path.basename(configFile)
+    match = CONFIG_FILE_NAME.match(fileName) or SNAPSHOT_FILE_NAME.match(fileName)
+    if match == None:
+        exc = HMCException("loadConfigFile",
+                           "The CPC name and kind of %s are unknown, expected <cpc>-Partitions-<time>.cfg "
+                           "or <cpc>-StorGroups-<time>.cfg" % (fileName))
+        raise exc
+    if fileName.endswith('.jsonl'):
+        sectionDict = loadRecordsConfig(configFile)
+    elif fileName.endswith('.json'):
+        sectionDict = loadSnapshotConfig(configFile)
+    else:
+        sectionDict = loadBackupSections(configFile)
+    return (cpcName or match.group('cpc'), CONFIG_FILE_KINDS[match.group('kind')], sectionDict)
+
+# ------------------------------------------------------------------ #
+# --------- End of loadConfigFile function ------------------------- #
+# ------------------------------------------------------------------ #
+
+
+# start _main_ from here
+if __name__ == '__main__':
+    try:
+        parseArgs()
+        if not isBackupFile(outputFile):
+            exc = HMCException("convertBackup",
+                               "The backup file name should end with %s" % (" or ".join(sorted(BACKUP_FILE_EXTENSIONS.values()))))
+            raise exc
+
+        # {<cpc name>: {<kind>: {<section>: <section>}}}, later files replace sections
+        cpcs = dict()
+        for configFile in configFiles:
+            (fileCpcName, kind, sectionDict) = loadConfigFile(configFile, cpcName)
+            sections = cpcs.setdefault(fileCpcName, dict()).setdefault(kind, dict())
+            for section, items in sectionDict.items():
+                sections[section] = configSection(kind, items.items())
+            print "%s: %s %s of %s" % (configFile, len(sectionDict), kind, fileCpcName)
+
+        count = writeBackupFile(outputFile,
+                                [(name, [(kind, sorted(cpcs[name][kind].items())) for kind in sorted(cpcs[name].keys())])
+                                 for name in sorted(cpcs.keys())])
+        # the backup file is checked by loading it again
+        loadBackupFile(outputFile)
+        print "\n%s sections of %s CPC(s) were saved into below file successfully." % (count, len(cpcs))
+        print outputFile
+
+    except Exception as exc:
+        if exc.message != None:
+            print exc.message
@@ -0,0 +1,279 @@
+'''
+This script intends to back up the partitions and the storage groups on a CPC in a single pass,
+and save them into a partition config file and a storage group config file, the same files as
+generated by parsBackup.py and sgBackup.py.
+
+The CPC is walked once: a single HMC session, object cache and inventory are shared by both
+backups, so every storage group (and every object referenced by both) is fetched only once.
+'''
+
+from CommonAPI.prsm2api import *
+from CommonAPI.wsaconst import *
+from CommonAPI.hmcUtils import *
+from CommonAPI.readConfig import *
+from CommonAPI.hmcInventory import *
+from CommonAPI.hmcExecutor import *
+from CommonAPI.hmcRecords import *
+from CommonAPI.hmcBackupFile import *
+import argparse
+import parsBackup, sgBackup
+
+
+# General params
+hmcHost = None
+cpcName = None
+userId = None
+password = None
+
+# Dirs to save backup files
+backupDir = None
+
+# Load the inventory of the CPC in bulk before backup
+bulkInventory = False
+
+# number of partitions collected at the same time
+workers = DEFAULT_WORKERS
+
+# Fetch all objects read by the backup concurrently before it is assembled
+prefetch = False
+
+# Keep the records files every partition and storage group is appended to as soon as it is collected
+stream = False
+
+# Resume the interrupted backup from its checkpoint journals
+resume = False
+
+# Format of the backup files, 'cfg' (config file) or 'json' (structured backup file)
+fileFormat = 'cfg'
+
+# Compression of the structured backup files, None, 'gzip' or 'zstd'
+compression = None
+
+# storage group and storage volume properties read by both backups
+STORAGE_GROUP_PROPERTIES = sorted(set(parsBackup.STORAGE_GROUP_PROPERTIES) |
+                                  set(sgBackup.STORAGE_GROUP_PROPERTIES))
+STORAGE_VOLUME_PROPERTIES = sorted(set(parsBackup.STORAGE_VOLUME_PROPERTIES) |
+                                   set(sgBackup.STORAGE_VOLUME_PROPERTIES))
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of parseArgs function ---------------------------- #
+# ------------------------------------------------------------------ #
+def parseArgs():
+    '''
+    - parse arguments input for this script
+    '''
+    global hmcHost, cpcName, userId, password, backupDir, bulkInventory, workers, prefetch, stream, resume, fileFormat, compression
+    parser = argparse.ArgumentParser(description="Back up all partitions and storage groups on specified CPC")
+    parser.add_argument('-hmc', '--hmc', metavar='<HMC host IP>', help='HMC host IP', required=True)
+    parser.add_argument('-cpc', '--cpcName', metavar='<cpc name>', help='cpc name', required=True)
+    parser.add_argument('-uid', '--userId', metavar='<user id>', help='user id', required=True)
+    parser.add_argument('-psw', '--password', metavar='<password>', help='password', required=True)
+    parser.add_argument('-bakDir', '--backupDir', metavar='<backup directory>',
+                        help='Directory to save backup files', required=False)
+    parser.add_argument('-bulk', '--bulkInventory', action='store_true',
+                        help='load the inventory of the CPC in bulk before backup', required=False)
+    parser.add_argument('-prefetch', '--prefetch', action='store_true',
+                        help='fetch all objects read by the backup concurrently before it is assembled', required=False)
+    parser.add_argument('-workers', '--workers', metavar='<number of workers>', type=workerCount,
+                        help='number of partitions collected at the same time', required=False)
+    parser.add_argument('-stream', '--stream', action='store_true',
+                        help='keep the records files every partition and storage group is appended to as soon as it is collected',
+                        required=False)
+    parser.add_argument('-resume', '--resume', action='store_true',
+                        help='resume the interrupted backup, objects backed up already are not fetched again',
+                        required=False)
+    parser.add_argument('-format', '--format', choices=['cfg', 'json'],
+                        help='format of the backup files, config file (cfg, default) or structured backup file (json)',
+                        required=False)
+    parser.add_argument('-compress', '--compress', choices=['gzip', 'zstd'],
+                        help='compress the structured backup files', required=False)
+
+    args = vars(parser.parse_args())
+    #hmc host
+    _hmcHost = assertValue(pyObj=args, key='hmc', listIndex=0, optionalKey=True)
+    hmcHost = checkValue('hmcHost', _hmcHost , hmcHost)
+    #cpc name
+    _cpcName = assertValue(pyObj=args, key='cpcName', listIndex=0, optionalKey=True)
+    cpcName = checkValue('cpcName', _cpcName, cpcName)
+    #user id
+    _userId = assertValue(pyObj=args, key='userId', listIndex=0, optionalKey=True)
+    userId = checkValue('userId', _userId, userId)
+    #user password
+    _password = assertValue(pyObj=args, key='password', listIndex=0, optionalKey=True)
+    password = checkValue('password', _password, password)
+    #Backup directory
+    _backupDir = assertValue(pyObj=args, key='backupDir', listIndex=0, optionalKey=True)
+    backupDir = checkValue('backupDir', _backupDir, backupDir)
+    #Bulk inventory mode
+    bulkInventory = assertValue(pyObj=args, key='bulkInventory', optionalKey=True)
+    #Prefetch mode
+    prefetch = assertValue(pyObj=args, key='prefetch', optionalKey=True)
+    #Stream mode
+    stream = assertValue(pyObj=args, key='stream', optionalKey=True)
+    #Resume mode
+    resume = assertValue(pyObj=args, key='resume', optionalKey=True)
+    #Backup file format and compression
+    _fileFormat = assertValue(pyObj=args, key='format', optionalKey=True)
+    if _fileFormat != None:
+        fileFormat = _fileFormat
+    compression = assertValue(pyObj=args, key='compress', optionalKey=True)
+    #number of workers
+    _workers = assertValue(pyObj=args, key='workers', optionalKey=True)
+    if _workers != None:
+        workers = capWorkers(_workers)
+
+# ------------------------------------------------------------------ #
+# --------- End of parseArgs function ------------------------------ #
+# ------------------------------------------------------------------ #
+
+# ------------------------------------------------------------------ #
+# --------- Start of printParams function -------------------------- #
+# ------------------------------------------------------------------ #
+def printParams():
+    global backupDir
+    print("\tParameters were input:")
+    print("\tHMC system IP\t%s"%hmcHost)
+    print("\tCPC name\t%s"%cpcName)
+    if backupDir:
+        print("\tBackup Directory --> %s"%backupDir)
+    else:
+        currentPath = os.getcwd()
+        backupDir = currentPath
+        print("\tBackup Directory --> %s"%currentPath)
+    if bulkInventory:
+        print("\tBulk inventory mode")
+    if prefetch:
+        print("\tPrefetch mode")
+    if stream:
+        print("\tStream mode")
+    if resume:
+        print("\tResume mode")
+    if fileFormat != 'cfg':
+        print("\tBackup file format\t%s%s" % (fileFormat, compression and ' (%s)' % compression or ''))
+    print("\tWorkers\t\t%s"%workers)
+
+# ------------------------------------------------------------------ #
+# --------- End of printParams function ---------------------------- #
+# ------------------------------------------------------------------ #
+
+
+# start _main_ from here
+hmc = None
+sgWriter = None
+parWriter = None
+
+try:
+    parseArgs()
+
+    print "********************************************************"
+    print "Back up all partitions and storage groups on specified CPC"
+    printParams()
+    print "********************************************************"
+
+    # Access HMC system and create HMC connection, shared by both backups
+    hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password, poolSize=workers)
+    # objects referenced several times are fetched from HMC once
+    hmc.enableObjectCache()
+    cpc = selectCPC(hmc, cpcName)
+    cpcURI = assertValue(pyObj=cpc, key=KEY_CPC_URI)
+    cpcName = assertValue(pyObj=cpc, key=KEY_CPC_NAME)
+
+    # HMC version check
+    if hmc.apiMinorVer >= 22:
+        sgIsAvai = True
+    else:
+        sgIsAvai = False
+
+    cpcID = cpcURI.replace('/api/cpcs/','')
+
+    # Properties of all objects are read from the inventory of the CPC
+    inventory = collectCPCInventory(hmc, cpcURI, bulk=bulkInventory)
+
+    directory = parsBackup.loadPartitionDirectory(hmc, cpcID)
+    sgList = getStorageGroupList(hmc, cpcURI=cpcURI)
+
+    # Storage groups and partitions are appended to the checkpoint journals as soon as they are
+    # collected, a resumed backup skips the ones journaled by the interrupted one
+    sgWriter = HMCRecordWriter(sgBackup.checkpointFilePath(backupDir, cpcName))
+    parWriter = HMCRecordWriter(parsBackup.checkpointFilePath(backupDir, cpcName))
+    pendingSGList = sgList
+    pendingParNames = directory.parNames
+    # the partitions to be collected, None for all
+    parNames = None
+    if resume:
+        journaledSGNames = sgWriter.resume()
+        journaledParNames = parWriter.resume()
+        pendingSGList = [sg for sg in sgList if sg['name'] not in journaledSGNames]
+        pendingParNames = [parName for parName in directory.parNames if parName not in journaledParNames]
+        parNames = pendingParNames
+        print "Resuming from %s and %s, %s storage groups and %s partitions remaining." % (sgWriter.filePath,
+                                                                                           parWriter.filePath,
+                                                                                           len(pendingSGList),
+                                                                                           len(pendingParNames))
+    else:
+        sgWriter.discard()
+        parWriter.discard()
+
+    # Storage groups and volumes are read by both backups, fetch them with the
+    # properties of both at once. In prefetch mode all objects of both backups
+    # are fetched in advance, the plan merges properties requested for an object
+    sgURIs = [sg['object-uri'] for sg in pendingSGList]
+    plan = HMCFetchPlan(inventory)
+    plan.addRoots(sgURIs, STORAGE_GROUP_PROPERTIES)
+    plan.addRule('storage-group', 'storage-volume-uris', STORAGE_VOLUME_PROPERTIES)
+    if prefetch:
+        parsBackup.addFetchRules(plan, [directory.parURIsByName[parName] for parName in pendingParNames],
+                                 sgURIs, sgIsAvai)
+    plan.execute()
+    print "Prefetched %s" % plan.getSummary()
+
+    print "\n>>> Backing up storage groups..."
+    bakSGsConfig = sgBackup.collectStorageGroupsConfig(inventory, pendingSGList, writer=sgWriter)
+
+    # Storage groups are kept in the inventory for the partitions, a written
+    # partition is dropped from it with its elements (shared objects are kept)
+    print "\n>>> Backing up partitions..."
+    allParsCfg = parsBackup.collectPartitionsConfig(inventory, directory, cpcURI, sgList, sgIsAvai, workers,
+                                                    parNames=parNames, writer=parWriter,
+                                                    written=lambda parName, parURI: inventory.remove(parURI))
+
+    sgFilePath = sgBackup.writeStorageGroupsConfig(bakSGsConfig, backupDir, cpcName, writer=sgWriter,
+                                                   fileFormat=fileFormat, compression=compression)
+    parFilePath = parsBackup.writePartitionsConfig(allParsCfg, backupDir, cpcName, writer=parWriter,
+                                                   fileFormat=fileFormat, compression=compression)
+
+    # the records files are kept next to the backup files in stream mode
+    extension = fileFormat == 'json' and backupFileExtension(compression) or '.cfg'
+    for writer, filePath in [(sgWriter, sgFilePath), (parWriter, parFilePath)]:
+        if stream:
+            writer.moveTo(filePath[:-len(extension)] + '.jsonl')
+            print "Records were written into %s" % writer.filePath
+        else:
+            writer.discard()
+    sgWriter = None
+    parWriter = None
+
+    if sgFilePath and parFilePath:
+        print "\nAbove %s Storage-Groups and %s partitions on %s were saved into below files successfully."%(len(sgList),
+                                                                                                         len(directory.parNames),
+                                                                                                         cpcName)
+        print "%s"%sgFilePath
+        print "%s"%parFilePath
+    else:
+        print "\nCPC backup failed, please check the environment manually."
+
+except Exception as exc:
+    if exc.message != None:
+        print exc.message
+    # the storage groups and partitions backed up so far are kept in the checkpoint journals
+    for writer in [sgWriter, parWriter]:
+        if writer != None and os.path.exists(writer.filePath):
+            writer.close()
+            print "\nThe objects backed up so far were kept in %s," % writer.filePath
+            print "run the backup again with -resume to continue from there."
+
+finally:
+    # cleanup
+    if hmc != None:
+        hmc.logoff()
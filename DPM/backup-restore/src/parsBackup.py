@@ -9,6 +9,11 @@ from CommonAPI.prsm2api import *
 from CommonAPI.wsaconst import *
 from CommonAPI.hmcUtils import *
 from CommonAPI.readConfig import *
+from CommonAPI.hmcInventory import *
+from CommonAPI.hmcExecutor import *
+from CommonAPI.hmcSnapshot import *
+from CommonAPI.hmcRecords import *
+from CommonAPI.hmcBackupFile import *
 import argparse, ConfigParser
 
 
@@ -21,6 +26,51 @@ password = None
 # Dirs to save backup file
 backupDir = None
 
+# Load the inventory of the CPC in bulk before backup
+bulkInventory = False
+
+# number of partitions collected at the same time
+workers = DEFAULT_WORKERS
+
+# Fetch all objects read by the backup concurrently before it is assembled
+prefetch = False
+
+# Back up changed and new partitions only, on top of the last full backup
+incremental = False
+
+# Keep the records file every partition is appended to as soon as it is collected
+stream = False
+
+# Resume the interrupted backup from its checkpoint journal
+resume = False
+
+# Format of the backup file, 'cfg' (config file) or 'json' (structured backup file)
+fileFormat = 'cfg'
+
+# Compression of the structured backup file, None, 'gzip' or 'zstd'
+compression = None
+
+# Properties read from HMC objects, only these are fetched from HMC
+PARTITION_PROPERTIES = ['name', 'description', 'type', 'status', 'reserve-resources',
+                        'ssc-host-name', 'ssc-master-userid', 'ssc-ipv4-gateway', 'ssc-dns-servers',
+                        'ifl-processors', 'cp-processors', 'processor-mode',
+                        'initial-memory', 'maximum-memory',
+                        'nic-uris', 'hba-uris', 'storage-group-uris', 'virtual-function-uris',
+                        'crypto-configuration', 'boot-device', 'boot-timeout',
+                        'boot-storage-volume', 'boot-configuration-selector']
+NIC_PROPERTIES = ['name', 'description', 'device-number', 'type', 'virtual-switch-uri',
+                  'ssc-management-nic', 'ssc-ip-address-type', 'ssc-ip-address',
+                  'ssc-mask-prefix', 'vlan-id']
+HBA_PROPERTIES = ['name', 'description', 'device-number', 'adapter-port-uri']
+VIRTUAL_FUNCTION_PROPERTIES = ['name', 'description', 'device-number', 'adapter-uri']
+VIRTUAL_SWITCH_PROPERTIES = ['backing-adapter-uri', 'port']
+ADAPTER_PROPERTIES = ['name']
+STORAGE_PORT_PROPERTIES = ['parent']
+STORAGE_GROUP_PROPERTIES = ['name', 'type', 'virtual-storage-resource-uris']
+STORAGE_VOLUME_PROPERTIES = ['description', 'size', 'uuid', 'control-unit-uri', 'unit-address']
+VIRTUAL_STORAGE_RESOURCE_PROPERTIES = ['partition-uri', 'device-number']
+STORAGE_CONTROL_UNIT_PROPERTIES = ['logical-address']
+
 
 # ------------------------------------------------------------------ #
 # --------- Start of parseArgs function ---------------------------- #
@@ -29,7 +79,7 @@ def parseArgs():
     '''
     - parse arguments input for this script
     '''
-    global hmcHost, cpcName, userId, password, backupDir
+    global hmcHost, cpcName, userId, password, backupDir, bulkInventory, workers, prefetch, incremental, stream, resume, fileFormat, compression
     parser = argparse.ArgumentParser(description="Back up basic configs for all partitions on specified CPC")
     parser.add_argument('-hmc', '--hmc', metavar='<HMC host IP>', help='HMC host IP', required=True)
     parser.add_argument('-cpc', '--cpcName', metavar='<cpc name>', help='cpc name', required=True)
@@ -37,6 +87,23 @@ def parseArgs():
     parser.add_argument('-psw', '--password', metavar='<password>', help='password', required=True)
     parser.add_argument('-bakDir', '--backupDir', metavar='<backup directory>',
                         help='Directory to save backup file', required=False)
+    parser.add_argument('-bulk', '--bulkInventory', action='store_true',
+                        help='load the inventory of the CPC in bulk before backup', required=False)
+    parser.add_argument('-prefetch', '--prefetch', action='store_true',
+                        help='fetch all objects read by the backup concurrently before it is assembled', required=False)
+    parser.add_argument('-workers', '--workers', metavar='<number of workers>', type=workerCount,
+                        help='number of partitions collected at the same time', required=False)
+    parser.add_argument('-incr', '--incremental', action='store_true',
+                        help='back up changed and new partitions only into a delta file on top of the last full backup',
+                        required=False)
+    parser.add_argument('-stream', '--stream', action='store_true',
+                        help='keep the records file every partition is appended to as soon as it is collected', required=False)
+    parser.add_argument('-resume', '--resume', action='store_true',
+                        help='resume the interrupted backup, partitions backed up already are not fetched again', required=False)
+    parser.add_argument('-format', '--format', choices=['cfg', 'json'],
+                        help='format of the backup file, config file (cfg, default) or structured backup file (json)', required=False)
+    parser.add_argument('-compress', '--compress', choices=['gzip', 'zstd'],
+                        help='compress the structured backup file', required=False)
 
     args = vars(parser.parse_args())
     #hmc host
@@ -54,6 +121,27 @@ def parseArgs():
     #Backup directory
     _backupDir = assertValue(pyObj=args, key='backupDir', listIndex=0, optionalKey=True)
     backupDir = checkValue('backupDir', _backupDir, backupDir)
+    #Bulk inventory mode
+    bulkInventory = assertValue(pyObj=args, key='bulkInventory', optionalKey=True)
+    #Prefetch mode
+    prefetch = assertValue(pyObj=args, key='prefetch', optionalKey=True)
+    #Incremental mode
+    incremental = assertValue(pyObj=args, key='incremental', optionalKey=True)
+    if incremental and not bulkInventory:
+        parser.error("-incr requires -bulk, the changes are detected from the inventory of the CPC")
+    #Stream mode
+    stream = assertValue(pyObj=args, key='stream', optionalKey=True)
+    #Resume mode
+    resume = assertValue(pyObj=args, key='resume', optionalKey=True)
+    #Backup file format and compression
+    _fileFormat = assertValue(pyObj=args, key='format', optionalKey=True)
+    if _fileFormat != None:
+        fileFormat = _fileFormat
+    compression = assertValue(pyObj=args, key='compress', optionalKey=True)
+    #number of workers
+    _workers = assertValue(pyObj=args, key='workers', optionalKey=True)
+    if _workers != None:
+        workers = capWorkers(_workers)
 
 # ------------------------------------------------------------------ #
 # --------- End of parseArgs function ------------------------------ #
@@ -73,66 +161,351 @@ def printParams():
         currentPath = os.getcwd()
         backupDir = currentPath
         print("\tBackup Directory --> %s"%currentPath)
+    if bulkInventory:
+        print("\tBulk inventory mode")
+    if prefetch:
+        print("\tPrefetch mode")
+    if incremental:
+        print("\tIncremental mode")
+    if stream:
+        print("\tStream mode")
+    if resume:
+        print("\tResume mode")
+    if fileFormat != 'cfg':
+        print("\tBackup file format\t%s%s" % (fileFormat, compression and ' (%s)' % compression or ''))
+    print("\tWorkers\t\t%s"%workers)
 
 # ------------------------------------------------------------------ #
 # --------- End of printParams function ---------------------------- #
 # ------------------------------------------------------------------ #
 
 
-# start _main_ from here
-hmc = None
-allParNamesList = []
-allParURIsList = []
-
-allParsCfg = {} 
-vHBAsCfg = {}
-
-success = True
-
-try:
-    parseArgs()
-    
-    print "********************************************************"
-    print "Back up basic configs for all partitions on specified CPC"
-    printParams()
-    print "********************************************************"
-
-    # Access HMC system and create HMC connection 
-    hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password)
-    cpc = selectCPC(hmc, cpcName)
-    cpcURI = assertValue(pyObj=cpc, key=KEY_CPC_URI)
-    cpcName = assertValue(pyObj=cpc, key=KEY_CPC_NAME)
-    
-    # HMC version check
-    apiMajVer = hmc.apiMajorVer
-    apiMinVer = hmc.apiMinorVer
-    
-    if apiMinVer >= 22:
-        sgIsAvai = True
-    else: 
-        sgIsAvai = False
-        
-    cpcID = cpcURI.replace('/api/cpcs/','')
-    
-    sgURIListByCPC = []
-    sgNameListByCPC = []
-    sgList = getStorageGroupList(hmc)
-    for sg in sgList:
-        if sg['cpc-uri'] == cpcURI:
-            sgURIListByCPC.append(sg['object-uri'])
-            sgNameListByCPC.append(sg['name'])
+# ------------------------------------------------------------------ #
+# --------- Start of addFetchRules function ------------------------ #
+# ------------------------------------------------------------------ #
+def addFetchRules(plan, parURIs, sgURIs, sgIsAvai):
+    '''
+    - add the partitions, storage groups and all objects referenced by them,
+    - which are read by the backup, to the fetch plan
+    '''
+    plan.addRoots(parURIs, PARTITION_PROPERTIES)
+    plan.addRoots(sgURIs, STORAGE_GROUP_PROPERTIES)
+
+    plan.addRule('partition', 'nic-uris', NIC_PROPERTIES)
+    plan.addRule('partition', 'virtual-function-uris', VIRTUAL_FUNCTION_PROPERTIES)
+    if sgIsAvai == True:
+        plan.addRule('partition', 'storage-group-uris', STORAGE_GROUP_PROPERTIES)
+    else:
+        plan.addRule('partition', 'hba-uris', HBA_PROPERTIES)
+    plan.addRule('partition', lambda props: (props.get('crypto-configuration') or {}).get('crypto-adapter-uris'),
+                 ADAPTER_PROPERTIES)
+    plan.addRule('partition', 'boot-storage-volume', STORAGE_VOLUME_PROPERTIES,
+                 condition=lambda props: props.get('boot-device') == 'storage-volume')
+
+    plan.addRule('nic', 'virtual-switch-uri', VIRTUAL_SWITCH_PROPERTIES,
+                 condition=lambda props: props.get('type') == 'osd')
+    plan.addRule('virtual-switch', 'backing-adapter-uri', ADAPTER_PROPERTIES)
+    plan.addRule('virtual-function', 'adapter-uri', ADAPTER_PROPERTIES)
+    plan.addRule('hba', 'adapter-port-uri', STORAGE_PORT_PROPERTIES)
+    plan.addRule('storage-port', 'parent', ADAPTER_PROPERTIES)
+
+    plan.addRule('storage-group', 'virtual-storage-resource-uris', VIRTUAL_STORAGE_RESOURCE_PROPERTIES,
+                 condition=lambda props: props.get('type') == 'fcp')
+    plan.addRule('storage-volume', 'parent', STORAGE_GROUP_PROPERTIES)
+    plan.addRule('storage-volume', 'control-unit-uri', STORAGE_CONTROL_UNIT_PROPERTIES)
+
+# ------------------------------------------------------------------ #
+# --------- End of addFetchRules function -------------------------- #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of backupSinglePartition function ---------------- #
+# ------------------------------------------------------------------ #
+def backupSinglePartition(inventory, directory, parName, sgIsAvai, parSGDevNums):
+    '''
+    - collect basic configs of single partition, runs concurrently with other partitions
+    - @param inventory: inventory of the CPC the properties are read from
+    - @param directory: PartitionDirectory of the CPC
+    - @param sgIsAvai: True if the HMC supports storage groups
+    - @param parSGDevNums: FCP storage groups attached to the partitions,
+    -        {<partition name>: ['<sg name>:<device number>', ...]}
+    - return the backup configs of the partition
+    '''
+
+    parBasicCfg = dict()
+    parURI = directory.parURIsByName[parName]
+    # Get partition properties
+    parProp = inventory.getObject(parURI, properties=PARTITION_PROPERTIES)
+
+    parBasicCfg['par_desc'] = assertValue(pyObj=parProp, key='description').replace("\n", "")
+    parBasicCfg['par_type'] = assertValue(pyObj=parProp, key='type')
+    parBasicCfg['par_status'] = assertValue(pyObj=parProp, key='status')
+    parBasicCfg['par_reserveResources'] = assertValue(pyObj=parProp, key='reserve-resources')
+
+    # if ssc partition add following settings
+    if assertValue(pyObj=parProp, key='type') == 'ssc':
+        parBasicCfg['par_sscHostName'] = assertValue(pyObj=parProp, key='ssc-host-name')
+        parBasicCfg['par_sscMasterUserid'] = assertValue(pyObj=parProp, key='ssc-master-userid')
+
+        # Failed to get user pwd since it's protected and 'default' pwd returned for customization 
+        parBasicCfg['par_sscMasterPW'] = ''
+
+        if assertValue(pyObj=parProp, key='ssc-ipv4-gateway'):
+            parBasicCfg['par_sscIPv4GW'] = assertValue(pyObj=parProp, key='ssc-ipv4-gateway')
+
+        if assertValue(pyObj=parProp, key='ssc-dns-servers'):
+            parBasicCfg['par_sscDNS'] = ','.join(assertValue(pyObj=parProp, key='ssc-dns-servers'))
+
+    ifl_proc_num = assertValue(pyObj=parProp, key='ifl-processors')
+    cp_proc_num = assertValue(pyObj=parProp, key='cp-processors')
+    if ifl_proc_num > 0:
+        proc_type = 'ifl'
+        proc_num = ifl_proc_num
+    elif cp_proc_num > 0:
+        proc_type = 'cp'
+        proc_num = cp_proc_num
+    parBasicCfg['proc_type'] = proc_type
+    parBasicCfg['proc_mode'] = assertValue(pyObj=parProp, key='processor-mode')
+    parBasicCfg['proc_num'] = proc_num
+
+    parBasicCfg['init_mem'] = assertValue(pyObj=parProp, key='initial-memory')
+    parBasicCfg['max_mem'] = assertValue(pyObj=parProp, key='maximum-memory')
+
+    #vNIC
+    nicURIs = assertValue(pyObj=parProp, key='nic-uris')
+    vNICsCfg = dict()
+    i=0
+    for nicURI in nicURIs:
+        nicCfg = dict()
+        i+=1
+        nicProp = inventory.getObject(nicURI, properties=NIC_PROPERTIES)
+
+        nicCfg['name'] = assertValue(pyObj=nicProp, key='name')
+        nicCfg['desc'] = assertValue(pyObj=nicProp, key='description').replace("\n", "")
+        nicCfg['devNum'] = assertValue(pyObj=nicProp, key='device-number')
+
+        if assertValue(pyObj=parProp, key='type') == 'ssc':
+            if bool(assertValue(pyObj=nicProp, key='ssc-management-nic')) == True:
+                nicCfg['sscIPAddrType'] = assertValue(pyObj=nicProp, key='ssc-ip-address-type')
+                nicCfg['sscIPAddr'] = assertValue(pyObj=nicProp, key='ssc-ip-address')
+                nicCfg['sscMaskPrefix'] = assertValue(pyObj=nicProp, key='ssc-mask-prefix')
+
+                if assertValue(pyObj=nicProp, key='vlan-id'):
+                    nicCfg['vlanID'] = assertValue(pyObj=nicProp, key='vlan-id')
+
+        if assertValue(pyObj=nicProp, key='type') == 'osd':
+            vsProp = inventory.getObject(assertValue(pyObj=nicProp, key='virtual-switch-uri'),
+                                         properties=VIRTUAL_SWITCH_PROPERTIES)
+            adapURI = assertValue(pyObj=vsProp, key='backing-adapter-uri')
+            nicCfg['adapPort'] = assertValue(pyObj=vsProp, key='port')
+            adapProp = inventory.getObject(adapURI, properties=ADAPTER_PROPERTIES)
+            nicCfg['adapName'] = assertValue(pyObj=adapProp, key='name')
+        vNICsCfg['vNIC'+ str(i)] = nicCfg
+    parBasicCfg['vNICs'] = vNICsCfg
+
+    #Identify HMC version that Storage Group feature was available. 
+    if sgIsAvai == True:
+        parSGDevList = parSGDevNums.get(parName, [])
+
+        # write SG-DevNum into current partition backup config.
+        parBasicCfg['sgDevNum'] = parSGDevList
+
+        # the FICON part
+        parFICONList = []
+        parSGUriList = assertValue(pyObj=parProp, key='storage-group-uris')
+        for parSGUri in parSGUriList:
+            sgProperties = inventory.getObject(parSGUri, properties=STORAGE_GROUP_PROPERTIES)
+            if assertValue(pyObj=sgProperties, key='type') == 'fc':
+                parFICONList.append(assertValue(pyObj=sgProperties, key='name'))
+        parBasicCfg['sgFICON'] = parFICONList            
+
+    elif sgIsAvai == False:
+
+        hbaURIs = assertValue(pyObj=parProp, key='hba-uris')
+        vHBAsCfg = dict()
+        i=0
+        for hbaURI in hbaURIs:
+
+            hbaCfg = dict()
+            i+=1
+
+            hbaProp = inventory.getObject(hbaURI, properties=HBA_PROPERTIES)
+
+            hbaCfg['name'] = assertValue(pyObj=hbaProp, key='name')
+            hbaCfg['desc'] = assertValue(pyObj=hbaProp, key='description').replace("\n", "")
+            hbaCfg['devNum'] = assertValue(pyObj=hbaProp, key='device-number')
+            adapPortURI = assertValue(pyObj=hbaProp, key='adapter-port-uri')
+
+            storPortProp = inventory.getObject(adapPortURI, properties=STORAGE_PORT_PROPERTIES)
+            adapURI = assertValue(pyObj=storPortProp, key='parent')
+
+            adapProp = inventory.getObject(adapURI, properties=ADAPTER_PROPERTIES)
+            hbaCfg['adapName'] = assertValue(pyObj=adapProp, key='name')
+
+            vHBAsCfg['vHBA'+ str(i)] = hbaCfg
+        parBasicCfg['vHBAs'] = vHBAsCfg
+
+    virtualFuncUriList = assertValue(pyObj=parProp, key='virtual-function-uris')
+    vfCfgList = []
+    for vfUri in virtualFuncUriList:
+        vfRet = inventory.getObject(vfUri, properties=VIRTUAL_FUNCTION_PROPERTIES)
+        vfCfg = dict()
+        vfCfg['name'] = assertValue(pyObj=vfRet, key='name')
+        vfCfg['description'] = assertValue(pyObj=vfRet, key='description')
+        vfCfg['device-number'] = assertValue(pyObj=vfRet, key='device-number')
+
+        adapProp = inventory.getObject(assertValue(pyObj=vfRet, key='adapter-uri'),
+                                    properties=ADAPTER_PROPERTIES)
+        vfCfg['adapter-name'] = assertValue(pyObj=adapProp, key='name')
+        vfCfgList.append(vfCfg)
+    parBasicCfg['zAccelerators'] = vfCfgList
+
+    # add the crypto-configuration for crypto
+    cryptoCfg = []
+    if assertValue(pyObj=parProp, key='crypto-configuration') != None:
+        # copy, the inventory object should not be changed
+        cryptoCfg = dict(assertValue(pyObj=parProp, key='crypto-configuration'))
+        adapNameList = []
+        for cryptoAdapterUri in cryptoCfg['crypto-adapter-uris']:
+            adapProp = inventory.getObject(cryptoAdapterUri, properties=ADAPTER_PROPERTIES)
+            adapNameList.append(assertValue(pyObj=adapProp, key='name'))
+
+        cryptoCfg.pop('crypto-adapter-uris')
+        cryptoCfg['crypto-adapter-names'] = adapNameList
+    parBasicCfg['zCryptos'] = cryptoCfg
+
+    # add for the boot option (for boot_device is "storage group")
+    bootOptCfg = dict()
+    bootOptCfg['boot_device'] = assertValue(pyObj=parProp, key='boot-device')
+    if bootOptCfg['boot_device'] == 'storage-volume':
+        bootOptCfg['boot-timeout'] = assertValue(pyObj=parProp, key='boot-timeout')
+
+        bootStorVolUri = assertValue(pyObj=parProp, key='boot-storage-volume')
+        storVolRet = inventory.getObject(bootStorVolUri, properties=STORAGE_VOLUME_PROPERTIES)
+
+        bootOptCfg['volume_description'] = assertValue(pyObj=storVolRet, key='description')
+        bootOptCfg['volume_size'] = assertValue(pyObj=storVolRet, key='size')
+
+        bootStorGroupUri = bootStorVolUri.split('/storage-volumes/')[0]
+        storGroupRet = inventory.getObject(bootStorGroupUri, properties=STORAGE_GROUP_PROPERTIES)
+        bootOptCfg['storage_group_name'] = assertValue(pyObj=storGroupRet, key='name')
+        bootOptCfg['storage_group_type'] = assertValue(pyObj=storGroupRet, key='type')
+
+        if assertValue(pyObj=storGroupRet, key='type') == 'fcp':
+            bootOptCfg['fcp-boot-configuration-selector'] = assertValue(pyObj=parProp, key='boot-configuration-selector')
+            bootOptCfg['fcp-volume-uuid'] = assertValue(pyObj=storVolRet, key='uuid')
+        elif assertValue(pyObj=storGroupRet, key='type') == 'fc':
+            ctrlUnitUri = assertValue(pyObj=storVolRet, key='control-unit-uri')
+            ctrlUnitRet = inventory.getObject(ctrlUnitUri, properties=STORAGE_CONTROL_UNIT_PROPERTIES)
+
+            bootOptCfg['fc-logical-address'] = assertValue(pyObj=ctrlUnitRet, key='logical-address')
+            bootOptCfg['fc-unit-address'] = assertValue(pyObj=storVolRet, key='unit-address')
+        else:
+            # error
+            pass
+
+    parBasicCfg['zzBootOpt'] = bootOptCfg
+    return parBasicCfg
+
+# ------------------------------------------------------------------ #
+# --------- End of backupSinglePartition function ------------------ #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of PartitionDirectory class ---------------------- #
+# ------------------------------------------------------------------ #
+class PartitionDirectory:
+    '''
+    - partitions listed on a CPC, by name and by URI
+    '''
+    def __init__(self):
+        # partition names in the order of the list
+        self.parNames = []
+        # {<partition uri>: <partition name>} and reverse
+        self.parNamesByURI = {}
+        self.parURIsByName = {}
+
+    def add(self, parName, parURI):
+        self.parNames.append(parName)
+        self.parNamesByURI[parURI] = parName
+        self.parURIsByName[parName] = parURI
+
+# ------------------------------------------------------------------ #
+# --------- End of PartitionDirectory class ------------------------ #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of loadPartitionDirectory function --------------- #
+# ------------------------------------------------------------------ #
+def loadPartitionDirectory(hmcConn, cpcID):
+    '''
+    - list all partitions on the CPC
+    - return the PartitionDirectory of the CPC
+    '''
+    parResObj = getCPCPartitionsList(hmcConn, cpcID)
+
+    # Generate all partitions list on this CPC
+    directory = PartitionDirectory()
+    for parInfo in parResObj:
+        _parName = assertValue(pyObj=parInfo,key='name')
+        _parURI = assertValue(pyObj=parInfo,key='object-uri')
+        directory.add(_parName, _parURI)
+    return directory
+
+# ------------------------------------------------------------------ #
+# --------- End of loadPartitionDirectory function ----------------- #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of collectPartitionsConfig function -------------- #
+# ------------------------------------------------------------------ #
+def collectPartitionsConfig(inventory, directory, cpcURI, sgList, sgIsAvai, numWorkers, parNames=None, writer=None, quiet=False,
+                            written=None, collected=None):
+    '''
+    - collect basic configs of the partitions in parNames (all partitions in the
+    - PartitionDirectory directory if None), properties of all objects are read from the
+    - inventory of the CPC. If writer is given, every partition is written by it
+    - as soon as it is collected, and its configs are not kept. collected is
+    - called as collected(<partition name>, <partition URI>) before a partition
+    - is written, its result (the snapshot index entry of the partition) is
+    - written with the partition. written is called the same way after a
+    - partition has been written (e.g. to drop its objects from the inventory).
+    - If quiet is True, only failures are printed (e.g. when the configs are
+    - read by a restore)
+    - return {<partition name>: <partition backup configs>}, configs are None
+    - if they have been written by writer
+    '''
+    allParsCfg = dict()
+    # FCP storage groups attached to the partitions, {<partition name>: ['<sg name>:<device number>', ...]}
+    parSGDevNums = {}
+
+    if parNames == None:
+        parNames = directory.parNames
+    else:
+        # only the storage groups of these partitions are read
+        inventory.prefetch([directory.parURIsByName[parName] for parName in parNames], PARTITION_PROPERTIES)
+        parSGURIs = set()
+        for parName in parNames:
+            parProp = inventory.getObject(directory.parURIsByName[parName], properties=PARTITION_PROPERTIES)
+            parSGURIs.update(parProp.get('storage-group-uris') or [])
+        sgList = [sg for sg in sgList if sg['object-uri'] in parSGURIs]
 
     attachedSGs = {}
-    for sgName in sgNameListByCPC:
-        sgURI = sgURIListByCPC[sgNameListByCPC.index(sgName)]
-        sgProps = getStorageGroupProperties(hmc, sgURI=sgURI)
+    for sg in sgList:
+        sgName = sg['name']
+        sgURI = sg['object-uri']
+        sgProps = inventory.getObject(sgURI, properties=STORAGE_GROUP_PROPERTIES)
 
         sgStorType = assertValue(pyObj=sgProps, key='type')
         
         if sgStorType == 'fcp':
 
-            sgVSRsResp = getVSRsOfSG(hmc, sgURI)
-            sgVSRsPropList = assertValue(pyObj=sgVSRsResp, key='virtual-storage-resources')
+            sgVSRsPropList = inventory.getElements(sgURI, 'virtual-storage-resource',
+                                                    properties=VIRTUAL_STORAGE_RESOURCE_PROPERTIES)
 
             attachedParDevList = []
             if sgVSRsPropList != None:
@@ -140,273 +513,335 @@ try:
                 for sgVSR in sgVSRsPropList:
                     parURI = assertValue(pyObj=sgVSR, key='partition-uri')
                     devNum = assertValue(pyObj=sgVSR, key='device-number')
-                    parProp = getPartitionProperties(hmc, parURI=parURI)
-                    parName = assertValue(pyObj=parProp, key='name')
-
-                    attachedParDevList.append(parName+':'+devNum)
+                    # resolved by the partition directory, partitions of other
+                    # CPCs are not expected here but are fetched if any
+                    parName = directory.parNamesByURI.get(parURI)
+                    if parName == None:
+                        parProp = inventory.getObject(parURI, properties=PARTITION_PROPERTIES)
+                        parName = assertValue(pyObj=parProp, key='name')
+
+                    attachedParDevList.append((parName, devNum))
                 attachedSGs[sgName] = attachedParDevList
         elif sgStorType == 'fc':
             # FICON couldn't get the attached partition information here, will handle in the later part.
             pass
-  
-    attachedSGDevList = []
-    attachedParList = []
-          
+
+    # index the attachments by partition
     for k,v in attachedSGs.items():
-        for parDev in v:
-            attachedParList.append(parDev.split(':')[0])
-            attachedSGDevList.append(k+':'+parDev.split(':')[1])
-    
-    parResObj = getCPCPartitionsList(hmc, cpcID)
+        for (parName, devNum) in v:
+            parSGDevNums.setdefault(parName, []).append(str(k+':'+devNum))
+
+    # Retrieve Processor and Memeory settings for all partitions, partitions
+    # are collected by a pool of workers sharing the HMC connection
+    def backupPartition(parName):
+        parCfg = backupSinglePartition(inventory, directory, parName, sgIsAvai, parSGDevNums)
+        if writer != None:
+            parURI = directory.parURIsByName[parName]
+            writer.write(parName, partitionConfigItems(parCfg), snapshot=collected and collected(parName, parURI))
+            if written != None:
+                written(parName, parURI)
+            return None
+        return parCfg
+
+    executor = HMCTaskExecutor(numWorkers=numWorkers)
+    results = executor.map(backupPartition, parNames, cpcURI=cpcURI)
+    for result in results:
+        if result.exc != None:
+            print "%s backup failed."%result.item
+            raise result.exc
+        if not quiet:
+            print "%s backup is Done."%result.item
+        allParsCfg[result.item] = result.value
+    if not quiet:
+        print executor.getSummary(results, 'partition')
+    return allParsCfg
 
-    # Generate all partitions list on this CPC
-    for parInfo in parResObj:
-        _parName = assertValue(pyObj=parInfo,key='name')
-        _parURI = assertValue(pyObj=parInfo,key='object-uri')
-        allParNamesList.append(_parName)
-        allParURIsList.append(_parURI)
-        
-    # Retrieve Processor and Memeory settings for all partitions
-    for parName in allParNamesList:
+# ------------------------------------------------------------------ #
+# --------- End of collectPartitionsConfig function ---------------- #
+# ------------------------------------------------------------------ #
 
-        parBasicCfg = dict()
-        parIndex = allParNamesList.index(parName)
-        parURI = allParURIsList[parIndex]
-        # Get partition properties
-        parProp = getPartitionProperties(hmc, parURI=parURI)
 
-        parBasicCfg['par_desc'] = assertValue(pyObj=parProp, key='description').replace("\n", "")
-        parBasicCfg['par_type'] = assertValue(pyObj=parProp, key='type')
-        parBasicCfg['par_status'] = assertValue(pyObj=parProp, key='status')
-        parBasicCfg['par_reserveResources'] = assertValue(pyObj=parProp, key='reserve-resources')
+# ------------------------------------------------------------------ #
+# --------- Start of partitionConfigItems function ----------------- #
+# ------------------------------------------------------------------ #
+def partitionConfigItems(parCfg):
+    '''
+    - return the (key, value) items of a partition backup config in the order
+    - they are set into the config file, value is None for comment lines
+    '''
+    items = []
+    for key2 in sorted(parCfg.keys()):
+        if "par" in key2:
+            items.append(('#partition', None))
+            items.append((key2, parCfg[key2]))
+        elif "proc" in key2:
+            items.append(('#processor', None))
+            items.append((key2, parCfg[key2]))
+        elif "mem" in key2:
+            items.append(('#memory', None))
+            items.append((key2, parCfg[key2]))
+        elif "sgDevNum" in key2:
+            items.append(('#FCP Storage-Groups', None))
+            items.append((key2, parCfg[key2]))
+        elif "sgFICON" in key2:
+            items.append(('#FICON Storage-Groups', None))
+            items.append((key2, parCfg[key2]))
+        elif "vNICs" in key2:
+            items.append(('#virtual NICs', None))
+            for key3 in sorted(parCfg[key2].keys()):
+                for key4 in sorted(parCfg[key2][key3].keys()):
+                    items.append((key3 + '_' + key4, parCfg[key2][key3][key4]))
+        elif "vHBAs" in key2:
+            items.append(('#virtual HBAs', None))
+            for key3 in sorted(parCfg[key2].keys()):
+                for key4 in sorted(parCfg[key2][key3].keys()):
+                    items.append((key3 + '_' + key4, parCfg[key2][key3][key4]))
+        elif "zAccelerators" in key2:
+            items.append(('#accelerator virtual functions', None))
+            items.append((key2, parCfg[key2]))
+        elif "zCryptos" in key2:
+            items.append(('#cryptos', None))
+            items.append((key2, parCfg[key2]))
+        elif "zzBootOpt" in key2:
+            items.append(('#boot option', None))
+            items.append((key2, parCfg[key2]))
+    return items
 
-        # if ssc partition add following settings
-        if assertValue(pyObj=parProp, key='type') == 'ssc':
-            parBasicCfg['par_sscHostName'] = assertValue(pyObj=parProp, key='ssc-host-name')
-            parBasicCfg['par_sscMasterUserid'] = assertValue(pyObj=parProp, key='ssc-master-userid')
-            
-            # Failed to get user pwd since it's protected and 'default' pwd returned for customization 
-            parBasicCfg['par_sscMasterPW'] = ''
-          
-            if assertValue(pyObj=parProp, key='ssc-ipv4-gateway'):
-                parBasicCfg['par_sscIPv4GW'] = assertValue(pyObj=parProp, key='ssc-ipv4-gateway')
-
-            if assertValue(pyObj=parProp, key='ssc-dns-servers'):
-                parBasicCfg['par_sscDNS'] = ','.join(assertValue(pyObj=parProp, key='ssc-dns-servers'))
-
-        ifl_proc_num = assertValue(pyObj=parProp, key='ifl-processors')
-        cp_proc_num = assertValue(pyObj=parProp, key='cp-processors')
-        if ifl_proc_num > 0:
-            proc_type = 'ifl'
-            proc_num = ifl_proc_num
-        elif cp_proc_num > 0:
-            proc_type = 'cp'
-            proc_num = cp_proc_num
-        parBasicCfg['proc_type'] = proc_type
-        parBasicCfg['proc_mode'] = assertValue(pyObj=parProp, key='processor-mode')
-        parBasicCfg['proc_num'] = proc_num
-        
-        parBasicCfg['init_mem'] = assertValue(pyObj=parProp, key='initial-memory')
-        parBasicCfg['max_mem'] = assertValue(pyObj=parProp, key='maximum-memory')
+# ------------------------------------------------------------------ #
+# --------- End of partitionConfigItems function ------------------- #
+# ------------------------------------------------------------------ #
 
-        #vNIC
-        nicURIs = assertValue(pyObj=parProp, key='nic-uris')
-        vNICsCfg = dict()
-        i=0
-        for nicURI in nicURIs:
-            nicCfg = dict()
-            i+=1
-            nicProp = getNICProperties(hmc, nicURI=nicURI)
-            
-            nicCfg['name'] = assertValue(pyObj=nicProp, key='name')
-            nicCfg['desc'] = assertValue(pyObj=nicProp, key='description').replace("\n", "")
-            nicCfg['devNum'] = assertValue(pyObj=nicProp, key='device-number')
-             
-            if assertValue(pyObj=parProp, key='type') == 'ssc':
-                if bool(assertValue(pyObj=nicProp, key='ssc-management-nic')) == True:
-                    nicCfg['sscIPAddrType'] = assertValue(pyObj=nicProp, key='ssc-ip-address-type')
-                    nicCfg['sscIPAddr'] = assertValue(pyObj=nicProp, key='ssc-ip-address')
-                    nicCfg['sscMaskPrefix'] = assertValue(pyObj=nicProp, key='ssc-mask-prefix')
-                   
-                    if assertValue(pyObj=nicProp, key='vlan-id'):
-                        nicCfg['vlanID'] = assertValue(pyObj=nicProp, key='vlan-id')
-
-            if assertValue(pyObj=nicProp, key='type') == 'osd':
-                vsProp = getVirtualSwitchProperties(hmc, vsURI=assertValue(pyObj=nicProp, key='virtual-switch-uri'))
-                adapURI = assertValue(pyObj=vsProp, key='backing-adapter-uri')
-                nicCfg['adapPort'] = assertValue(pyObj=vsProp, key='port')
-                adapProp = getAdapterProperties(hmc, adaURI=adapURI)
-                nicCfg['adapName'] = assertValue(pyObj=adapProp, key='name')
-            vNICsCfg['vNIC'+ str(i)] = nicCfg
-        parBasicCfg['vNICs'] = vNICsCfg
-        
-        #Identify HMC version that Storage Group feature was available. 
-        if sgIsAvai == True:
-            parSGDevList = []
-            for i,v in enumerate(attachedParList):
-                if v == parName: 
-                    parSGDevList.append(str(attachedSGDevList[i]))
-
-            # write SG-DevNum into current partition backup config.
-            parBasicCfg['sgDevNum'] = parSGDevList
-            
-            # the FICON part
-            parFICONList = []
-            parSGUriList = assertValue(pyObj=parProp, key='storage-group-uris')
-            for parSGUri in parSGUriList:
-                sgProperties = getStorageGroupProperties(hmc, sgURI=parSGUri)
-                if assertValue(pyObj=sgProperties, key='type') == 'fc':
-                    parFICONList.append(assertValue(pyObj=sgProperties, key='name'))
-            parBasicCfg['sgFICON'] = parFICONList            
-            
-        elif sgIsAvai == False:
-
-            hbaURIs = assertValue(pyObj=parProp, key='hba-uris')
-            vHBAsCfg = dict()
-            i=0
-            for hbaURI in hbaURIs:
-
-                hbaCfg = dict()
-                i+=1
-
-                hbaProp = getHBAProperties(hmc, hbaURI=hbaURI)
-                
-                hbaCfg['name'] = assertValue(pyObj=hbaProp, key='name')
-                hbaCfg['desc'] = assertValue(pyObj=hbaProp, key='description').replace("\n", "")
-                hbaCfg['devNum'] = assertValue(pyObj=hbaProp, key='device-number')
-                adapPortURI = assertValue(pyObj=hbaProp, key='adapter-port-uri')
-
-                storPortProp = getStorPortProperties(hmc, storPortURI=adapPortURI)
-                adapURI = assertValue(pyObj=storPortProp, key='parent')
-
-                adapProp = getAdapterProperties(hmc, adaURI=adapURI)
-                hbaCfg['adapName'] = assertValue(pyObj=adapProp, key='name')
-                
-                vHBAsCfg['vHBA'+ str(i)] = hbaCfg
-            parBasicCfg['vHBAs'] = vHBAsCfg
-            
-        virtualFuncUriList = assertValue(pyObj=parProp, key='virtual-function-uris')
-        vfCfgList = []
-        for vfUri in virtualFuncUriList:
-            vfRet = getVirtFuncProperties(hmc, vfUri)
-            vfCfg = dict()
-            vfCfg['name'] = assertValue(pyObj=vfRet, key='name')
-            vfCfg['description'] = assertValue(pyObj=vfRet, key='description')
-            vfCfg['device-number'] = assertValue(pyObj=vfRet, key='device-number')
-            
-            adapProp = getAdapterProperties(hmc, adaURI=assertValue(pyObj=vfRet, key='adapter-uri'))
-            vfCfg['adapter-name'] = assertValue(pyObj=adapProp, key='name')
-            vfCfgList.append(vfCfg)
-        parBasicCfg['zAccelerators'] = vfCfgList
-        
-        # add the crypto-configuration for crypto
-        cryptoCfg = []
-        if assertValue(pyObj=parProp, key='crypto-configuration') != None:
-            cryptoCfg = assertValue(pyObj=parProp, key='crypto-configuration')
-            adapNameList = []
-            for cryptoAdapterUri in cryptoCfg['crypto-adapter-uris']:
-                adapProp = getAdapterProperties(hmc, adaURI=cryptoAdapterUri)
-                adapNameList.append(assertValue(pyObj=adapProp, key='name'))
-            
-            cryptoCfg.pop('crypto-adapter-uris')
-            cryptoCfg['crypto-adapter-names'] = adapNameList
-        parBasicCfg['zCryptos'] = cryptoCfg
-        
-        # add for the boot option (for boot_device is "storage group")
-        bootOptCfg = dict()
-        bootOptCfg['boot_device'] = assertValue(pyObj=parProp, key='boot-device')
-        if bootOptCfg['boot_device'] == 'storage-volume':
-            bootOptCfg['boot-timeout'] = assertValue(pyObj=parProp, key='boot-timeout')
-
-            bootStorVolUri = assertValue(pyObj=parProp, key='boot-storage-volume')
-            storVolRet = getStorVolProperties(hmc, bootStorVolUri)
-            
-            bootOptCfg['volume_description'] = assertValue(pyObj=storVolRet, key='description')
-            bootOptCfg['volume_size'] = assertValue(pyObj=storVolRet, key='size')
-            
-            bootStorGroupUri = bootStorVolUri.split('/storage-volumes/')[0]
-            storGroupRet = getStorageGroupProperties(hmc, sgURI=bootStorGroupUri)
-            bootOptCfg['storage_group_name'] = assertValue(pyObj=storGroupRet, key='name')
-            bootOptCfg['storage_group_type'] = assertValue(pyObj=storGroupRet, key='type')
-            
-            if assertValue(pyObj=storGroupRet, key='type') == 'fcp':
-                bootOptCfg['fcp-boot-configuration-selector'] = assertValue(pyObj=parProp, key='boot-configuration-selector')
-                bootOptCfg['fcp-volume-uuid'] = assertValue(pyObj=storVolRet, key='uuid')
-            elif assertValue(pyObj=storGroupRet, key='type') == 'fc':
-                ctrlUnitUri = assertValue(pyObj=storVolRet, key='control-unit-uri')
-                ctrlUnitRet = getStorageControlUnitProperties(hmc, ctrlUnitUri)
-                
-                bootOptCfg['fc-logical-address'] = assertValue(pyObj=ctrlUnitRet, key='logical-address')
-                bootOptCfg['fc-unit-address'] = assertValue(pyObj=storVolRet, key='unit-address')
-            else:
-                # error
-                pass
-            
-        parBasicCfg['zzBootOpt'] = bootOptCfg
-        
-        print "%s backup is Done."%parName
-        allParsCfg[parName] = parBasicCfg     
+
+# ------------------------------------------------------------------ #
+# --------- Start of partitionsFilePath function ------------------- #
+# ------------------------------------------------------------------ #
+def partitionsFilePath(bakDir, cpcName, delta=False, extension='.cfg'):
+    '''
+    - return the path of a new partition backup file in bakDir (created if
+    - missing), of a delta file if delta is True
+    '''
+    if os.path.exists(bakDir) is False:
+        os.makedirs(bakDir)
+    return bakDir + '/' + cpcName + (delta and '-Partitions-Delta-' or '-Partitions-') + time.strftime("%Y%m%d-%H%M%S", time.localtime()) + extension
+
+# ------------------------------------------------------------------ #
+# --------- End of partitionsFilePath function --------------------- #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of checkpointFilePath function ------------------- #
+# ------------------------------------------------------------------ #
+def checkpointFilePath(bakDir, cpcName, delta=False):
+    '''
+    - return the path of the checkpoint journal of the partition backup in
+    - bakDir (created if missing), of the delta backup if delta is True
+    '''
+    if os.path.exists(bakDir) is False:
+        os.makedirs(bakDir)
+    return bakDir + '/' + cpcName + (delta and '-Partitions-Delta-' or '-Partitions-') + 'Checkpoint.jsonl'
+
+# ------------------------------------------------------------------ #
+# --------- End of checkpointFilePath function --------------------- #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of writePartitionsConfig function ---------------- #
+# ------------------------------------------------------------------ #
+def writePartitionsConfig(allParsCfg, bakDir, cpcName, delta=False, writer=None, fileFormat='cfg', compression=None):
+    '''
+    - write the partition backup configs into a config file in bakDir,
+    - a delta file if delta is True. If the configs have been written by
+    - writer, the config file is generated from its records file. If
+    - fileFormat is 'json', a structured backup file is written instead of
+    - the config file
+    - return the path of the file
+    '''
+    if fileFormat == 'json':
+        filePath = partitionsFilePath(bakDir, cpcName, delta, extension=backupFileExtension(compression))
+        if writer != None:
+            writer.close()
+            sections = ((name, configSection(BACKUP_PARTITIONS, items))
+                        for name, items in readSortedRecords(writer.filePath))
+        else:
+            sections = ((name, configSection(BACKUP_PARTITIONS, partitionConfigItems(allParsCfg[name])))
+                        for name in sorted(allParsCfg.keys()))
+        writeBackupFile(filePath, [(cpcName, [(BACKUP_PARTITIONS, sections)])])
+        return filePath
+
+    if writer != None:
+        writer.close()
+        filePath = partitionsFilePath(bakDir, cpcName, delta)
+        writeRecordsConfig(writer.filePath, filePath)
+        return filePath
 
     # Generate backup config file
     allConfig = ConfigParser.ConfigParser(allow_no_value=True)
     for key1 in sorted(allParsCfg.keys()):
         allConfig.add_section(key1)
-        for key2 in sorted(allParsCfg[key1].keys()):
-            if "par" in key2:
-                allConfig.set(key1, '#partition')
-                allConfig.set(key1, key2 ,allParsCfg[key1][key2])
-            elif "proc" in key2:
-                allConfig.set(key1, '#processor')
-                allConfig.set(key1, key2 ,allParsCfg[key1][key2])
-            elif "mem" in key2:
-                allConfig.set(key1, '#memory')
-                allConfig.set(key1, key2 ,allParsCfg[key1][key2])
-            elif "sgDevNum" in key2:
-                allConfig.set(key1, '#FCP Storage-Groups')
-                allConfig.set(key1, key2 ,allParsCfg[key1][key2])
-            elif "sgFICON" in key2:
-                allConfig.set(key1, '#FICON Storage-Groups')
-                allConfig.set(key1, key2 ,allParsCfg[key1][key2])
-            elif "vNICs" in key2:
-                allConfig.set(key1, '#virtual NICs')
-                for key3 in sorted(allParsCfg[key1][key2].keys()):
-                    for key4 in sorted(allParsCfg[key1][key2][key3].keys()):
-                        allConfig.set(key1, key3 + '_' + key4, allParsCfg[key1][key2][key3][key4])
-            elif "vHBAs" in key2:
-                allConfig.set(key1, '#virtual HBAs')
-                for key3 in sorted(allParsCfg[key1][key2].keys()):
-                    for key4 in sorted(allParsCfg[key1][key2][key3].keys()):
-                        allConfig.set(key1, key3 + '_' + key4, allParsCfg[key1][key2][key3][key4])
-            elif "zAccelerators" in key2:
-                allConfig.set(key1, '#accelerator virtual functions')
-                allConfig.set(key1, key2 ,allParsCfg[key1][key2])
-            elif "zCryptos" in key2:
-                allConfig.set(key1, '#cryptos')
-                allConfig.set(key1, key2 ,allParsCfg[key1][key2])
-            elif "zzBootOpt" in key2:
-                allConfig.set(key1, '#boot option')
-                allConfig.set(key1, key2 ,allParsCfg[key1][key2])
-
-    if os.path.exists(backupDir) is False:
-        os.makedirs(backupDir)
-            
+        for key, value in partitionConfigItems(allParsCfg[key1]):
+            allConfig.set(key1, key, value)
+
     # Write backup configs into a file
-    filePath = backupDir + '/' + cpcName + '-Partitions-' + time.strftime("%Y%m%d-%H%M%S", time.localtime()) + '.cfg'
+    filePath = partitionsFilePath(bakDir, cpcName, delta)
 
     with open(filePath, 'wb') as configfile:
         allConfig.write(configfile)
-    
-    if allConfig :
-        print ("\n%s partitions' configuration were saved in below file successfully."%cpcName)
-        print filePath
-    else:
-        print "Partition backup failed, please check the environment manually."
-        
-except Exception as exc:
-    if exc.message != None:
-        print exc.message
-  
-finally:
-    # cleanup
-    if hmc != None:
-        hmc.logoff()
+    return filePath
+
+# ------------------------------------------------------------------ #
+# --------- End of writePartitionsConfig function ------------------ #
+# ------------------------------------------------------------------ #
+
+
+# start _main_ from here
+if __name__ == '__main__':
+    hmc = None
+    writer = None
+
+    try:
+        parseArgs()
+
+        print "********************************************************"
+        print "Back up basic configs for all partitions on specified CPC"
+        printParams()
+        print "********************************************************"
+
+        # Access HMC system and create HMC connection 
+        hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password, poolSize=workers)
+        # objects referenced several times are fetched from HMC once
+        hmc.enableObjectCache()
+        cpc = selectCPC(hmc, cpcName)
+        cpcURI = assertValue(pyObj=cpc, key=KEY_CPC_URI)
+        cpcName = assertValue(pyObj=cpc, key=KEY_CPC_NAME)
+
+        # HMC version check
+        apiMajVer = hmc.apiMajorVer
+        apiMinVer = hmc.apiMinorVer
+
+        if apiMinVer >= 22:
+            sgIsAvai = True
+        else: 
+            sgIsAvai = False
+
+        cpcID = cpcURI.replace('/api/cpcs/','')
+
+        # Properties of all objects are read from the inventory of the CPC
+        inventory = collectCPCInventory(hmc, cpcURI, bulk=bulkInventory)
+
+        directory = loadPartitionDirectory(hmc, cpcID)
+        sgList = getStorageGroupList(hmc, cpcURI=cpcURI)
+
+        # Snapshot index of the partition backups of this CPC
+        snapshot = HMCSnapshot(os.path.join(backupDir, cpcName + '-Partitions-Snapshot.json'))
+        if incremental and not snapshot.load():
+            print "No snapshot index of a full backup in %s, taking a full backup." % backupDir
+            incremental = False
+        # the changes are detected from the objects loaded by the inventory service, an
+        # incremental backup does not fetch every object from HMC one by one
+        if incremental and len(inventory.loadedClasses) == 0:
+            raise Exception("The inventory service is not available on this HMC, run a full backup without -incr.")
+
+        # The rules of the objects read by the backup, a section is changed if any of them has changed
+        roots = [(parName, directory.parURIsByName[parName]) for parName in directory.parNames]
+        plan = HMCFetchPlan(inventory)
+        addFetchRules(plan, [parURI for (parName, parURI) in roots],
+                      [sg['object-uri'] for sg in sgList], sgIsAvai)
+
+        # Fetch all objects in advance, the backup is assembled from memory then.
+        # An incremental backup compares all objects the partitions depend on, they
+        # have been loaded by the inventory service, the missing ones are fetched
+        if prefetch or incremental:
+            plan.execute()
+            print "Prefetched %s" % plan.getSummary()
+
+        changedParNames = None
+        removedParNames = []
+        if incremental:
+            changedParNames = snapshot.getChanged(plan, roots, PARTITION_PROPERTIES)
+            removedParNames = snapshot.getRemoved(directory.parNames)
+            print "%s of %s partitions changed or new since the last backup, %s removed." % (len(changedParNames),
+                                                                                           len(directory.parNames),
+                                                                                           len(removedParNames))
+
+        # Partitions are appended to the checkpoint journal as soon as they are collected,
+        # a resumed backup skips the partitions journaled by the interrupted one
+        writer = HMCRecordWriter(checkpointFilePath(backupDir, cpcName, delta=incremental))
+        parNames = changedParNames
+        completedParNames = []
+        if resume:
+            if parNames == None:
+                parNames = directory.parNames
+            records = writer.readAll()
+            journaledParNames = set([record['section'] for record in records])
+            # the fingerprints of the journaled partitions are the ones written with them
+            snapshot.resume(records)
+            records = None
+            completedParNames = [parName for parName in parNames if parName in journaledParNames]
+            parNames = [parName for parName in parNames if parName not in journaledParNames]
+            print "Resuming from %s, %s partitions were backed up already, %s remaining." % (writer.filePath,
+                                                                                           len(completedParNames),
+                                                                                           len(parNames))
+        else:
+            writer.discard()
+
+        # The fingerprints of a partition are journaled with it. The objects of a written partition
+        # are not read again, it is dropped from the inventory with its elements (shared objects are kept)
+        def collectPartition(parName, parURI):
+            return snapshot.collect(plan, parName, parURI, PARTITION_PROPERTIES)
+
+        def dropPartition(parName, parURI):
+            inventory.remove(parURI)
+
+        allParsCfg = collectPartitionsConfig(inventory, directory, cpcURI, sgList, sgIsAvai, workers,
+                                             parNames=parNames, writer=writer, written=dropPartition,
+                                             collected=collectPartition)
+        backedUpParNames = allParsCfg.keys() + completedParNames
+
+        if incremental:
+            filePath = None
+            if len(backedUpParNames) != 0:
+                filePath = writePartitionsConfig(allParsCfg, backupDir, cpcName, delta=True, writer=writer,
+                                                 fileFormat=fileFormat, compression=compression)
+            if filePath or removedParNames:
+                snapshot.addDelta(filePath, removedParNames)
+        else:
+            filePath = writePartitionsConfig(allParsCfg, backupDir, cpcName, writer=writer,
+                                             fileFormat=fileFormat, compression=compression)
+            snapshot.setBase(filePath)
+        snapshot.update([(parName, directory.parURIsByName[parName]) for parName in backedUpParNames],
+                        removed=removedParNames)
+        snapshot.save()
+
+        # the records file is kept next to the backup file in stream mode
+        if stream and filePath:
+            extension = fileFormat == 'json' and backupFileExtension(compression) or '.cfg'
+            writer.moveTo(filePath[:-len(extension)] + '.jsonl')
+            print "Partitions were written into %s" % writer.filePath
+        else:
+            writer.discard()
+        writer = None
+
+        if incremental and filePath == None:
+            print ("\nNo partition has changed since the last backup, the snapshot index was updated.")
+            print snapshot.path
+        elif filePath :
+            print ("\n%s partitions' configuration were saved in below file successfully."%cpcName)
+            print filePath
+        else:
+            print "Partition backup failed, please check the environment manually."
+
+    except Exception as exc:
+        if exc.message != None:
+            print exc.message
+        # the partitions backed up so far are kept in the checkpoint journal
+        if writer != None and os.path.exists(writer.filePath):
+            writer.close()
+            print "\nThe partitions backed up so far were kept in %s," % writer.filePath
+            print "run the backup again with -resume to continue from there."
+
+    finally:
+        # cleanup
+        if hmc != None:
+            hmc.logoff()
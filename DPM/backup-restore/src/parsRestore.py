@@ -6,6 +6,7 @@ Please double check if the adapter IDs are changed in the config file,
 if yes, please update the adapter IDs in the config file according to the PCHID Mapping table.
 
 All the partition information will be created simultaneously by multi-threading.
+Run it again with -reconcile after a partial failure, or with -resume to continue an interrupted restore.
 Please double check the restored parameters (processors, memory, vNic, storage groups, device numbers and boot options)
 before you start the partition.
 
@@ -16,23 +17,54 @@ from CommonAPI.prsm2api import *
 from CommonAPI.wsaconst import *
 from CommonAPI.hmcUtils import *
 from CommonAPI.readConfig import *
-import argparse, ConfigParser, threading
+from CommonAPI.hmcInventory import *
+from CommonAPI.hmcResolver import *
+from CommonAPI.hmcExecutor import *
+from CommonAPI.hmcFulfillment import *
+from CommonAPI.hmcNotification import startNotificationListener
+from CommonAPI.hmcSnapshot import *
+from CommonAPI.hmcRecords import *
+from CommonAPI.hmcBackupFile import *
+import argparse, ConfigParser, threading, functools
+import parsBackup
 
 hmc = None
 cpcID = None
+# name to URI indexes of adapters, storage groups and virtual switches
+resolver = None
+# watcher of the fulfillment state of the storage groups
+watcher = None
 
 hmcHost = None
 cpcName = None
 userId = None
 password = None
 configFile = None
+# number of partitions restored at the same time
+workers = DEFAULT_WORKERS
+# seconds between two polls of the fulfillment state of the storage groups
+pollInterval = DEFAULT_POLL_INTERVAL
+# seconds to wait for the storage groups to be complete
+fulfillmentTimeout = DEFAULT_FULFILLMENT_TIMEOUT
+# restore only the configs which differ from the current ones
+reconcile = False
+# skip the operations recorded in the journal of an interrupted restore
+resume = False
+# journal of the completed operations
+journal = None
 createPass = list()
 createFail = list()
+reconcilePass = list()
+reconcileFail = list()
 sectionDict = dict()
 
 # default SSC partition master password
 SSC_MASTER_PASSWORD = 'passw0rd'
 
+# operations recorded in the journal, the others (lookups) are run again if needed
+JOURNAL_OPERATIONS = ['create', 'update', 'vnic', 'vnic-update', 'attach', 'devnum',
+                      'accelerator', 'accelerator-update', 'cryptos', 'boot']
+
 PARTITION_API_MAP = {'par_type' : 'type',
                      'par_desc' : 'description',
                      'par_reserveresources' : 'reserve-resources',      # boolean
@@ -70,15 +102,12 @@ NIC_API_MAP = {'name' : 'name',
                'sscmaskprefix' : 'ssc-mask-prefix',
                'vlanid' : 'vlan-id'
               }
-# for multi-thread write protection
-lock = threading.Lock()
-
 # ------------------------------------------------------------------ #
 # ----- Start of parseArgs function -------------------------------- #
 # ------------------------------------------------------------------ #
 def parseArgs():
     print ">>> parsing the input parameters..."
-    global hmcHost, cpcName, userId, password, configFile
+    global hmcHost, cpcName, userId, password, configFile, workers, pollInterval, fulfillmentTimeout, reconcile, resume
 
     parser = argparse.ArgumentParser(description='restore the partitions by configure file')
     parser.add_argument('-hmc', '--hmcHost', metavar='<HMC host IP>', help='HMC host IP', required=True)
@@ -87,6 +116,21 @@ def parseArgs():
     parser.add_argument('-psw', '--password', metavar='<password>', help='password', required=True)
     parser.add_argument('-config', '--configFile', metavar='<configure file name>',
                         help='indicate configure file name / location', required=True)
+    parser.add_argument('-workers', '--workers', metavar='<number of workers>', type=workerCount,
+                        help='number of restore operations run at the same time', required=False)
+    parser.add_argument('-pollInterval', '--pollInterval', metavar='<seconds>', type=int,
+                        help='seconds between two polls of the storage group fulfillment state, '
+                             'if HMC notifications are not available (default: %s)' % DEFAULT_POLL_INTERVAL,
+                        required=False)
+    parser.add_argument('-fulfillTimeout', '--fulfillmentTimeout', metavar='<seconds>', type=int,
+                        help='seconds to wait for the storage groups to be complete, '
+                             '0 to attach them in any state without waiting (default: %s)' % DEFAULT_FULFILLMENT_TIMEOUT, required=False)
+    parser.add_argument('-reconcile', '--reconcile', action='store_true',
+                        help='update the partitions which exist already, only the configs which differ '
+                             'from the config file are restored', required=False)
+    parser.add_argument('-resume', '--resume', action='store_true',
+                        help='continue an interrupted restore, the operations recorded in its journal '
+                             'are skipped', required=False)
 
     args = vars(parser.parse_args())
     #hmc host
@@ -104,6 +148,21 @@ def parseArgs():
     #config file
     _configFile = assertValue(pyObj=args, key='configFile', listIndex=0, optionalKey=True)
     configFile = checkValue('configFile', _configFile, configFile)
+    #number of workers
+    _workers = assertValue(pyObj=args, key='workers', optionalKey=True)
+    if _workers != None:
+        workers = capWorkers(_workers)
+    #fulfillment watch
+    _pollInterval = assertValue(pyObj=args, key='pollInterval', optionalKey=True)
+    if _pollInterval != None:
+        pollInterval = _pollInterval
+    _fulfillmentTimeout = assertValue(pyObj=args, key='fulfillmentTimeout', optionalKey=True)
+    if _fulfillmentTimeout != None:
+        fulfillmentTimeout = _fulfillmentTimeout
+    #reconcile mode
+    reconcile = assertValue(pyObj=args, key='reconcile', optionalKey=True)
+    #resume mode
+    resume = assertValue(pyObj=args, key='resume', optionalKey=True)
 
 # ------------------------------------------------------------------ #
 # ----- End of parseArgs function ---------------------------------- #
@@ -123,6 +182,18 @@ def loadConfig(configFile):
             raise exc
         if '/' not in configFile:
             configFile = os.path.join(sys.path[0], configFile)
+        if isBackupFile(configFile):
+            # structured backup file, may hold several CPCs
+            sectionDict.update(loadBackupSections(configFile, kind=BACKUP_PARTITIONS, cpcName=cpcName))
+            return
+        if configFile.endswith('.json'):
+            # snapshot index of incremental backups, full backup file with deltas applied
+            sectionDict.update(loadSnapshotConfig(configFile))
+            return
+        if configFile.endswith('.jsonl'):
+            # records file of a backup in stream mode, e.g. of an interrupted backup
+            sectionDict.update(loadRecordsConfig(configFile))
+            return
         config = ConfigParser.RawConfigParser()
         config.readfp(open(configFile))
 
@@ -143,45 +214,321 @@ def loadConfig(configFile):
 # ------------------------------------------------------------------ #
 
 # ------------------------------------------------------------------ #
-# ----- Start of procSinglePartition function ---------------------- #
+# ----- Start of journal functions --------------------------------- #
+# ------------------------------------------------------------------ #
+def openJournal(configFile, cpcName):
+    '''
+    - open the journal of the restore, next to the config file. The steps
+    - recorded by an interrupted restore of the same config file and CPC are
+    - loaded if resumed, otherwise the journal is started again
+    '''
+    if '/' not in configFile:
+        configFile = os.path.join(sys.path[0], configFile)
+    journalPath = os.path.join(os.path.dirname(os.path.abspath(configFile)),
+                               "%s-Partitions-Restore-Journal.jsonl" %cpcName)
+    restoreJournal = HMCStepJournal(journalPath, header={'config': os.path.basename(configFile),
+                                                         'cpc': cpcName})
+    if resume:
+        count = restoreJournal.load()
+        if count == None:
+            print ">>> The journal %s belongs to another restore, it is started again" %journalPath
+        else:
+            print ">>> %s completed operation(s) read from the journal %s" %(count, journalPath)
+    else:
+        restoreJournal.discard()
+    return restoreJournal
+
+
+def isJournalKey(key):
+    '''
+    - return True if the operation is recorded in the journal
+    '''
+    return key[0] in sectionDict and len(key) > 1 and key[1] in JOURNAL_OPERATIONS
+
+
+def recordOperation(key, result):
+    '''
+    - record a completed operation in the journal, called by the scheduler
+    '''
+    if isJournalKey(key):
+        journal.record(key, result.value)
+
+# ------------------------------------------------------------------ #
+# ----- End of journal functions ----------------------------------- #
 # ------------------------------------------------------------------ #
-def procSinglePartition(parName):
-    global sectionDict
-    try:
-        if lock.acquire():
-            partitionDict = sectionDict[parName]
-            (parTemp, vnicDict, sgDevNumDict, ficonList, acceList, cryptoDict, bootOptionDict) = createPartitionTemplate(parName, partitionDict)
-            lock.release()
-        if lock.acquire():
-            partRet = createPartition(hmc, cpcID, parTemp)
-            lock.release()
-        if lock.acquire():
-            if partRet != None:
-                createPass.append(parName)
-                if len(vnicDict) != 0:
-                    constructVnics(partRet, parName, vnicDict)
-                if len(sgDevNumDict) != 0:
-                    constructStorageGroups(partRet, parName, sgDevNumDict=sgDevNumDict)
-                    setDeviceNumber(partRet, parName, sgDevNumDict)
-                if len(ficonList) != 0:
-                    constructStorageGroups(partRet, parName, ficonList=ficonList)
-                if len(acceList) != 0:
-                    constructAccelerators(partRet, parName, acceList)
-                if len(cryptoDict) != 0:
-                    constructCryptos(partRet, parName, cryptoDict)
-                if len(bootOptionDict) != 0:
-                    couldStart = setBootOption(partRet, parName, bootOptionDict)
-            else:
-                createFail.append(parName)
-            lock.release()
-    except Exception as exc:
-        print ">>> Create partition failed: ", parName
 
-        createFail.append(parName)
-        lock.release()
+# ------------------------------------------------------------------ #
+# ----- Start of addPartitionTasks function ------------------------ #
+# ------------------------------------------------------------------ #
+def addPartitionTasks(scheduler, parName, current=None):
+    '''
+    - add the restore operations of a partition to the scheduler. Every operation
+    - depends on the operations it needs, e.g. a vNIC on the partition and on the
+    - virtual switch lookup, the storage group attachment and the boot option on
+    - the fulfillment of the storage group. Lookups and fulfillment watches are
+    - shared by the operations of all partitions
+    - if current is given (reconcile mode), the partition exists already and only
+    - the operations for the configs which differ from the current ones are added
+    - return (<key of the create operation of the partition, or of the lookup of
+    - the existing partition>, <number of added operations>)
+    '''
+    global sectionDict
+    partitionDict = sectionDict[parName]
+    (parTemp, vnicDict, sgDevNumDict, ficonList, acceList, cryptoDict, bootOptionDict) = createPartitionTemplate(parName, partitionDict)
+    if current == None:
+        createKey = scheduler.add((parName, 'create'), functools.partial(createPartitionTask, parName, parTemp))
+        changes = 1
+        current = {'section': dict(), 'nic': dict(), 'virtual-function': dict()}
+    else:
+        createKey = scheduler.add((parName, 'partition'), functools.partial(lookupPartition, current['uri']))
+        changes = 0
+        parProp = diffPartitionProperties(parTemp, createPartitionTemplate(parName, current['section'])[0])
+        if len(parProp) != 0:
+            scheduler.add((parName, 'update'), functools.partial(updatePartitionTask, parName, parProp), [createKey])
+            changes += 1
+    (curTemp, curVnicDict, curSgDevNumDict, curFiconList, curAcceList, curCryptoDict, curBootOptionDict) = createPartitionTemplate(parName, current['section'])
+
+    curVnics = dict([(curVnic['name'], curVnic) for curVnic in splitVnics(curVnicDict)])
+    for vnicPrefixDict in splitVnics(vnicDict):
+        curVnic = curVnics.get(vnicPrefixDict['name'])
+        if curVnic == vnicPrefixDict:
+            continue
+        if not vnicPrefixDict.has_key("adapname"):
+            print ">>> Create vNIC for %s failed: %s, only support OSA card this time" %(parName, vnicPrefixDict["name"])
+            continue
+        vsKey = addVirtualSwitchLookup(scheduler, vnicPrefixDict["adapname"], vnicPrefixDict["adapport"])
+        if curVnic == None:
+            scheduler.add((parName, 'vnic', vnicPrefixDict['name']), functools.partial(constructVnic, parName, vnicPrefixDict),
+                          [createKey, vsKey])
+        else:
+            scheduler.add((parName, 'vnic-update', vnicPrefixDict['name']),
+                          functools.partial(updateVnic, parName, vnicPrefixDict, current['nic'][vnicPrefixDict['name']]),
+                          [createKey, vsKey])
+        changes += 1
+
+    attachKeys = dict()
+    curSgNames = set(curSgDevNumDict.keys()) | set(curFiconList)
+    for sgName in sgDevNumDict.keys() + list(ficonList):
+        if sgName in curSgNames:
+            continue
+        fulfillmentKey = addFulfillmentWatch(scheduler, sgName)
+        attachKeys[sgName] = scheduler.add((parName, 'attach', sgName), functools.partial(constructStorageGroup, parName, sgName),
+                                           [createKey, fulfillmentKey])
+        changes += 1
+    for sgName in sgDevNumDict.keys():
+        if sorted(curSgDevNumDict.get(sgName, [])) == sorted(sgDevNumDict[sgName]):
+            continue
+        if sgName in attachKeys:
+            devNumDeps = [createKey, attachKeys[sgName]]
+        else:
+            devNumDeps = [createKey, addStorageGroupLookup(scheduler, sgName)]
+        scheduler.add((parName, 'devnum', sgName), functools.partial(setDeviceNumber, parName, sgName, sgDevNumDict[sgName]),
+                      devNumDeps)
+        changes += 1
+
+    curAcces = dict([(curAcce['name'], curAcce) for curAcce in curAcceList])
+    for acceDict in acceList:
+        curAcce = curAcces.get(acceDict['name'])
+        if curAcce == acceDict:
+            continue
+        adapterKey = addAdapterLookup(scheduler, acceDict['adapter-name'])
+        if curAcce == None:
+            scheduler.add((parName, 'accelerator', acceDict['name']), functools.partial(constructAccelerator, parName, acceDict),
+                          [createKey, adapterKey])
+        else:
+            scheduler.add((parName, 'accelerator-update', acceDict['name']),
+                          functools.partial(updateAccelerator, parName, acceDict, current['virtual-function'][acceDict['name']]),
+                          [createKey, adapterKey])
+        changes += 1
+
+    if len(cryptoDict) != 0:
+        cryptoDict = missingCryptoConfig(cryptoDict, curCryptoDict)
+        if cryptoDict != None:
+            adapterKeys = [addAdapterLookup(scheduler, adapterName) for adapterName in cryptoDict['crypto-adapter-names']]
+            scheduler.add((parName, 'cryptos'), functools.partial(constructCryptos, parName, cryptoDict),
+                          [createKey] + adapterKeys)
+            changes += 1
+
+    if len(bootOptionDict) != 0 and bootOptionDict != curBootOptionDict:
+        if bootOptionDict['boot_device'] != 'storage-volume':
+            # only set the boot option when boot from SAN
+            print ">>> Set boot option for ", parName,  "failed: only support boot from SAN!"
+        else:
+            bootSgName = bootOptionDict['storage_group_name']
+            bootDeps = [createKey, addFulfillmentWatch(scheduler, bootSgName)]
+            if bootSgName in attachKeys:
+                bootDeps.append(attachKeys[bootSgName])
+            scheduler.add((parName, 'boot'), functools.partial(setBootOption, parName, bootOptionDict), bootDeps)
+            changes += 1
+    return (createKey, changes)
+
+# ------------------------------------------------------------------ #
+# ----- End of addPartitionTasks function -------------------------- #
+# ------------------------------------------------------------------ #
+
+# ------------------------------------------------------------------ #
+# ----- Start of lookup functions ---------------------------------- #
+# ------------------------------------------------------------------ #
+def addAdapterLookup(scheduler, adapterName):
+    '''
+    - add the lookup of an adapter by name, the operation returns the adapter
+    - return the key of the lookup
+    '''
+    return scheduler.add(('adapter', adapterName), functools.partial(resolver.selectAdapter, adapterName))
+
+
+def addVirtualSwitchLookup(scheduler, adapterName, adapterPort):
+    '''
+    - add the lookup of the virtual switch of an adapter port, the operation
+    - returns the virtual switch URI
+    - return the key of the lookup
+    '''
+    adapterKey = addAdapterLookup(scheduler, adapterName)
+    def lookupVirtualSwitch(adapterDict):
+        return resolver.getVirtualSwitchURI(adapterDict[KEY_ADAPTER_URI], adapterPort)
+    return scheduler.add(('virtual-switch', adapterName, adapterPort), lookupVirtualSwitch, [adapterKey])
+
+
+def addStorageGroupLookup(scheduler, sgName):
+    '''
+    - add the lookup of a storage group by name, the operation returns the
+    - storage group URI
+    - return the key of the lookup
+    '''
+    def lookupStorageGroup():
+        sgUri = resolver.getStorageGroupURI(sgName)
+        if (sgUri == None):
+            print ">>> The indicated storage group name: %s not exist in the system, please double check!" %sgName
+            exc = Exception("The indicated storage group name: " + sgName + " not exist in the system, please double check!")
+            raise exc
+        return sgUri
+    return scheduler.add(('storage-group', sgName), lookupStorageGroup)
+
+
+def addFulfillmentWatch(scheduler, sgName):
+    '''
+    - add the watch of the fulfillment state of a storage group, the operation
+    - is done with the storage group URI as soon as the storage group is complete
+    - return the key of the watch, or of the storage group lookup if the restore
+    - does not wait (fulfillment timeout 0), the storage group is attached in any state
+    '''
+    sgKey = addStorageGroupLookup(scheduler, sgName)
+    if fulfillmentTimeout == 0:
+        return sgKey
+    def watchFulfillment(sgUri):
+        return watcher.watch(sgUri, sgName)
+    return scheduler.add(('fulfillment', sgName), watchFulfillment, [sgKey])
+
+
+def reportFulfillment(sgUri, sgName, state, oldState):
+    '''
+    - print the fulfillment state changes of the watched storage groups
+    '''
+    if state != FULFILLMENT_COMPLETE:
+        print ">>> Storage group %s is in %s state, waiting for it to be complete..." %(sgName, state)
+    elif oldState != None:
+        print ">>> Storage group %s is complete now" %sgName
+
+# ------------------------------------------------------------------ #
+# ----- End of lookup functions ------------------------------------ #
+# ------------------------------------------------------------------ #
+
+# ------------------------------------------------------------------ #
+# ----- Start of reconcile functions ------------------------------- #
+# ------------------------------------------------------------------ #
+def loadCurrentPartitions(parNames):
+    '''
+    - read the current configs of the partitions in parNames which exist on the
+    - CPC, the same way as they are backed up, from the inventory of the CPC
+    - loaded in bulk
+    - return {<partition name>: {'uri': <partition uri>, 'section': {<key>: <value>},
+    -         'nic': {<name>: <uri>}, 'virtual-function': {<name>: <uri>}}}
+    '''
+    global hmc, cpcID, resolver
+    cpcURI = '/api/cpcs/' + cpcID
+    inventory = collectCPCInventory(hmc, cpcURI, bulk=True)
+    directory = parsBackup.loadPartitionDirectory(hmc, cpcID)
+    existingParNames = [parName for parName in parNames if parName in directory.parURIsByName]
+    if len(existingParNames) == 0:
+        return dict()
+    sgList = getStorageGroupList(hmc, cpcURI=cpcURI)
+    for sgInfo in sgList:
+        # the storage groups are not listed again by the lookups
+        resolver.addStorageGroup(sgInfo)
+    allParsCfg = parsBackup.collectPartitionsConfig(inventory, directory, cpcURI, sgList, hmc.apiMinorVer >= 22, workers,
+                                                    parNames=existingParNames, quiet=True)
+    currentPartitions = dict()
+    for parName in existingParNames:
+        parURI = directory.parURIsByName[parName]
+        parProp = inventory.getObject(parURI, properties=parsBackup.PARTITION_PROPERTIES)
+        current = {'uri': parURI,
+                   'section': configSection(BACKUP_PARTITIONS, parsBackup.partitionConfigItems(allParsCfg[parName]))}
+        for elemClass, uriProp in [('nic', 'nic-uris'), ('virtual-function', 'virtual-function-uris')]:
+            current[elemClass] = dict()
+            for elemURI in parProp.get(uriProp) or []:
+                current[elemClass][inventory.getObject(elemURI, properties=['name'])['name']] = elemURI
+        currentPartitions[parName] = current
+    return currentPartitions
+
+
+def lookupPartition(partUri):
+    '''
+    - return the URI of an existing partition, the operations of the partition
+    - depend on it instead of the create operation
+    '''
+    return partUri
+
+
+def diffPartitionProperties(parTemp, curTemp):
+    '''
+    - compare the partition template of the config file with the template of the
+    - current partition config
+    - return the properties to be updated
+    '''
+    parProp = dict()
+    for key, value in parTemp.items():
+        # the type cannot be updated, the SSC master password cannot be read
+        if key in ['name', 'type', SSC_API_MAP['par_sscmasterpw']]:
+            continue
+        if curTemp.get(key) != value:
+            parProp[key] = value
+    # processors of the other type are removed
+    for key in PARTITION_API_MAP['proc_num']:
+        if key not in parTemp and curTemp.get(key):
+            parProp[key] = 0
+    return parProp
+
+
+def missingCryptoConfig(cryptoDict, curCryptoDict):
+    '''
+    - return the crypto config with the adapters and domains of cryptoDict which
+    - are not in the current crypto config, None if there are none
+    '''
+    curAdapterNames = []
+    curDomainIndexes = []
+    if len(curCryptoDict) != 0:
+        curAdapterNames = curCryptoDict['crypto-adapter-names']
+        curDomainIndexes = [domainDict['domain-index'] for domainDict in curCryptoDict.get('crypto-domain-configurations', [])]
+    missingDict = dict(cryptoDict)
+    missingDict['crypto-adapter-names'] = [adapterName for adapterName in cryptoDict['crypto-adapter-names']
+                                           if adapterName not in curAdapterNames]
+    missingDict['crypto-domain-configurations'] = [domainDict for domainDict in cryptoDict.get('crypto-domain-configurations', [])
+                                                   if domainDict['domain-index'] not in curDomainIndexes]
+    if len(missingDict['crypto-adapter-names']) == 0 and len(missingDict['crypto-domain-configurations']) == 0:
+        return None
+    return missingDict
+
+
+def updatePartitionTask(parName, parProp, partUri):
+    global hmc
+    if updatePartitionProperties(hmcConn=hmc, parURI=partUri, parProp=parProp):
+        print ">>> Update partition %s successfully: %s" %(parName, sorted(parProp.keys()))
+        return True
+    print ">>> Update partition %s failed: %s" %(parName, sorted(parProp.keys()))
+    return False
 
 # ------------------------------------------------------------------ #
-# ----- End of procSinglePartition function ------------------------ #
+# ----- End of reconcile functions --------------------------------- #
 # ------------------------------------------------------------------ #
 
 # ------------------------------------------------------------------ #
@@ -248,7 +595,7 @@ def createPartitionTemplate(parName, partitionDict):
                             exc = Exception("The procType should either be 'cp' or be 'ifl', other values invalid!")
                             raise exc
                 elif (propertyKey == 'sgdevnum'):
-                    vhbaList = eval(partitionDict[propertyKey])
+                    vhbaList = parseConfigValue(partitionDict[propertyKey])
                     for vhba in vhbaList:
                         vhbaProp = vhba.split(':')
                         if sgDevNumDict.has_key(vhbaProp[0]):
@@ -256,13 +603,13 @@ def createPartitionTemplate(parName, partitionDict):
                         else:
                             sgDevNumDict[vhbaProp[0]] = [vhbaProp[1]]
                 elif (propertyKey == 'sgficon'):
-                    ficonList = eval(partitionDict[propertyKey])
+                    ficonList = parseConfigValue(partitionDict[propertyKey])
                 elif (propertyKey == 'zaccelerators'):
-                    acceList = eval(partitionDict[propertyKey])
+                    acceList = parseConfigValue(partitionDict[propertyKey])
                 elif (propertyKey == 'zcryptos'):
-                    cryptoDict = eval(partitionDict[propertyKey])
+                    cryptoDict = parseConfigValue(partitionDict[propertyKey])
                 elif (propertyKey == 'zzbootopt'):
-                    bootOptionDict = eval(partitionDict[propertyKey])
+                    bootOptionDict = parseConfigValue(partitionDict[propertyKey])
 
                 else:
                     # parse vNIC
@@ -307,185 +654,214 @@ def createPartition(hmc, cpcID, parTemp):
 # ------------------------------------------------------------------ #
 
 # ------------------------------------------------------------------ #
-# ----- Start of constructVnics function --------------------------- #
+# ----- Start of createPartitionTask function ---------------------- #
 # ------------------------------------------------------------------ #
-def constructVnics(partUri, partName, vnicDict):
+def createPartitionTask(parName, parTemp):
     global hmc, cpcID
+    try:
+        return createPartition(hmc, cpcID, parTemp)
+    except Exception as exc:
+        print ">>> Create partition failed: ", parName
+        raise exc
+
+# ------------------------------------------------------------------ #
+# ----- End of createPartitionTask function ------------------------ #
+# ------------------------------------------------------------------ #
+
+# ------------------------------------------------------------------ #
+# ----- Start of constructVnic function ---------------------------- #
+# ------------------------------------------------------------------ #
+def splitVnics(vnicDict):
+    '''
+    - split the vNIC items of a partition config by vNIC
+    - return [{<item without vNIC prefix>: <value>}, ...]
+    '''
     vnicNameSet = set()
+    for key in vnicDict.keys():
+        if re.match('.*_name$', key):
+            vnicNameSet.add(key)
+
+    vnicList = []
+    for vnicName in sorted(vnicNameSet):
+        vnicPrefix = vnicName[:5]
+        vnicPrefixDict = dict()
+        for key in vnicDict.keys():
+            pattern = '^'+vnicPrefix
+            if re.match(pattern, key):
+                vnicPrefixDict[key[6:]] = vnicDict[key]
+        vnicList.append(vnicPrefixDict)
+    return vnicList
+
+
+def createVnicTemplate(vnicPrefixDict, vsUri):
+    nicTempl = dict()
+    nicTempl[NIC_API_MAP['name']] = vnicPrefixDict['name']
+    nicTempl['virtual-switch-uri'] = vsUri
+    if vnicPrefixDict.has_key('devnum'):
+        nicTempl[NIC_API_MAP['devnum']] = vnicPrefixDict['devnum']
+    if vnicPrefixDict.has_key('desc'):
+        nicTempl[NIC_API_MAP['desc']] = vnicPrefixDict['desc']
+    if vnicPrefixDict.has_key('sscipaddr'):
+        nicTempl['ssc-management-nic'] = True
+        nicTempl[NIC_API_MAP['sscipaddr']] = vnicPrefixDict['sscipaddr']
+        nicTempl[NIC_API_MAP['sscipaddrtype']] = vnicPrefixDict['sscipaddrtype']
+        nicTempl[NIC_API_MAP['sscmaskprefix']] = vnicPrefixDict['sscmaskprefix']
+        if vnicPrefixDict.has_key('vlanid'):
+            nicTempl[NIC_API_MAP['vlanid']] = int(vnicPrefixDict['vlanid'])
+            nicTempl['vlan-type'] = None
+    return nicTempl
+
+
+def constructVnic(partName, vnicPrefixDict, partUri, vsUri):
+    global hmc
     partID = partUri.replace('/api/partitions/','')
     try:
-        for key in vnicDict.keys():
-            if re.match('.*_name$', key):
-                vnicNameSet.add(key)
-
-        for vnicName in vnicNameSet:
-            vnicPrefix = vnicName[:5]
-            vnicPrefixDict = dict()
-            for key in vnicDict.keys():
-                pattern = '^'+vnicPrefix
-                if re.match(pattern, key):
-                    vnicPrefixDict[key[6:]] = vnicDict[key]
-            if (vnicPrefixDict.has_key("adapname")):
-                adapterDict = selectAdapter(hmc, vnicPrefixDict["adapname"], cpcID)
-                vsUri = selectVirtualSwitch(hmc, cpcID, adapterDict[KEY_ADAPTER_URI], vnicPrefixDict["adapport"])
-                nicTempl = dict()
-                nicTempl[NIC_API_MAP['name']] = vnicPrefixDict['name']
-                nicTempl['virtual-switch-uri'] = vsUri
-                if vnicPrefixDict.has_key('devnum'):
-                    nicTempl[NIC_API_MAP['devnum']] = vnicPrefixDict['devnum']
-                if vnicPrefixDict.has_key('desc'):
-                    nicTempl[NIC_API_MAP['desc']] = vnicPrefixDict['desc']
-                if vnicPrefixDict.has_key('sscipaddr'):
-                    nicTempl['ssc-management-nic'] = True
-                    nicTempl[NIC_API_MAP['sscipaddr']] = vnicPrefixDict['sscipaddr']
-                    nicTempl[NIC_API_MAP['sscipaddrtype']] = vnicPrefixDict['sscipaddrtype']
-                    nicTempl[NIC_API_MAP['sscmaskprefix']] = vnicPrefixDict['sscmaskprefix']
-                    if vnicPrefixDict.has_key('vlanid'):
-                        nicTempl[NIC_API_MAP['vlanid']] = int(vnicPrefixDict['vlanid'])
-                        nicTempl['vlan-type'] = None
-                nicRet = createNIC(hmc, partID, nicTempl)
-                print ">>> Create vNIC for %s successfully: %s" %(partName, vnicPrefixDict["name"])
-            else:
-                print ">>> Create vNIC for %s failed: %s, only support OSA card this time" %(partName, vnicPrefixDict["name"])
+        nicTempl = createVnicTemplate(vnicPrefixDict, vsUri)
+        nicRet = createNIC(hmc, partID, nicTempl)
+        print ">>> Create vNIC for %s successfully: %s" %(partName, vnicPrefixDict["name"])
+        return nicRet
+
+    except Exception as exc:
+        print ">>> Create vNIC for %s failed: %s" %(partName, vnicPrefixDict["name"])
+        raise exc
+
+
+def updateVnic(partName, vnicPrefixDict, nicUri, partUri, vsUri):
+    global hmc
+    try:
+        updateNICProperties(hmc, nicUri, createVnicTemplate(vnicPrefixDict, vsUri))
+        print ">>> Update vNIC for %s successfully: %s" %(partName, vnicPrefixDict["name"])
+        return True
 
     except Exception as exc:
-        print ">>> Create vNIC for %s failed!" %partName
+        print ">>> Update vNIC for %s failed: %s" %(partName, vnicPrefixDict["name"])
+        raise exc
 
 # ------------------------------------------------------------------ #
-# ----- End of constructVnics function ----------------------------- #
+# ----- End of constructVnic function ------------------------------ #
 # ------------------------------------------------------------------ #
 
 # ------------------------------------------------------------------ #
-# ----- Start of constructStorageGroups function ------------------- #
+# ----- Start of constructStorageGroup function -------------------- #
 # ------------------------------------------------------------------ #
-def constructStorageGroups(partUri, parName, sgDevNumDict=None, ficonList=None):
+def constructStorageGroup(parName, sgName, partUri, sgUri):
+    '''
+    - attach a storage group to the partition
+    - return the storage group URI
+    '''
     global hmc
     partID = partUri.replace('/api/partitions/','')
-    sgNameList = []
-    if sgDevNumDict != None:
-        sgNameList = sgDevNumDict.keys()
-    elif ficonList != None:
-        sgNameList = ficonList
-    else:
-        exc = Exception("sgDevNumDict and ficonList should have at least one is not None!")
-        raise exc
-
     try:
-        for sgName in sgNameList:
-            sgUri = selectStorageGroup(hmc, sgName)
-            if (sgUri == None):
-                exc = Exception("The indicated storage group name: " + sgName + " not exist in the system, please double check!")
-                raise exc
-            sgTempl = dict()
-            sgTempl['storage-group-uri'] = sgUri
-            sgRet = attachStorageGroup(hmc, partID, sgTempl)
-            print ">>> Construct storage group for %s successfully: %s" %(parName, sgName)
+        sgTempl = dict()
+        sgTempl['storage-group-uri'] = sgUri
+        sgRet = attachStorageGroup(hmc, partID, sgTempl)
+        print ">>> Construct storage group for %s successfully: %s" %(parName, sgName)
+        return sgUri
     except Exception as exc:
-        print ">>> Attach storage group for %s failed!" %parName
+        print ">>> Attach storage group for %s failed: %s" %(parName, sgName)
+        raise exc
 
 # ------------------------------------------------------------------ #
-# ----- End of constructStorageGroups function --------------------- #
+# ----- End of constructStorageGroup function ---------------------- #
 # ------------------------------------------------------------------ #
 
-def constructAccelerators(partUri, parName, acceList):
-    global hmc, cpcID
+def constructAccelerator(parName, acceDict, partUri, adapterDict):
+    global hmc
     partID = partUri.replace('/api/partitions/','')
 
     try:
-        for acceDict in acceList:
-            adapterName = acceDict.pop('adapter-name')
-            adapterUri = selectAdapter(hmc, adapterName, cpcID)[KEY_ADAPTER_URI]
-            acceDict['adapter-uri'] = adapterUri
+        vfTempl = dict(acceDict)
+        vfTempl.pop('adapter-name')
+        vfTempl['adapter-uri'] = adapterDict[KEY_ADAPTER_URI]
 
-            vfRet = createVirtualFunction(hmc, partID, acceDict)
-            print ">>> Construct accelerator virtual function for %s successfully: %s" %(parName, acceDict['name'])
+        vfRet = createVirtualFunction(hmc, partID, vfTempl)
+        print ">>> Construct accelerator virtual function for %s successfully: %s" %(parName, vfTempl['name'])
+        return vfRet
     except Exception as exc:
-        print ">>> Construct accelerator failed!"
+        print ">>> Construct accelerator for %s failed: %s" %(parName, acceDict['name'])
+        raise exc
 
 
-def constructCryptos(partUri, parName, cryptoDict):
-    global hmc, cpcID
+def updateAccelerator(parName, acceDict, vfUri, partUri, adapterDict):
+    global hmc
+
+    try:
+        vfTempl = dict(acceDict)
+        vfTempl.pop('adapter-name')
+        vfTempl['adapter-uri'] = adapterDict[KEY_ADAPTER_URI]
+
+        updateVirtualFunctionProperties(hmc, vfUri, vfTempl)
+        print ">>> Update accelerator virtual function for %s successfully: %s" %(parName, vfTempl['name'])
+        return True
+    except Exception as exc:
+        print ">>> Update accelerator for %s failed: %s" %(parName, acceDict['name'])
+        raise exc
+
+
+def constructCryptos(parName, cryptoDict, partUri, *adapterDicts):
+    global hmc
     partID = partUri.replace('/api/partitions/','')
 
     try:
-        adapterNameList = cryptoDict.pop('crypto-adapter-names')
-        adapterUriList = []
-        for adapterName in adapterNameList:
-            adapterUri = selectAdapter(hmc, adapterName, cpcID)[KEY_ADAPTER_URI]
-            adapterUriList.append(adapterUri)
-        cryptoDict['crypto-adapter-uris'] = adapterUriList
-
-        increaseCryptoConfiguration(hmc, partID, cryptoDict)
+        cryptoTempl = dict(cryptoDict)
+        adapterNameList = cryptoTempl.pop('crypto-adapter-names')
+        cryptoTempl['crypto-adapter-uris'] = [adapterDict[KEY_ADAPTER_URI] for adapterDict in adapterDicts]
+
+        increaseCryptoConfiguration(hmc, partID, cryptoTempl)
         print ">>> Construct cryptos for %s successfully: %s" %(parName, adapterNameList)
+        return True
     except Exception as exc:
         print ">>> Construct cryptos for %s failed!" %parName
+        raise exc
 
 
 # ------------------------------------------------------------------ #
 # ----- Start of setDeviceNumber function -------------------------- #
 # ------------------------------------------------------------------ #
-def setDeviceNumber(partUri, parName, sgDevNumDict):
+def setDeviceNumber(parName, sgName, devNumList, partUri, sgUri):
     global hmc
-    partID = partUri.replace('/api/partitions/','')
+    sgID = sgUri.replace('/api/storage-groups/', '')
+    devNumList = list(devNumList)
     try:
-        for sgName in sgDevNumDict.keys():
-            sgUri = selectStorageGroup(hmc, sgName)
-            if (sgUri == None):
-                exc = Exception("The indicated storage group name: " + sgName + " not exist in the system, please double check!")
-                raise exc
-            sgID = sgUri.replace('/api/storage-groups/', '')
-            vsrList = listVirtualStorageResourcesOfStorageGroup(hmc, sgID)
-
-            for vsr in vsrList:
-                if vsr['partition-uri'] == partUri:
-                    vsrTempl = dict()
-
-                    vsrTempl['device-number'] = sgDevNumDict[sgName].pop()
-                    if updateVirtualStorageResourceProperties(hmc, str(vsr['element-uri']), vsrTempl):
-                        print ">>> Set device number for %s successfully: %s" %(sgName, vsrTempl['device-number'])
+        vsrList = listVirtualStorageResourcesOfStorageGroup(hmc, sgID)
+
+        for vsr in vsrList:
+            if vsr['partition-uri'] == partUri:
+                vsrTempl = dict()
+
+                vsrTempl['device-number'] = devNumList.pop()
+                if updateVirtualStorageResourceProperties(hmc, str(vsr['element-uri']), vsrTempl):
+                    print ">>> Set device number for %s successfully: %s" %(sgName, vsrTempl['device-number'])
+        return True
     except Exception as exc:
-        print ">>> Device number set for %s failed!" %parName
+        print ">>> Device number set for %s failed: %s" %(parName, sgName)
+        raise exc
 # ------------------------------------------------------------------ #
 # ----- End of setDeviceNumber function ---------------------------- #
 # ------------------------------------------------------------------ #
 
-def setBootOption(partUri, parName, bootOptionDict):
-    global hmc
+def setBootOption(parName, bootOptionDict, partUri, sgUri, *attached):
+    '''
+    - set the boot option of the partition, once the boot storage group is complete.
+    - the boot volume is looked up in the storage volume index of the storage group,
+    - which is built once and shared by all partitions booting from it
+    '''
+    global hmc, resolver
 
     try:
-        if bootOptionDict['boot_device'] != 'storage-volume':
-            # only set the boot option when boot from SAN
-            print ">>> Set boot option for ", parName,  "failed: only support boot from SAN!"
-            return False
-
+        volIndex = resolver.getStorageVolumeIndex(sgUri)
         bootTempl = dict()
         bootTempl['boot-timeout'] = int(bootOptionDict['boot-timeout'])
 
-        bootSgName = bootOptionDict['storage_group_name']
-        bootSgUri = selectStorageGroup(hmc, bootSgName)
-        if bootSgUri == None:
-            print ">>> Set boot option for %s failed: the boot storage group %s not exist!" %(parName, bootSgName)
-            return False
-        sgRet = getStorageGroupProperties(hmc, sgURI=bootSgUri)
-        if assertValue(pyObj=sgRet, key='fulfillment-state') != 'complete':
-            print ">>> Set boot option for %s failed: the boot storage group is in %s state!" %(parName, assertValue(pyObj=sgRet, key='fulfillment-state'))
-            return False
-
-        for sgVolUri in assertValue(pyObj=sgRet, key='storage-volume-uris'):
-            svRet = getStorVolProperties(hmc, sgVolUri)
-            if assertValue(pyObj=sgRet, key='type') == 'fcp':
-                if svRet['usage'] == 'boot' and svRet['uuid'] == bootOptionDict['fcp-volume-uuid']:
-                    bootTempl['boot-storage-volume'] = sgVolUri
-                    bootTempl['boot-configuration-selector'] = int(bootOptionDict['fcp-boot-configuration-selector'])
-                    break
-            elif assertValue(pyObj=sgRet, key='type') == 'fc':
-                ctrlUnitUri = assertValue(pyObj=svRet, key='control-unit-uri')
-                ctrlUnitRet = getStorageControlUnitProperties(hmc, ctrlUnitUri)
-                if svRet['usage'] == 'boot' and svRet['eckd-type'] == 'base' and assertValue(pyObj=ctrlUnitRet, key='logical-address') == bootOptionDict['fc-logical-address'] and svRet['unit-address'] == bootOptionDict['fc-unit-address']:
-                    bootTempl['boot-storage-volume'] = sgVolUri
-                    break
-            else:
-                pass
+        if volIndex.getType() == 'fcp':
+            svRet = volIndex.lookupByUUID(bootOptionDict['fcp-volume-uuid'])
+            if svRet != None and svRet['usage'] == 'boot':
+                bootTempl['boot-storage-volume'] = svRet['element-uri']
+                bootTempl['boot-configuration-selector'] = int(bootOptionDict['fcp-boot-configuration-selector'])
+        elif volIndex.getType() == 'fc':
+            svRet = volIndex.lookupByAddress(bootOptionDict['fc-logical-address'], bootOptionDict['fc-unit-address'])
+            if svRet != None and svRet['usage'] == 'boot' and svRet['eckd-type'] == 'base':
+                bootTempl['boot-storage-volume'] = svRet['element-uri']
 
         if 'boot-storage-volume' in bootTempl:
             if updatePartitionProperties(hmcConn=hmc, parURI=partUri, parProp=bootTempl):
@@ -504,6 +880,7 @@ def setBootOption(partUri, parName, bootOptionDict):
 
     except Exception as exc:
         print ">>> Boot option set for %s failed!" %parName
+        raise exc
 
 
 # main function
@@ -513,7 +890,7 @@ try:
 
     # Access HMC system and create HMC connection
     print ">>> Creating HMC connection..."
-    hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password)
+    hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password, poolSize=workers)
     cpc = selectCPC(hmc, cpcName)
     cpcURI = assertValue(pyObj=cpc, key=KEY_CPC_URI)
     cpcName = assertValue(pyObj=cpc, key=KEY_CPC_NAME)
@@ -521,25 +898,90 @@ try:
 
     # Get CPC UUID
     cpcID = cpcURI.replace('/api/cpcs/','')
+    resolver = HMCResolver(hmc, cpcURI)
+    watcher = HMCFulfillmentWatcher(hmc, cpcURI, pollInterval=pollInterval, timeout=fulfillmentTimeout,
+                                    callback=reportFulfillment)
     print ">>> HMC connection created!"
-    threads = []
-    for parName in sectionDict.keys():
-        t = threading.Thread(target=procSinglePartition, args=(parName,))
-        print ">>> Creating partition: " + parName + "..."
-        t.start()
-        threads.append(t)
-    for t in threads:
-        t.join()
+    parNames = sorted(sectionDict.keys())
+    # the operations of all partitions are run by a pool of workers sharing the
+    # HMC connection, each one as soon as the operations it depends on are done
+    currentPartitions = dict()
+    if reconcile:
+        print ">>> Reading the current partitions of the CPC..."
+        currentPartitions = loadCurrentPartitions(parNames)
+        print ">>> %s of %s partitions exist on the CPC already" %(len(currentPartitions), len(parNames))
+    scheduler = HMCTaskScheduler(numWorkers=workers)
+    createKeys = dict()
+    for parName in parNames:
+        current = currentPartitions.get(parName)
+        if current == None:
+            print ">>> Creating partition: " + parName + "..."
+        try:
+            (createKeys[parName], changes) = addPartitionTasks(scheduler, parName, current)
+            if current != None:
+                if changes == 0:
+                    print ">>> Partition %s is up to date" %parName
+                else:
+                    print ">>> Reconciling partition: %s, %s operation(s) to be run..." %(parName, changes)
+        except Exception as exc:
+            if current == None:
+                print ">>> Create partition failed: ", parName
+            else:
+                print ">>> Reconcile partition failed: ", parName
+    journal = openJournal(configFile, cpcName)
+    completed = journal.completed([key for key in scheduler.keys if isJournalKey(key)])
+    resumed = scheduler.getResumed(completed)
+    if any([key[0] == 'fulfillment' and key not in resumed for key in scheduler.keys]):
+        # the fulfillment state is polled if notifications are not available
+        try:
+            startNotificationListener(hmc)
+        except Exception as exc:
+            print ">>> HMC notifications are not available, the storage group fulfillment state is polled every %s seconds" %pollInterval
+    results = scheduler.run(cpcURI=cpcURI, completed=completed, callback=recordOperation)
+    for key in scheduler.keys:
+        result = results[key]
+        if not result.succeeded():
+            print ">>> Operation %s failed: %s" % (' '.join([str(k) for k in key]),
+                                                    result.exc != None and result.exc.message or 'not done')
+    failedParNames = set([key[0] for key in scheduler.keys if not results[key].succeeded()])
+    for parName in parNames:
+        if parName in currentPartitions:
+            if parName in createKeys and parName not in failedParNames:
+                reconcilePass.append(parName)
+            else:
+                reconcileFail.append(parName)
+        elif parName in createKeys and results[createKeys[parName]].succeeded():
+            createPass.append(parName)
+        else:
+            createFail.append(parName)
+    print ">>> " + scheduler.getSummary([results[key] for key in scheduler.keys if key not in scheduler.resumed],
+                                        'operation')
+    if len(completed) != 0:
+        print ">>> %s operation(s) skipped, completed by the interrupted restore" %len(completed)
+    if len(watcher.futures) != 0:
+        print ">>> Fulfillment: " + watcher.getSummary()
+    if len(failedParNames) == 0:
+        journal.discard()
+    else:
+        print ">>> The completed operations are recorded in %s, run the restore again with --resume to continue" %journal.filePath
 except IOError as exc:
     print "Configure file read error!", exc
 except Exception as exc:
     print exc.message
 
 finally:
+    if watcher != None:
+        watcher.stop()
+    if journal != None:
+        journal.close()
     if hmc != None:
         hmc.logoff()
     if (len(createPass) != 0):
         print "Here are the partition(s) been created successfully:", createPass
     if (len(createFail) != 0):
         print "Here are the partition(s) been created failed:", createFail
+    if (len(reconcilePass) != 0):
+        print "Here are the partition(s) been reconciled successfully:", reconcilePass
+    if (len(reconcileFail) != 0):
+        print "Here are the partition(s) been reconciled with failures:", reconcileFail
     print "Script run completed!!!"
@@ -9,6 +9,11 @@ from CommonAPI.prsm2api import *
 from CommonAPI.wsaconst import *
 from CommonAPI.hmcUtils import *
 from CommonAPI.readConfig import *
+from CommonAPI.hmcInventory import *
+from CommonAPI.hmcExecutor import *
+from CommonAPI.hmcSnapshot import *
+from CommonAPI.hmcRecords import *
+from CommonAPI.hmcBackupFile import *
 import argparse, ConfigParser
 
 # General params 
@@ -20,6 +25,38 @@ password = None
 # Dirs to save backup file
 backupDir = None
 
+# Load the inventory of the CPC in bulk before backup
+bulkInventory = False
+
+# Fetch all objects read by the backup concurrently before it is assembled
+prefetch = False
+
+# number of storage volumes of a storage group fetched at the same time
+volumeWorkers = DEFAULT_WORKERS
+
+# Back up changed and new storage groups only, on top of the last full backup
+incremental = False
+
+# Keep the records file every storage group is appended to as soon as it is collected
+stream = False
+
+# Resume the interrupted backup from its checkpoint journal
+resume = False
+
+# Format of the backup file, 'cfg' (config file) or 'json' (structured backup file)
+fileFormat = 'cfg'
+
+# Compression of the structured backup file, None, 'gzip' or 'zstd'
+compression = None
+
+# Properties read from HMC objects, only these are fetched from HMC
+STORAGE_GROUP_PROPERTIES = ['description', 'type', 'shared', 'connectivity', 'max-partitions',
+                            'storage-volume-uris']
+STORAGE_VOLUME_PROPERTIES = ['description', 'usage', 'size', 'eckd-type', 'model', 'device-number']
+# Only base volumes of FICON storage groups are backed up, alias volumes are
+# skipped before their properties are fetched
+FICON_VOLUME_FILTERS = {'eckd-type': 'base'}
+
 
 # ------------------------------------------------------------------ #
 # --------- Start of parseArgs function ---------------------------- #
@@ -28,7 +65,7 @@ def parseArgs():
     '''
     - parse arguments input for this script
     '''
-    global hmcHost, cpcName, userId, password, backupDir
+    global hmcHost, cpcName, userId, password, backupDir, bulkInventory, prefetch, volumeWorkers, incremental, stream, resume, fileFormat, compression
     parser = argparse.ArgumentParser(description="Back up basic configs for all storage groups on specified CPC")
     parser.add_argument('-hmc', '--hmc', metavar='<HMC host IP>', help='HMC host IP', required=True)
     parser.add_argument('-cpc', '--cpcName', metavar='<cpc name>', help='cpc name', required=True)
@@ -36,6 +73,22 @@ def parseArgs():
     parser.add_argument('-psw', '--password', metavar='<password>', help='password', required=True)
     parser.add_argument('-bakDir', '--backupDir', metavar='<backup directory>',
                         help='Directory to save backup file')
+    parser.add_argument('-bulk', '--bulkInventory', action='store_true',
+                        help='load the inventory of the CPC in bulk before backup')
+    parser.add_argument('-prefetch', '--prefetch', action='store_true',
+                        help='fetch all objects read by the backup concurrently before it is assembled')
+    parser.add_argument('-volWorkers', '--volumeWorkers', metavar='<number of workers>', type=workerCount,
+                        help='number of storage volumes of a storage group fetched at the same time')
+    parser.add_argument('-incr', '--incremental', action='store_true',
+                        help='back up changed and new storage groups only into a delta file on top of the last full backup')
+    parser.add_argument('-stream', '--stream', action='store_true',
+                        help='keep the records file every storage group is appended to as soon as it is collected')
+    parser.add_argument('-resume', '--resume', action='store_true',
+                        help='resume the interrupted backup, storage groups backed up already are not fetched again')
+    parser.add_argument('-format', '--format', choices=['cfg', 'json'],
+                        help='format of the backup file, config file (cfg, default) or structured backup file (json)')
+    parser.add_argument('-compress', '--compress', choices=['gzip', 'zstd'],
+                        help='compress the structured backup file')
 
     args = vars(parser.parse_args())
     #hmc host
@@ -53,6 +106,27 @@ def parseArgs():
     #Backup directory
     _backupDir = assertValue(pyObj=args, key='backupDir', listIndex=0, optionalKey=True)
     backupDir = checkValue('backupDir', _backupDir, backupDir)
+    #Bulk inventory mode
+    bulkInventory = assertValue(pyObj=args, key='bulkInventory', optionalKey=True)
+    #Prefetch mode
+    prefetch = assertValue(pyObj=args, key='prefetch', optionalKey=True)
+    #number of volume workers
+    _volumeWorkers = assertValue(pyObj=args, key='volumeWorkers', optionalKey=True)
+    if _volumeWorkers != None:
+        volumeWorkers = capWorkers(_volumeWorkers, '-volWorkers')
+    #Incremental mode
+    incremental = assertValue(pyObj=args, key='incremental', optionalKey=True)
+    if incremental and not bulkInventory:
+        parser.error("-incr requires -bulk, the changes are detected from the inventory of the CPC")
+    #Stream mode
+    stream = assertValue(pyObj=args, key='stream', optionalKey=True)
+    #Resume mode
+    resume = assertValue(pyObj=args, key='resume', optionalKey=True)
+    #Backup file format and compression
+    _fileFormat = assertValue(pyObj=args, key='format', optionalKey=True)
+    if _fileFormat != None:
+        fileFormat = _fileFormat
+    compression = assertValue(pyObj=args, key='compress', optionalKey=True)
 
 # ------------------------------------------------------------------ #
 # --------- End of parseArgs function ------------------------------ #
@@ -72,39 +146,65 @@ def printParams():
         currentPath = os.getcwd()
         backupDir = currentPath
         print("\tBackup Directory --> %s"%currentPath)
+    if bulkInventory:
+        print("\tBulk inventory mode")
+    if prefetch:
+        print("\tPrefetch mode")
+    if incremental:
+        print("\tIncremental mode")
+    if stream:
+        print("\tStream mode")
+    if resume:
+        print("\tResume mode")
+    if fileFormat != 'cfg':
+        print("\tBackup file format\t%s%s" % (fileFormat, compression and ' (%s)' % compression or ''))
+    print("\tVolume workers\t%s"%volumeWorkers)
 
 # ------------------------------------------------------------------ #
 # --------- End of printParams function ---------------------------- #
 # ------------------------------------------------------------------ #
 
 
-# Start main from here
-hmc = None
-# configuration for all Storage Groups on specified CPC
-bakSGsConfig = dict()
-
-try:
-    parseArgs()
-    
-    print "*****************************************************"
-    print "Back up all Storage Groups on specified CPC"
-    printParams()
-    print "*****************************************************"
-    # initiate hmc connection 
-    hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password)
-    cpc = selectCPC(hmc, cpcName)
-    cpcURI = assertValue(pyObj=cpc, key=KEY_CPC_URI)
-    cpcName = assertValue(pyObj=cpc, key=KEY_CPC_NAME)
-    
-    sgURIListByCPC = []
-    sgNameListByCPC = []
-    sgList = getStorageGroupList(hmc)
+# ------------------------------------------------------------------ #
+# --------- Start of addFetchRules function ------------------------ #
+# ------------------------------------------------------------------ #
+def addFetchRules(plan, sgURIs):
+    '''
+    - add the storage groups and their volumes, which are read by the backup,
+    - to the fetch plan
+    '''
+    plan.addRoots(sgURIs, STORAGE_GROUP_PROPERTIES)
+    plan.addRule('storage-group', 'storage-volume-uris', STORAGE_VOLUME_PROPERTIES)
+
+# ------------------------------------------------------------------ #
+# --------- End of addFetchRules function -------------------------- #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of collectStorageGroupsConfig function ----------- #
+# ------------------------------------------------------------------ #
+def collectStorageGroupsConfig(inventory, sgList, writer=None, numVolumeWorkers=None, written=None,
+                               collected=None):
+    '''
+    - collect configs of all storage groups in sgList, properties of all
+    - objects are read from the inventory of the CPC. The volumes of a storage
+    - group are fetched concurrently, at most numVolumeWorkers at the same time
+    - (None for no limit). If writer is given, every storage group is written
+    - by it as soon as it is collected, and its configs are not kept. collected
+    - is called as collected(<storage group name>, <storage group URI>) before a
+    - storage group is written, its result (the snapshot index entry of the
+    - storage group) is written with the storage group. written is called the
+    - same way after a storage group has been written (e.g. to drop its objects
+    - from the inventory)
+    - return {<storage group name>: <storage group backup configs>}, configs are
+    - None if they have been written by writer
+    '''
+    # configuration for all Storage Groups on specified CPC
+    bakSGsConfig = dict()
+
     for sg in sgList:
-        if sg['cpc-uri'] == cpcURI:
-            sgURIListByCPC.append(sg['object-uri'])
-            sgNameListByCPC.append(sg['name'])
-    
-    for sgName in sgNameListByCPC:
+        sgName = sg['name']
         # Dict to store configuration data for single storage group
         bakSGCfg = {'sgDesc':None, #storage group description
                     'storType':None, #storage type eg: fcp or ficon
@@ -114,8 +214,8 @@ try:
                     'sgStorVolsCfg':None, # an array to store storage volumes config in current SG.
                     }
         
-        sgURI = sgURIListByCPC[sgNameListByCPC.index(sgName)]
-        sgProps = getStorageGroupProperties(hmc, sgURI=sgURI)
+        sgURI = sg['object-uri']
+        sgProps = inventory.getObject(sgURI, properties=STORAGE_GROUP_PROPERTIES)
         sgStorType = assertValue(pyObj=sgProps, key='type')
 
         bakSGCfg['sgDesc'] = assertValue(pyObj=sgProps, key='description')
@@ -127,8 +227,10 @@ try:
             bakSGCfg['maxNumOfPars'] = assertValue(pyObj=sgProps, key='max-partitions')
         
         sgStorVolsCfg = []
-        sgStorVolURIDict = getStorVolListOfSG(hmc, sgURI)
-        sgStorVolURIList = sgStorVolURIDict['storage-volumes']
+        sgStorVolURIList = inventory.getElements(sgURI, 'storage-volume',
+                                                properties=STORAGE_VOLUME_PROPERTIES,
+                                                filters=sgStorType == 'fc' and FICON_VOLUME_FILTERS or None,
+                                                maxConcurrent=numVolumeWorkers)
         
 
         
@@ -143,7 +245,7 @@ try:
                          'storVolECKDtype':None # for FICON only
                          }
             sgStorVolURI = sgStorVolDict['element-uri']
-            sgStorVolProp = getStorVolProperties(hmc, sgStorVolURI)
+            sgStorVolProp = inventory.getObject(sgStorVolURI, properties=STORAGE_VOLUME_PROPERTIES)
             #bakStorVolCfg['storVolName'] = assertValue(pyObj=sgStorVolProp, key='name')
             bakStorVolCfg['storVolDesc'] = assertValue(pyObj=sgStorVolProp, key='description')
             bakStorVolCfg['storVolUse'] = assertValue(pyObj=sgStorVolProp, key='usage')
@@ -164,60 +266,266 @@ try:
         bakSGCfg['sgStorVolsCfg'] = sgStorVolsCfg
 
         print "[%s] -> %s storage group backup is Done." % (sgName, sgStorType)
+        if writer != None:
+            writer.write(sgName, storageGroupConfigItems(bakSGCfg), snapshot=collected and collected(sgName, sgURI))
+            bakSGCfg = None
+            if written != None:
+                written(sgName, sgURI)
         bakSGsConfig[sgName] = bakSGCfg
-                 
+    return bakSGsConfig
+
+# ------------------------------------------------------------------ #
+# --------- End of collectStorageGroupsConfig function ------------- #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of storageGroupConfigItems function -------------- #
+# ------------------------------------------------------------------ #
+def storageGroupConfigItems(bakSGCfg):
+    '''
+    - return the (key, value) items of a storage group backup config in the
+    - order they are set into the config file, value is None for comment lines
+    '''
+    items = []
+    for key2 in sorted(bakSGCfg.keys()):
+        if bakSGCfg[key2] != None:
+            if "sgDesc" in key2:
+                items.append(('#Storage Group Description', None))
+                items.append((key2, bakSGCfg[key2]))
+            elif "storType" in key2:
+                items.append(('#Storage Group Type', None))
+                items.append((key2, bakSGCfg[key2]))
+            elif "sgShared" in key2:
+                items.append(('#Storage Group shared or not', None))
+                items.append((key2, bakSGCfg[key2]))
+            elif "numOfPaths" in key2:
+                items.append(('#Number of paths or adapters', None))
+                items.append((key2, bakSGCfg[key2]))
+            elif "maxNumOfPars" in key2:
+                items.append(('#Maximum number of partitions', None))
+                items.append((key2, bakSGCfg[key2]))
+            elif "sgStorVolsCfg" in key2:
+                items.append(('#Storage volume configs', None))
+                items.append((key2, bakSGCfg[key2]))
+    return items
+
+# ------------------------------------------------------------------ #
+# --------- End of storageGroupConfigItems function ---------------- #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of storageGroupsFilePath function ---------------- #
+# ------------------------------------------------------------------ #
+def storageGroupsFilePath(bakDir, cpcName, delta=False, extension='.cfg'):
+    '''
+    - return the path of a new storage group backup file in bakDir (created
+    - if missing), of a delta file if delta is True
+    '''
+    if os.path.exists(bakDir) is False:
+        os.makedirs(bakDir)
+    return bakDir + '/' + cpcName + (delta and '-StorGroups-Delta-' or '-StorGroups-') + time.strftime("%Y%m%d-%H%M%S", time.localtime()) + extension
+
+# ------------------------------------------------------------------ #
+# --------- End of storageGroupsFilePath function ------------------ #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of checkpointFilePath function ------------------- #
+# ------------------------------------------------------------------ #
+def checkpointFilePath(bakDir, cpcName, delta=False):
+    '''
+    - return the path of the checkpoint journal of the storage group backup
+    - in bakDir (created if missing), of the delta backup if delta is True
+    '''
+    if os.path.exists(bakDir) is False:
+        os.makedirs(bakDir)
+    return bakDir + '/' + cpcName + (delta and '-StorGroups-Delta-' or '-StorGroups-') + 'Checkpoint.jsonl'
+
+# ------------------------------------------------------------------ #
+# --------- End of checkpointFilePath function --------------------- #
+# ------------------------------------------------------------------ #
+
+
+# ------------------------------------------------------------------ #
+# --------- Start of writeStorageGroupsConfig function ------------- #
+# ------------------------------------------------------------------ #
+def writeStorageGroupsConfig(bakSGsConfig, bakDir, cpcName, delta=False, writer=None, fileFormat='cfg', compression=None):
+    '''
+    - write the storage group backup configs into a config file in bakDir,
+    - a delta file if delta is True. If the configs have been written by
+    - writer, the config file is generated from its records file. If
+    - fileFormat is 'json', a structured backup file is written instead of
+    - the config file
+    - return the path of the file
+    '''
+    if fileFormat == 'json':
+        filePath = storageGroupsFilePath(bakDir, cpcName, delta, extension=backupFileExtension(compression))
+        if writer != None:
+            writer.close()
+            sections = ((name, configSection(BACKUP_STORAGE_GROUPS, items))
+                        for name, items in readSortedRecords(writer.filePath))
+        else:
+            sections = ((name, configSection(BACKUP_STORAGE_GROUPS, storageGroupConfigItems(bakSGsConfig[name])))
+                        for name in sorted(bakSGsConfig.keys()))
+        writeBackupFile(filePath, [(cpcName, [(BACKUP_STORAGE_GROUPS, sections)])])
+        return filePath
+
+    if writer != None:
+        writer.close()
+        filePath = storageGroupsFilePath(bakDir, cpcName, delta)
+        writeRecordsConfig(writer.filePath, filePath)
+        return filePath
+
     # Generate backup config file 
     sgConfig = ConfigParser.ConfigParser(allow_no_value=True)
     for key1 in sorted(bakSGsConfig.keys()):
         sgConfig.add_section(key1)
-        for key2 in sorted(bakSGsConfig[key1].keys()):
-            if bakSGsConfig[key1][key2] != None:
-                if "sgDesc" in key2:
-                    sgConfig.set(key1, '#Storage Group Description')
-                    sgConfig.set(key1, key2 ,bakSGsConfig[key1][key2])
-                elif "storType" in key2:
-                    sgConfig.set(key1, '#Storage Group Type')
-                    sgConfig.set(key1, key2 ,bakSGsConfig[key1][key2])
-                elif "sgShared" in key2:
-                    sgConfig.set(key1, '#Storage Group shared or not')
-                    sgConfig.set(key1, key2 ,bakSGsConfig[key1][key2])
-                elif "numOfPaths" in key2:
-                    sgConfig.set(key1, '#Number of paths or adapters')
-                    sgConfig.set(key1, key2 ,bakSGsConfig[key1][key2])
-                elif "maxNumOfPars" in key2:
-                    sgConfig.set(key1, '#Maximum number of partitions')
-                    sgConfig.set(key1, key2 ,bakSGsConfig[key1][key2])
-                elif "sgStorVolsCfg" in key2:
-                    sgConfig.set(key1, '#Storage volume configs')
-                    sgConfig.set(key1, key2 ,bakSGsConfig[key1][key2])
-
-    if os.path.exists(backupDir) is False:
-        os.makedirs(backupDir)
-    
+        for key, value in storageGroupConfigItems(bakSGsConfig[key1]):
+            sgConfig.set(key1, key, value)
+
     # Write backup configs into a file
-    filePath = backupDir + '/' + cpcName + '-StorGroups-' + time.strftime("%Y%m%d-%H%M%S", time.localtime()) + '.cfg'
+    filePath = storageGroupsFilePath(bakDir, cpcName, delta)
 
     with open(filePath, 'wb') as configfile:
         sgConfig.write(configfile)
-    
-    if sgConfig :
-        print "\nAbove %s Storage-Groups on %s were saved into below file successfully."%(len(sgNameListByCPC),cpcName)
-        print "%s"%filePath
-    else:
-        print "\nStorage Group backup failed, please check the environment manually."
-    
-except Exception as exc:
-    if exc.message != None:
-        print exc.message
-  
-finally:
-    # cleanup
-    if hmc != None:
-        hmc.logoff()    
-    
-    
-    
-
-
-    
-    
\ No newline at end of file
+    return filePath
+
+# ------------------------------------------------------------------ #
+# --------- End of writeStorageGroupsConfig function --------------- #
+# ------------------------------------------------------------------ #
+
+
+# Start main from here
+if __name__ == '__main__':
+    hmc = None
+    writer = None
+
+    try:
+        parseArgs()
+
+        print "*****************************************************"
+        print "Back up all Storage Groups on specified CPC"
+        printParams()
+        print "*****************************************************"
+        # initiate hmc connection 
+        hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password, poolSize=volumeWorkers)
+        # objects referenced several times are fetched from HMC once
+        hmc.enableObjectCache()
+        cpc = selectCPC(hmc, cpcName)
+        cpcURI = assertValue(pyObj=cpc, key=KEY_CPC_URI)
+        cpcName = assertValue(pyObj=cpc, key=KEY_CPC_NAME)
+
+        # Properties of all objects are read from the inventory of the CPC
+        inventory = collectCPCInventory(hmc, cpcURI, bulk=bulkInventory)
+
+        sgList = getStorageGroupList(hmc, cpcURI=cpcURI)
+
+        # Snapshot index of the storage group backups of this CPC
+        snapshot = HMCSnapshot(os.path.join(backupDir, cpcName + '-StorGroups-Snapshot.json'))
+        if incremental and not snapshot.load():
+            print "No snapshot index of a full backup in %s, taking a full backup." % backupDir
+            incremental = False
+        # the changes are detected from the objects loaded by the inventory service, an
+        # incremental backup does not fetch every object from HMC one by one
+        if incremental and len(inventory.loadedClasses) == 0:
+            raise Exception("The inventory service is not available on this HMC, run a full backup without -incr.")
+
+        # The rules of the objects read by the backup, a section is changed if any of them has changed
+        roots = [(sg['name'], sg['object-uri']) for sg in sgList]
+        plan = HMCFetchPlan(inventory)
+        addFetchRules(plan, [sgURI for (sgName, sgURI) in roots])
+
+        # Fetch storage groups and their volumes in advance, the backup is assembled from memory then.
+        # An incremental backup compares the volumes of the storage groups, they have been loaded
+        # by the inventory service, the missing ones are fetched
+        if prefetch or incremental:
+            plan.execute()
+            print "Prefetched %s" % plan.getSummary()
+
+        removedSGNames = []
+        if incremental:
+            changedSGNames = snapshot.getChanged(plan, roots, STORAGE_GROUP_PROPERTIES)
+            removedSGNames = snapshot.getRemoved([sgName for (sgName, sgURI) in roots])
+            print "%s of %s storage groups changed or new since the last backup, %s removed." % (len(changedSGNames),
+                                                                                               len(roots),
+                                                                                               len(removedSGNames))
+            sgList = [sg for sg in sgList if sg['name'] in changedSGNames]
+
+        # Storage groups are appended to the checkpoint journal as soon as they are collected,
+        # a resumed backup skips the storage groups journaled by the interrupted one
+        writer = HMCRecordWriter(checkpointFilePath(backupDir, cpcName, delta=incremental))
+        completedSGList = []
+        if resume:
+            records = writer.readAll()
+            journaledSGNames = set([record['section'] for record in records])
+            # the fingerprints of the journaled storage groups are the ones written with them
+            snapshot.resume(records)
+            records = None
+            completedSGList = [sg for sg in sgList if sg['name'] in journaledSGNames]
+            sgList = [sg for sg in sgList if sg['name'] not in journaledSGNames]
+            print "Resuming from %s, %s storage groups were backed up already, %s remaining." % (writer.filePath,
+                                                                                               len(completedSGList),
+                                                                                               len(sgList))
+        else:
+            writer.discard()
+
+        # The fingerprints of a storage group are journaled with it. The objects of a written
+        # storage group are not read again, it is dropped from the inventory with its volumes
+        def collectStorageGroup(sgName, sgURI):
+            return snapshot.collect(plan, sgName, sgURI, STORAGE_GROUP_PROPERTIES)
+
+        def dropStorageGroup(sgName, sgURI):
+            inventory.remove(sgURI)
+
+        bakSGsConfig = collectStorageGroupsConfig(inventory, sgList, writer=writer, numVolumeWorkers=volumeWorkers,
+                                                  written=dropStorageGroup, collected=collectStorageGroup)
+        backedUpSGList = sgList + completedSGList
+
+        if incremental:
+            filePath = None
+            if len(backedUpSGList) != 0:
+                filePath = writeStorageGroupsConfig(bakSGsConfig, backupDir, cpcName, delta=True, writer=writer,
+                                                    fileFormat=fileFormat, compression=compression)
+            if filePath or removedSGNames:
+                snapshot.addDelta(filePath, removedSGNames)
+        else:
+            filePath = writeStorageGroupsConfig(bakSGsConfig, backupDir, cpcName, writer=writer,
+                                                fileFormat=fileFormat, compression=compression)
+            snapshot.setBase(filePath)
+        snapshot.update([(sg['name'], sg['object-uri']) for sg in backedUpSGList], removed=removedSGNames)
+        snapshot.save()
+
+        # the records file is kept next to the backup file in stream mode
+        if stream and filePath:
+            extension = fileFormat == 'json' and backupFileExtension(compression) or '.cfg'
+            writer.moveTo(filePath[:-len(extension)] + '.jsonl')
+            print "Storage groups were written into %s" % writer.filePath
+        else:
+            writer.discard()
+        writer = None
+
+        if incremental and filePath == None:
+            print "\nNo storage group has changed since the last backup, the snapshot index was updated."
+            print "%s"%snapshot.path
+        elif filePath :
+            print "\nAbove %s Storage-Groups on %s were saved into below file successfully."%(len(backedUpSGList),cpcName)
+            print "%s"%filePath
+        else:
+            print "\nStorage Group backup failed, please check the environment manually."
+
+    except Exception as exc:
+        if exc.message != None:
+            print exc.message
+        # the storage groups backed up so far are kept in the checkpoint journal
+        if writer != None and os.path.exists(writer.filePath):
+            writer.close()
+            print "\nThe storage groups backed up so far were kept in %s," % writer.filePath
+            print "run the backup again with -resume to continue from there."
+
+    finally:
+        # cleanup
+        if hmc != None:
+            hmc.logoff()
@@ -3,6 +3,10 @@ Created on Mar 30, 2018
 
 This script intends to restore the storage groups based on the config file which been generated before.
 The storage groups include the FCP and FICON storage groups.
+Every created storage group is recorded with its URI in a journal next to the config file. A restore
+interrupted by a session expiry or a network failure is continued by running it again with --resume:
+the recorded storage groups are skipped without querying the HMC for them. The journal is removed once
+all storage groups have been created.
 
 @author: mayijie
 '''
@@ -11,6 +15,10 @@ from CommonAPI.prsm2api import *
 from CommonAPI.wsaconst import *
 from CommonAPI.hmcUtils import *
 from CommonAPI.readConfig import *
+from CommonAPI.hmcExecutor import *
+from CommonAPI.hmcSnapshot import *
+from CommonAPI.hmcRecords import *
+from CommonAPI.hmcBackupFile import *
 import argparse, ConfigParser, threading
 
 hmc = None
@@ -22,19 +30,22 @@ userId = None
 password = None
 configFile = None
 emailList = None
+# number of storage groups restored at the same time
+workers = DEFAULT_WORKERS
+# skip the storage groups recorded in the journal of an interrupted restore
+resume = False
+# journal of the created storage groups
+journal = None
 createPass = list()
 createFail = list()
 sectionDict = dict()
 
-# for multi-thread write protection
-lock = threading.Lock()
-
 # ------------------------------------------------------------------ #
 # ----- Start of parseArgs function -------------------------------- #
 # ------------------------------------------------------------------ #
 def parseArgs():
     print ">>> parsing the input parameters..."
-    global hmcHost, cpcName, userId, password, configFile, emailList
+    global hmcHost, cpcName, userId, password, configFile, emailList, workers, resume
 
     parser = argparse.ArgumentParser(description='restore the storage groups by configure file')
     parser.add_argument('-hmc', '--hmcHost', metavar='<HMC host IP>', help='HMC host IP', required=True)
@@ -43,6 +54,11 @@ def parseArgs():
     parser.add_argument('-psw', '--password', metavar='<password>', help='password', required=True)
     parser.add_argument('-config', '--configFile', metavar='<configure file name>', help='indicate configure file name / location', required=True)
     parser.add_argument('-email', '--emailList', metavar='<storage admin email address list>', help='split the email addresses with comma', required=True)
+    parser.add_argument('-workers', '--workers', metavar='<number of workers>', type=workerCount,
+                        help='number of storage groups restored at the same time', required=False)
+    parser.add_argument('-resume', '--resume', action='store_true',
+                        help='continue an interrupted restore, the storage groups recorded in its journal '
+                             'are skipped', required=False)
 
     args = vars(parser.parse_args())
     #hmc host
@@ -63,6 +79,12 @@ def parseArgs():
     #storage admin email list
     _emailList = assertValue(pyObj=args, key='emailList', listIndex=0, optionalKey=True)
     emailList = checkValue('emailList', _emailList , emailList)
+    #number of workers
+    _workers = assertValue(pyObj=args, key='workers', optionalKey=True)
+    if _workers != None:
+        workers = capWorkers(_workers)
+    #resume mode
+    resume = assertValue(pyObj=args, key='resume', optionalKey=True)
 
 
 # ------------------------------------------------------------------ #
@@ -83,6 +105,18 @@ def loadConfig(configFile):
             raise exc
         if '/' not in configFile:
             configFile = os.path.join(sys.path[0], configFile)
+        if isBackupFile(configFile):
+            # structured backup file, may hold several CPCs
+            sectionDict.update(loadBackupSections(configFile, kind=BACKUP_STORAGE_GROUPS, cpcName=cpcName))
+            return
+        if configFile.endswith('.json'):
+            # snapshot index of incremental backups, full backup file with deltas applied
+            sectionDict.update(loadSnapshotConfig(configFile))
+            return
+        if configFile.endswith('.jsonl'):
+            # records file of a backup in stream mode, e.g. of an interrupted backup
+            sectionDict.update(loadRecordsConfig(configFile))
+            return
         config = ConfigParser.RawConfigParser()
         config.readfp(open(configFile))
 
@@ -102,27 +136,56 @@ def loadConfig(configFile):
 # ----- End of loadConfig function --------------------------------- #
 # ------------------------------------------------------------------ #
 
+# ------------------------------------------------------------------ #
+# ----- Start of openJournal function ------------------------------ #
+# ------------------------------------------------------------------ #
+def openJournal(configFile, cpcName):
+    '''
+    - open the journal of the restore, next to the config file. The storage
+    - groups recorded by an interrupted restore of the same config file and
+    - CPC are loaded if resumed, otherwise the journal is started again
+    '''
+    if '/' not in configFile:
+        configFile = os.path.join(sys.path[0], configFile)
+    journalPath = os.path.join(os.path.dirname(os.path.abspath(configFile)),
+                               "%s-StorGroups-Restore-Journal.jsonl" %cpcName)
+    restoreJournal = HMCStepJournal(journalPath, header={'config': os.path.basename(configFile),
+                                                         'cpc': cpcName})
+    if resume:
+        count = restoreJournal.load()
+        if count == None:
+            print ">>> The journal %s belongs to another restore, it is started again" %journalPath
+        else:
+            print ">>> %s created storage group(s) read from the journal %s" %(count, journalPath)
+    else:
+        restoreJournal.discard()
+    return restoreJournal
+
+# ------------------------------------------------------------------ #
+# ----- End of openJournal function -------------------------------- #
+# ------------------------------------------------------------------ #
+
 # ------------------------------------------------------------------ #
 # ----- Start of procSingleStorageGroup function ------------------- #
 # ------------------------------------------------------------------ #
 def procSingleStorageGroup(sgName):
+    '''
+    - restore single storage group, runs concurrently with other storage groups
+    - return True if the storage group has been created
+    '''
     global sectionDict
     try:
-        if lock.acquire():
-            sgDict = sectionDict[sgName]
-            sgTemp = constructSgTemplate(sgName, sgDict)
-            if sgTemp == None:
-                print ">>> Create storage group template failed!!!", sgName
-            lock.release()
-        if lock.acquire():
-            sgRet = createStorageGroup(hmc, sgTemp)
-            createPass.append(sgName)
-            lock.release()
+        sgDict = sectionDict[sgName]
+        sgTemp = constructSgTemplate(sgName, sgDict)
+        if sgTemp == None:
+            print ">>> Create storage group template failed!!!", sgName
+            return False
+        sgUri = createStorageGroup(hmc, sgTemp)
+        journal.record((sgName, 'create'), sgUri)
+        return True
     except Exception as exc:
         print ">>> Create storage group failed!!!", sgName
-
-        createFail.append(sgName)
-        lock.release()
+        return False
 
 # ------------------------------------------------------------------ #
 # ----- End of procSingleStorageGroup function --------------------- #
@@ -151,7 +214,7 @@ def constructSgTemplate(sgName, sgDict):
             sgTempl['max-partitions'] = int(sgDict['maxnumofpars'])
 
         sgTempl['connectivity'] = int(sgDict['numofpaths'])
-        svsTempl = constructSvTemplate(sgName, eval(sgDict['sgstorvolscfg']))
+        svsTempl = constructSvTemplate(sgName, parseConfigValue(sgDict['sgstorvolscfg']))
         sgTempl['storage-volumes'] = svsTempl
         sgTempl['email-to-addresses'] = emailList.split(',')
     except  Exception as exc:
@@ -203,7 +266,7 @@ try:
 
     # Access HMC system and create HMC connection
     print ">>> Creating HMC connection..."
-    hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password)
+    hmc = createHMCConnection(hmcHost=hmcHost, userID=userId, userPassword=password, poolSize=workers)
     cpc = selectCPC(hmc, cpcName)
     cpcURI = assertValue(pyObj=cpc, key=KEY_CPC_URI)
     cpcName = assertValue(pyObj=cpc, key=KEY_CPC_NAME)
@@ -213,14 +276,29 @@ try:
     cpcID = cpcURI.replace('/api/cpcs/','')
     print ">>> HMC connection created!"
 
-    threads = []
-    for sgName in sectionDict.keys():
-        t = threading.Thread(target=procSingleStorageGroup, args=(sgName,))
+    journal = openJournal(configFile, cpcName)
+    sgNames = sorted(sectionDict.keys())
+    completed = journal.completed([(sgName, 'create') for sgName in sgNames])
+    for sgName in sgNames:
+        if (sgName, 'create') in completed:
+            print ">>> Storage Group %s has been created by the interrupted restore: %s" %(sgName, completed[(sgName, 'create')])
+            createPass.append(sgName)
+            continue
         print ">>> Constructing Storage Group: " + sgName + "..."
-        t.start()
-        threads.append(t)
-    for t in threads:
-        t.join()
+    sgNames = [sgName for sgName in sgNames if (sgName, 'create') not in completed]
+    # storage groups are restored by a pool of workers sharing the HMC connection
+    executor = HMCTaskExecutor(numWorkers=workers)
+    results = executor.map(procSingleStorageGroup, sgNames, cpcURI=cpcURI)
+    for result in results:
+        if result.succeeded():
+            createPass.append(result.item)
+        else:
+            createFail.append(result.item)
+    print ">>> " + executor.getSummary(results, 'storage group')
+    if len(createFail) == 0:
+        journal.discard()
+    else:
+        print ">>> The created storage groups are recorded in %s, run the restore again with --resume to continue" %journal.filePath
 
 except IOError as exc:
     print ">>> Configure file read error!"
@@ -228,6 +306,8 @@ except Exception as exc:
     print exc.message
 
 finally:
+    if journal != None:
+        journal.close()
     if hmc != None:
         hmc.logoff()
     if (len(createPass) != 0):
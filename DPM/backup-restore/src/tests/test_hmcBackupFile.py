@@ -0,0 +1,63 @@
+'''
+Tests of the structured backup file written from the records of a
+backup in stream mode, without HMC.
+
+Run from the src directory:
+    python -m unittest discover -s tests
+'''
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CommonAPI.prsm2api import *
+from CommonAPI.hmcBackupFile import *
+from CommonAPI.hmcRecords import *
+
+
+class ConfigSectionTest(unittest.TestCase):
+
+    def testSchemaValuesAreParsed(self):
+        section = configSection(BACKUP_PARTITIONS, [('#partition', None), ('par_desc', 'linux'),
+                                                    ('sgDevNum', "['SG1:0100']"), ('init_mem', 4096)])
+        self.assertEqual(section, {'par_desc': 'linux', 'sgdevnum': ['SG1:0100'], 'init_mem': '4096'})
+
+    def testNonASCIIValueIsKept(self):
+        section = configSection(BACKUP_PARTITIONS, [(u'par_desc', u'caf\xe9')])
+        self.assertEqual(section, {u'par_desc': u'caf\xe9'})
+
+
+class BackupFileRecordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def testNonASCIIRecordsAreWritten(self):
+        writer = HMCRecordWriter(os.path.join(self.tmpDir, 'CPC1-Partitions-Checkpoint.jsonl'))
+        writer.write('PAR1', [('#partition', None), ('par_desc', u'caf\xe9'),
+                              ('vNIC1_desc', 'na\xc3\xafve'), ('sgDevNum', [u'SG1:0100'])])
+        writer.close()
+        filePath = os.path.join(self.tmpDir, 'CPC1-Partitions.backup.json')
+        sections = ((name, configSection(BACKUP_PARTITIONS, items))
+                    for name, items in readSortedRecords(writer.filePath))
+        self.assertEqual(writeBackupFile(filePath, [('CPC1', [(BACKUP_PARTITIONS, sections)])]), 1)
+        section = loadBackupSections(filePath, kind=BACKUP_PARTITIONS)['PAR1']
+        self.assertEqual(section['par_desc'], u'caf\xe9')
+        self.assertEqual(section['vnic1_desc'], u'na\xefve')
+        self.assertEqual(section['sgdevnum'], [u'SG1:0100'])
+
+        # the config file generated from the same records holds UTF-8
+        configPath = os.path.join(self.tmpDir, 'CPC1-Partitions.cfg')
+        writeRecordsConfig(writer.filePath, configPath)
+        self.assertEqual(loadBackupSections(configPath)['PAR1']['par_desc'], 'caf\xc3\xa9')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+'''
+Tests of HMCTaskExecutor and HMCTaskScheduler, without HMC.
+
+Run from the src directory:
+    python -m unittest discover -s tests
+'''
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CommonAPI.prsm2api import *
+from CommonAPI.hmcExecutor import *
+from CommonAPI.hmcAsync import HMCFuture
+
+
+class ConcurrencyProbe:
+    '''
+      - Task function recording the max number of calls running at the
+      - same time
+    '''
+    def __init__(self, duration=0.05):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.running = 0
+        self.maxRunning = 0
+
+    def __call__(self, item):
+        with self.lock:
+            self.running += 1
+            self.maxRunning = max(self.maxRunning, self.running)
+        time.sleep(self.duration)
+        with self.lock:
+            self.running -= 1
+        return item
+
+
+def completeLater(value=None, exc=None, delay=0.1):
+    # returns a future completed by another thread
+    future = HMCFuture('test')
+    timer = threading.Timer(delay, future.setResult, kwargs={'value': value, 'exc': exc})
+    timer.daemon = True
+    timer.start()
+    return future
+
+
+class HMCTaskExecutorTest(unittest.TestCase):
+
+    def testResultsInSubmissionOrder(self):
+        def task(item):
+            if item == 2:
+                raise HMCException("task", "failed")
+            return item * 10
+        results = HMCTaskExecutor(numWorkers=3).map(task, range(5))
+        self.assertEqual([result.item for result in results], range(5))
+        self.assertEqual([result.value for result in results], [0, 10, None, 30, 40])
+        self.assertTrue(isinstance(results[2].exc, HMCException))
+
+    def testFalseCountsAsFailure(self):
+        executor = HMCTaskExecutor(numWorkers=2)
+        results = executor.map(lambda item: item != 'b', ['a', 'b', 'c'])
+        self.assertEqual([result.succeeded() for result in results], [True, False, True])
+        self.assertTrue("2 succeeded, 1 failed" in executor.getSummary(results))
+
+    def testTasksPerCPCAreCapped(self):
+        probe = ConcurrencyProbe()
+        HMCTaskExecutor(numWorkers=6, maxPerCPC=2).map(probe, range(12), cpcURI='/api/cpcs/capped')
+        self.assertEqual(probe.maxRunning, 2)
+
+    def testCapIsSharedByExecutors(self):
+        probe = ConcurrencyProbe()
+        cpcURI = '/api/cpcs/shared'
+        threads = [threading.Thread(target=HMCTaskExecutor(numWorkers=3, maxPerCPC=2).map,
+                                    args=(probe, range(6)), kwargs={'cpcURI': cpcURI}) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(probe.maxRunning, 2)
+
+    def testOtherCPCsAreNotCapped(self):
+        probe = ConcurrencyProbe()
+        HMCTaskExecutor(numWorkers=4, maxPerCPC=1).map(probe, range(8))
+        self.assertEqual(probe.maxRunning, 4)
+
+
+class HMCTaskSchedulerTest(unittest.TestCase):
+
+    def testDependencyValuesArePassed(self):
+        scheduler = HMCTaskScheduler(numWorkers=2)
+        scheduler.add('sg', lambda: 'SG1')
+        scheduler.add('par', lambda: 'PAR1')
+        scheduler.add('attach', lambda par, sg: '%s:%s' % (par, sg), ['par', 'sg'])
+        results = scheduler.run()
+        self.assertEqual(results['attach'].value, 'PAR1:SG1')
+
+    def testFailureSkipsDependents(self):
+        def fail():
+            raise HMCException("task", "failed")
+        scheduler = HMCTaskScheduler(numWorkers=2)
+        scheduler.add('create', fail)
+        scheduler.add('attach', lambda value: value, ['create'])
+        scheduler.add('start', lambda value: value, ['attach'])
+        scheduler.add('other', lambda: 'done')
+        results = scheduler.run()
+        self.assertEqual(results['create'].exc.message, "failed")
+        for key in ['attach', 'start']:
+            self.assertFalse(results[key].succeeded())
+            self.assertTrue(isinstance(results[key].exc, HMCException))
+        self.assertTrue("attach was not run" in results['start'].exc.message)
+        self.assertEqual(results['other'].value, 'done')
+
+    def testFalseSkipsDependents(self):
+        called = []
+        scheduler = HMCTaskScheduler(numWorkers=1)
+        scheduler.add('check', lambda: False)
+        scheduler.add('next', lambda value: called.append(value), ['check'])
+        results = scheduler.run()
+        self.assertFalse(results['check'].succeeded())
+        self.assertFalse(results['next'].succeeded())
+        self.assertEqual(called, [])
+
+    def testUnknownDependencyAndCycleAreSkipped(self):
+        scheduler = HMCTaskScheduler(numWorkers=2)
+        scheduler.add('orphan', lambda value: value, ['missing'])
+        scheduler.add('a', lambda value: value, ['b'])
+        scheduler.add('b', lambda value: value, ['a'])
+        results = scheduler.run()
+        self.assertTrue("unknown dependencies" in results['orphan'].exc.message)
+        self.assertTrue("dependency cycle" in results['a'].exc.message)
+        self.assertTrue("a was not run" in results['b'].exc.message)
+
+    def testFutureDoesNotHoldWorker(self):
+        order = []
+        scheduler = HMCTaskScheduler(numWorkers=1)
+        scheduler.add('fulfill', lambda: completeLater(value='fulfilled'))
+        scheduler.add('other', lambda: order.append('other'))
+        scheduler.add('attach', lambda value: order.append(value), ['fulfill'])
+        results = scheduler.run()
+        self.assertEqual(results['fulfill'].value, 'fulfilled')
+        # the single worker ran the other task while the future was pending
+        self.assertEqual(order, ['other', 'fulfilled'])
+
+    def testFailedFutureSkipsDependents(self):
+        scheduler = HMCTaskScheduler(numWorkers=1)
+        scheduler.add('fulfill', lambda: completeLater(exc=HMCException("fulfill", "timed out")))
+        scheduler.add('attach', lambda value: value, ['fulfill'])
+        results = scheduler.run()
+        self.assertEqual(results['fulfill'].exc.message, "timed out")
+        self.assertFalse(results['attach'].succeeded())
+
+    def testCompletedTasksAreNotRun(self):
+        called = []
+        scheduler = HMCTaskScheduler(numWorkers=2)
+        scheduler.add('lookup', lambda: called.append('lookup') or 'adapter')
+        scheduler.add('create', lambda adapter: called.append('create'), ['lookup'])
+        scheduler.add('start', lambda uri: called.append(uri), ['create'])
+        results = scheduler.run(completed={'create': '/api/partitions/p1'})
+        # the lookup is needed by the completed task only
+        self.assertEqual(called, ['/api/partitions/p1'])
+        self.assertEqual(scheduler.resumed, set(['lookup', 'create']))
+        self.assertTrue(results['start'].succeeded())
+
+    def testTasksPerCPCAreCapped(self):
+        probe = ConcurrencyProbe()
+        scheduler = HMCTaskScheduler(numWorkers=6, maxPerCPC=2)
+        for i in range(12):
+            scheduler.add(i, lambda i=i: probe(i))
+        scheduler.run(cpcURI='/api/cpcs/scheduled')
+        self.assertEqual(probe.maxRunning, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+'''
+Tests of HMCNotificationListener driven by HMCStubBroker, without HMC.
+
+Run from the src directory:
+    python -m unittest discover -s tests
+'''
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CommonAPI.hmcNotification import *
+
+# seconds to wait for the listener thread
+WAIT_TIMEOUT = 5
+PARTITION_URI = '/api/partitions/p1'
+
+
+class StubConnection:
+    '''
+      - The attributes of HMCConnection used by the listener
+    '''
+    def __init__(self):
+        self.hmcAPIHost = '127.0.0.1'
+        self.useHttps = False
+        self.userID = 'user'
+        self.userPassword = 'password'
+        self.notificationTopic = 'topic1'
+        self.objectCache = None
+
+
+class StubInventory:
+    '''
+      - Records the updates applied by the listener
+    '''
+    def __init__(self, failing=False):
+        self.updates = []
+        self.failing = failing
+
+    def update(self, uri, changes):
+        if self.failing:
+            raise KeyError(uri)
+        self.updates.append((uri, changes))
+
+    def remove(self, uri):
+        pass
+
+
+def waitFor(condition):
+    deadline = time.time() + WAIT_TIMEOUT
+    while not condition():
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+class HMCNotificationListenerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = HMCStubBroker()
+        self.broker.start()
+        self.hmcConn = StubConnection()
+        self.inventory = StubInventory()
+        self.listener = HMCNotificationListener(self.hmcConn, self.inventory, host='127.0.0.1',
+                                                port=self.broker.port, useSSL=False)
+        self.listener.start()
+        self.assertTrue(waitFor(lambda: len(self.broker.subscriptions) != 0))
+
+    def tearDown(self):
+        self.listener.stop()
+        self.broker.stop()
+
+    def publishChange(self, content, headers=None):
+        self.broker.publish(self.hmcConn.notificationTopic, NOTIFICATION_PROPERTY_CHANGE,
+                            PARTITION_URI, content, headers)
+
+    def testPropertyChangeIsApplied(self):
+        self.publishChange({'change-reports': [{'property-name': 'description', 'new-value': 'changed'}]})
+        self.assertTrue(waitFor(lambda: self.listener.applied == 1))
+        self.assertEqual(self.inventory.updates, [(PARTITION_URI, {'description': 'changed'})])
+        self.assertTrue(self.listener.isSynchronized())
+
+    def testNonDictBodyDesynchronizes(self):
+        self.publishChange(['not', 'a', 'dictionary'])
+        self.assertTrue(waitFor(lambda: not self.listener.isSynchronized()))
+        self.assertIn("not synchronized", self.listener.getSummary())
+        # the listener thread goes on reading
+        self.publishChange({'change-reports': [{'property-name': 'description', 'new-value': 'changed'}]})
+        self.assertTrue(waitFor(lambda: self.listener.received == 2))
+
+    def testBadSequenceNumberDesynchronizes(self):
+        self.publishChange({'change-reports': []}, headers={'session-sequence-nr': 'bad'})
+        self.assertTrue(waitFor(lambda: not self.listener.isSynchronized()))
+
+    def testFailingInventoryDesynchronizes(self):
+        self.inventory.failing = True
+        self.publishChange({'change-reports': [{'property-name': 'description', 'new-value': 'changed'}]})
+        self.assertTrue(waitFor(lambda: not self.listener.isSynchronized()))
+        self.assertEqual(self.listener.applied, 0)
+
+    def testConnectionLossDesynchronizes(self):
+        self.broker.disconnectClients()
+        self.assertTrue(waitFor(lambda: not self.listener.isSynchronized()))
+        self.assertTrue(waitFor(lambda: not self.listener.thread.is_alive()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+'''
+Tests of the records file of a backup and the step journal of a
+restore, without HMC.
+
+Run from the src directory:
+    python -m unittest discover -s tests
+'''
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CommonAPI.prsm2api import *
+from CommonAPI.hmcRecords import *
+
+RESTORE_HEADER = {'config': 'CPC1-Partitions.cfg', 'cpc': 'CPC1'}
+
+
+class HMCRecordWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.filePath = os.path.join(self.tmpDir, 'CPC1-Partitions-Checkpoint.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def testTruncatedLastRecordIsDropped(self):
+        writer = HMCRecordWriter(self.filePath)
+        writer.write('PAR1', [('par_desc', 'first')])
+        writer.write('PAR2', [('par_desc', 'second')])
+        writer.close()
+        completeSize = os.path.getsize(self.filePath)
+        # an interrupted backup left a partial record
+        with open(self.filePath, 'ab') as recordFile:
+            recordFile.write('{"section": "PAR3", "items": [["par_d')
+
+        writer = HMCRecordWriter(self.filePath)
+        self.assertEqual(writer.resume(), set(['PAR1', 'PAR2']))
+        self.assertEqual(os.path.getsize(self.filePath), completeSize)
+        # the following records are appended after the last complete one
+        writer.write('PAR3', [('par_desc', 'third')])
+        writer.close()
+        self.assertEqual([section for offset, section, items in readRecords(self.filePath)],
+                         ['PAR1', 'PAR2', 'PAR3'])
+
+    def testLastRecordOfSectionWins(self):
+        writer = HMCRecordWriter(self.filePath)
+        writer.write('PAR2', [('#partition', None), ('par_desc', 'old')])
+        writer.write('PAR1', [('par_desc', 'other')])
+        writer.write('PAR2', [('#partition', None), ('par_desc', 'new')])
+        writer.close()
+        records = list(readSortedRecords(self.filePath))
+        self.assertEqual([section for section, items in records], ['PAR1', 'PAR2'])
+        self.assertEqual(records[1][1], [['#partition', None], ['par_desc', 'new']])
+        self.assertEqual(loadRecordsConfig(self.filePath)['PAR2'], {'par_desc': 'new'})
+
+    def testMissingFileHasNoRecords(self):
+        self.assertEqual(HMCRecordWriter(self.filePath).resume(), set())
+        self.assertEqual(list(readSortedRecords(self.filePath)), [])
+
+
+class HMCStepJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.filePath = os.path.join(self.tmpDir, 'CPC1-Restore-Journal.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def testStepsAreResumed(self):
+        journal = HMCStepJournal(self.filePath, RESTORE_HEADER)
+        journal.record(('PAR1', 'create'), '/api/partitions/p1')
+        journal.record(('PAR1', 'attach', 'SG1'))
+        journal.close()
+
+        journal = HMCStepJournal(self.filePath, RESTORE_HEADER)
+        self.assertEqual(journal.load(), 2)
+        keys = [('PAR1', 'create'), ('PAR1', 'attach', 'SG1'), ('PAR1', 'start')]
+        self.assertEqual(journal.completed(keys), {('PAR1', 'create'): '/api/partitions/p1',
+                                                   ('PAR1', 'attach', 'SG1'): None})
+        # the header is written once
+        journal.record(('PAR1', 'start'))
+        journal.close()
+        records = [record for offset, record in readJSONLines(self.filePath)]
+        self.assertEqual(len([record for record in records if 'header' in record]), 1)
+        self.assertEqual(len(records), 4)
+
+    def testHeaderMismatchDiscardsJournal(self):
+        journal = HMCStepJournal(self.filePath, RESTORE_HEADER)
+        journal.record(('PAR1', 'create'), '/api/partitions/p1')
+        journal.close()
+
+        other = dict(RESTORE_HEADER, cpc='CPC2')
+        journal = HMCStepJournal(self.filePath, other)
+        self.assertEqual(journal.load(), None)
+        self.assertFalse(os.path.exists(self.filePath))
+        self.assertEqual(journal.completed([('PAR1', 'create')]), {})
+        # the new restore starts a journal with its own header
+        journal.record(('PAR1', 'create'), '/api/partitions/p9')
+        journal.close()
+        records = [record for offset, record in readJSONLines(self.filePath)]
+        self.assertEqual(records[0], {'header': other})
+
+    def testTruncatedStepIsDropped(self):
+        journal = HMCStepJournal(self.filePath, RESTORE_HEADER)
+        journal.record(('PAR1', 'create'), '/api/partitions/p1')
+        journal.close()
+        with open(self.filePath, 'ab') as journalFile:
+            journalFile.write('{"step": ["PAR1", "sta')
+        journal = HMCStepJournal(self.filePath, RESTORE_HEADER)
+        self.assertEqual(journal.load(), 1)
+        self.assertEqual(journal.completed([('PAR1', 'start')]), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
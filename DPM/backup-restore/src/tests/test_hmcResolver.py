@@ -0,0 +1,153 @@
+'''
+Tests of the boot volume index of StorageVolumeIndex driven by a stub
+connection, without HMC.
+
+Run from the src directory:
+    python -m unittest discover -s tests
+'''
+
+import os
+import sys
+import json
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CommonAPI.prsm2api import *
+from CommonAPI.hmcResolver import *
+
+SG_URI = '/api/storage-groups/s1'
+LIST_URI = SG_URI + '/storage-volumes'
+CU_URI = '/api/storage-control-units/cu1'
+
+
+class StubResponse:
+    def __init__(self, body):
+        self.status = 200
+        self.reason = 'OK'
+        self.body = json.dumps(body)
+
+    def read(self):
+        return self.body
+
+
+class StubConnection:
+    '''
+      - The attributes of HMCConnection used by the index, GET requests
+      - are answered from a dictionary {<uri>: <properties>}
+    '''
+    def __init__(self, sgType):
+        self.objectCache = None
+        self.propertiesRejected = False
+        self.sessionLock = threading.Lock()
+        self.requestLoop = None
+        self.poolSize = 2
+        self.lock = threading.Lock()
+        self.objects = {SG_URI: {'type': sgType}}
+        self.requests = []          # paths of the requests, without query
+        self.listBlocked = None     # threading.Event the list requests wait for
+
+    def addVolume(self, volumeID, usage, **props):
+        svURI = '%s/%s' % (LIST_URI, volumeID)
+        self.objects[svURI] = dict(props, usage=usage)
+        return svURI
+
+    def makeRequest(self, method=None, path=None, body=None, headers=None):
+        path = path.split('?')[0]
+        with self.lock:
+            self.requests.append(path)
+        if path == LIST_URI:
+            if self.listBlocked != None:
+                self.listBlocked.wait(5)
+            return StubResponse({'storage-volumes': [{'element-uri': uri, 'usage': props['usage']}
+                                                     for uri, props in sorted(self.objects.items())
+                                                     if uri.startswith(LIST_URI + '/')]})
+        return StubResponse(self.objects[path])
+
+    def count(self, path):
+        with self.lock:
+            return self.requests.count(path)
+
+
+class StubResolver:
+    '''
+      - Resolves the logical addresses of the control units
+    '''
+    def __init__(self):
+        self.controlUnits = {CU_URI: '05'}
+
+    def getControlUnitAddresses(self, cuURIs):
+        return dict([(cuURI, self.controlUnits[cuURI]) for cuURI in cuURIs])
+
+
+class StorageVolumeIndexTest(unittest.TestCase):
+
+    def createIndex(self, sgType):
+        self.hmcConn = StubConnection(sgType)
+        return StorageVolumeIndex(self.hmcConn, SG_URI, StubResolver())
+
+    def tearDown(self):
+        if self.hmcConn.requestLoop != None:
+            self.hmcConn.requestLoop.shutdown()
+
+    def testLookupByUUID(self):
+        index = self.createIndex('fcp')
+        bootURI = self.hmcConn.addVolume('v1', 'boot', uuid='U1')
+        dataURI = self.hmcConn.addVolume('v2', 'data', uuid='U2')
+        self.hmcConn.addVolume('v3', 'boot', uuid='U3')
+        self.assertEqual(index.getType(), 'fcp')
+        volume = index.lookupByUUID('U1')
+        self.assertEqual(volume['element-uri'], bootURI)
+        self.assertEqual(index.lookupByUUID('U3')['uuid'], 'U3')
+        # only the boot volumes are fetched
+        self.assertEqual(index.fetchCount, 2)
+        self.assertEqual(self.hmcConn.count(dataURI), 0)
+        self.assertEqual(self.hmcConn.count(LIST_URI), 1)
+
+    def testLookupByAddress(self):
+        index = self.createIndex('fc')
+        svURI = self.hmcConn.addVolume('v1', 'boot', **{'control-unit-uri': CU_URI, 'unit-address': '0a'})
+        self.hmcConn.addVolume('v2', 'boot', **{'control-unit-uri': CU_URI, 'unit-address': '0b'})
+        self.assertEqual(index.lookupByAddress('05', '0a')['element-uri'], svURI)
+        self.assertEqual(index.lookupByAddress('05', '0c'), None)
+        self.assertEqual(index.getType(), 'fc')
+
+    def testMissRefreshesNewVolumesOnly(self):
+        index = self.createIndex('fcp')
+        firstURI = self.hmcConn.addVolume('v1', 'boot', uuid='U1')
+        self.assertNotEqual(index.lookupByUUID('U1'), None)
+        # a hit is served from the index
+        index.lookupByUUID('U1')
+        self.assertEqual(self.hmcConn.count(LIST_URI), 1)
+
+        newURI = self.hmcConn.addVolume('v2', 'boot', uuid='U2')
+        self.assertEqual(index.lookupByUUID('U2')['element-uri'], newURI)
+        self.assertEqual(self.hmcConn.count(LIST_URI), 2)
+        self.assertEqual(self.hmcConn.count(firstURI), 1)
+        self.assertEqual(self.hmcConn.count(newURI), 1)
+        self.assertEqual(index.fetchCount, 2)
+
+    def testRefreshDoesNotBlockLookups(self):
+        index = self.createIndex('fcp')
+        svURI = self.hmcConn.addVolume('v1', 'boot', uuid='U1')
+        index.lookupByUUID('U1')
+        self.hmcConn.listBlocked = threading.Event()
+        missing = threading.Thread(target=index.lookupByUUID, args=('U9',))
+        missing.start()
+        try:
+            # the refresh of the miss waits for its list request
+            while self.hmcConn.count(LIST_URI) != 2:
+                missing.join(0.01)
+            found = []
+            hit = threading.Thread(target=lambda: found.append(index.lookupByUUID('U1')))
+            hit.start()
+            hit.join(1)
+            self.assertEqual([volume['element-uri'] for volume in found], [svURI])
+        finally:
+            self.hmcConn.listBlocked.set()
+            missing.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
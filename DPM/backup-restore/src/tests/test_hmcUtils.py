@@ -0,0 +1,302 @@
+'''
+Tests of HMCConnection request handling, HMCConnectionPool and HMCObjectCache,
+driven by a local stub HMC, without HMC.
+
+Run from the src directory:
+    python -m unittest discover -s tests
+'''
+
+import os
+import sys
+import json
+import socket
+import threading
+import time
+import unittest
+import BaseHTTPServer
+import SocketServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CommonAPI.prsm2api import *
+from CommonAPI.hmcUtils import *
+from CommonAPI import hmcAsync
+
+PARTITION_URI = '/api/partitions/p1'
+# requests to this URI are read, but not answered
+DROPPED_URI = '/api/dropped'
+
+
+class StubHMCServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    '''
+      - Local HTTP server answering logon and GET/POST requests as HMC
+      - does. Requests with another session ID than the one of the last
+      - logon are rejected with HTTP status 403 and reason code 5
+    '''
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), StubHMCHandler)
+        self.port = self.server_address[1]
+        self.lock = threading.Lock()
+        self.sessionID = None
+        self.logons = 0
+        self.requests = dict()      # {(<method>, <path>): <count>}
+
+    def count(self, method, path):
+        with self.lock:
+            self.requests[(method, path)] = self.requests.get((method, path), 0) + 1
+
+    def expireSession(self):
+        with self.lock:
+            self.sessionID = None
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHMCHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body=None):
+        data = body != None and json.dumps(body) or ''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_one_request(self):
+        # a client closing its connection is not an error
+        try:
+            BaseHTTPServer.BaseHTTPRequestHandler.handle_one_request(self)
+        except socket.error:
+            self.close_connection = 1
+
+    def answer(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length != 0:
+            self.rfile.read(length)
+        server = self.server
+        if method == 'POST' and self.path == WSA_URI_LOGON:
+            with server.lock:
+                server.logons += 1
+                server.sessionID = 'session%d' % server.logons
+                sessionID = server.sessionID
+            # slow logon, so that concurrent requests fail with the same session
+            time.sleep(0.05)
+            return self.send(200, {'api-session': sessionID, 'notification-topic': 'topic',
+                                   'api-major-version': 2, 'api-minor-version': 23})
+        server.count(method, self.path)
+        if self.headers.get('X-API-Session') != server.sessionID:
+            return self.send(403, {'http-status': 403, 'reason': 5, 'message': 'session expired'})
+        if method == 'DELETE' and self.path == WSA_URI_LOGOFF:
+            return self.send(204)
+        if self.path == DROPPED_URI:
+            self.close_connection = 1
+            return
+        if method == 'POST':
+            return self.send(201, {'object-uri': PARTITION_URI})
+        self.send(200, {'object-uri': self.path})
+
+    def do_GET(self):
+        self.answer('GET')
+
+    def do_POST(self):
+        self.answer('POST')
+
+    def do_DELETE(self):
+        self.answer('DELETE')
+
+
+class BrokenConnection:
+    '''
+      - Idle connection closed by HMC, fails the next request
+    '''
+    def __init__(self):
+        self.sock = None
+        self.hmcReused = False
+        self.closed = False
+
+    def request(self, method, path, body=None, headers={}):
+        raise socket.error(104, 'Connection reset by peer')
+
+    def close(self):
+        self.closed = True
+
+
+class HMCConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = HMCConnectionPool('127.0.0.1', 1, useSSL=False, maxSize=2, checkoutTimeout=0.1)
+
+    def testCheckoutCheckinReusesConnection(self):
+        conn = self.pool.checkout()
+        self.assertEqual(self.pool.connCount, 1)
+        self.assertFalse(conn.hmcReused)
+        self.pool.checkin(conn)
+        self.assertEqual(len(self.pool.idleConns), 1)
+        reused = self.pool.checkout()
+        self.assertTrue(reused is conn)
+        self.assertTrue(reused.hmcReused)
+        self.assertEqual(self.pool.connCount, 1)
+
+    def testCheckoutTimesOutWhenPoolIsFull(self):
+        self.pool.checkout()
+        self.pool.checkout()
+        self.assertEqual(self.pool.connCount, 2)
+        self.assertRaises(HMCException, self.pool.checkout)
+
+    def testDiscardFreesSlot(self):
+        first = self.pool.checkout()
+        self.pool.checkout()
+        self.pool.discard(first)
+        self.assertEqual(self.pool.connCount, 1)
+        self.pool.checkout()
+        self.assertEqual(self.pool.connCount, 2)
+
+    def testStaleIdleConnectionIsDropped(self):
+        conn = self.pool.checkout()
+        self.pool.checkin(conn)
+        self.pool.maxIdleTime = 0
+        time.sleep(0.01)
+        fresh = self.pool.checkout()
+        self.assertFalse(fresh is conn)
+        self.assertEqual(self.pool.connCount, 1)
+
+    def testCloseAll(self):
+        first = self.pool.checkout()
+        second = self.pool.checkout()
+        self.pool.checkin(first)
+        self.pool.closeAll()
+        self.assertEqual(self.pool.connCount, 1)
+        self.pool.checkin(second)
+        self.assertEqual(len(self.pool.idleConns), 1)
+
+
+class HMCConnectionRequestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubHMCServer()
+        self.server.start()
+        self.hmcConn = HMCConnection('127.0.0.1', hmcPort=self.server.port, useSSL=False, poolSize=4)
+        self.hmcConn.setUserCredential('user', 'password')
+        self.hmcConn.logon()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def testRequestReusesConnection(self):
+        for i in range(3):
+            response = self.hmcConn.makeRequest(path=PARTITION_URI)
+            self.assertEqual(response.status, 200)
+        self.assertEqual(self.hmcConn.connPool.connCount, 1)
+
+    def testStaleReusedConnectionIsRetried(self):
+        broken = BrokenConnection()
+        self.hmcConn.connPool.connCount += 1
+        self.hmcConn.connPool.idleConns.append((broken, time.time()))
+        response = self.hmcConn.makeRequest(path=PARTITION_URI)
+        self.assertEqual(response.status, 200)
+        self.assertTrue(broken.closed)
+        self.assertEqual(self.hmcConn.connPool.connCount, 1)
+        # a closed keep-alive connection does not renew the session
+        self.assertEqual(self.server.logons, 1)
+
+    def testExpiredSessionIsRenewedOnce(self):
+        self.server.expireSession()
+        statuses = []
+        def request():
+            statuses.append(self.hmcConn.makeRequest(path=PARTITION_URI).status)
+        threads = [threading.Thread(target=request) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, [200] * 4)
+        self.assertEqual(self.server.logons, 2)
+        self.assertEqual(self.hmcConn.sessionID, 'session2')
+
+    def testSentPostIsNotResent(self):
+        self.assertRaises(HMCException, self.hmcConn.makeRequest, path=DROPPED_URI,
+                          method=WSA_COMMAND_POST, body='{}')
+        self.assertEqual(self.server.requests[('POST', DROPPED_URI)], 1)
+        self.assertEqual(self.hmcConn.connPool.connCount, 0)
+
+    def testGetIsResent(self):
+        self.assertRaises(HMCException, self.hmcConn.makeRequest, path=DROPPED_URI, attempts=3)
+        self.assertEqual(self.server.requests[('GET', DROPPED_URI)], 3)
+
+    def testRequestLoopFollowsPoolSize(self):
+        requestLoop = hmcAsync.getRequestLoop(self.hmcConn)
+        self.assertEqual(len(requestLoop.workers), 4)
+        self.hmcConn.setPoolSize(2)
+        self.assertEqual(self.hmcConn.connPool.maxSize, 2)
+        self.assertEqual(requestLoop.numWorkers, 2)
+        self.hmcConn.setPoolSize(6)
+        self.assertEqual(requestLoop.numWorkers, 6)
+        uris = ['/api/partitions/p%d' % i for i in range(8)]
+        fetched = hmcAsync.getHMCObjectsAsync(self.hmcConn, uris)
+        self.assertEqual(sorted(fetched.keys()), uris)
+        self.assertEqual(len([worker for worker in requestLoop.workers if worker.isAlive()]), 6)
+
+    def testLogoffStopsRequestLoop(self):
+        requestLoop = hmcAsync.getRequestLoop(self.hmcConn)
+        workers = list(requestLoop.workers)
+        self.hmcConn.logoff()
+        self.assertEqual(self.hmcConn.requestLoop, None)
+        for worker in workers:
+            worker.join(5)
+            self.assertFalse(worker.isAlive())
+
+    def testPostInvalidatesCache(self):
+        cache = self.hmcConn.enableObjectCache()
+        cache.put(PARTITION_URI, '{}')
+        cache.put(PARTITION_URI + '/nics/n1', '{}')
+        self.hmcConn.makeRequest(path=PARTITION_URI, method=WSA_COMMAND_POST, body='{}')
+        self.assertEqual(len(cache.entries), 0)
+
+
+class HMCObjectCacheTest(unittest.TestCase):
+
+    def testExpiredResponseIsMissed(self):
+        cache = HMCObjectCache(ttl=0.05, maxSize=4)
+        cache.put(PARTITION_URI, 'body')
+        self.assertEqual(cache.get(PARTITION_URI), 'body')
+        time.sleep(0.1)
+        self.assertEqual(cache.get(PARTITION_URI), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def testLeastRecentlyUsedIsEvicted(self):
+        cache = HMCObjectCache(ttl=60, maxSize=2)
+        cache.put('/api/partitions/p1', 'p1')
+        cache.put('/api/partitions/p2', 'p2')
+        cache.get('/api/partitions/p1')
+        cache.put('/api/partitions/p3', 'p3')
+        self.assertEqual(cache.get('/api/partitions/p2'), None)
+        self.assertEqual(cache.get('/api/partitions/p1'), 'p1')
+        self.assertEqual(cache.evictions, 1)
+
+    def testInvalidateByPrefix(self):
+        cache = HMCObjectCache(ttl=60, maxSize=8)
+        for uri in ['/api/partitions/p1', '/api/partitions/p1?properties=name',
+                    '/api/partitions/p1/nics/n1', '/api/partitions/p10', '/api/partitions/p2']:
+            cache.put(uri, 'body')
+        cache.invalidate('/api/partitions/p1/operations/start')
+        self.assertEqual(sorted(cache.entries.keys()), ['/api/partitions/p10', '/api/partitions/p2'])
+        cache.invalidate('/api/partitions/p2/nics/n1')
+        # the parent object is dropped as well
+        self.assertEqual(cache.entries.keys(), ['/api/partitions/p10'])
+
+
+if __name__ == '__main__':
+    unittest.main()